@@ -0,0 +1,93 @@
+"""Poll latency of batched station queries as the station count grows.
+
+Compares the batched, concurrent observation poll with a single request
+that ORs every station into one $filter, against a stub server that takes
+``--latency`` per request plus ``--clause-cost`` per filter clause and
+rejects URLs longer than 8 KiB.
+
+    python -m benchmarks.bench_batching
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from .common import (
+    StubSensorThings,
+    async_bench_hass,
+    async_make_coordinator,
+    print_table,
+    stub_client,
+)
+
+
+async def _async_poll(server, single, rounds):
+    async with stub_client(server) as client, async_bench_hass(client) as hass:
+        coordinator = await async_make_coordinator(hass, server.stations)
+        # 靜態資料先以預設批次載入,只量測觀測輪詢
+        await coordinator.async_refresh()
+        if single:
+            coordinator._plan_batches = lambda keys, clause: [list(keys)]
+
+        durations = []
+        for _ in range(rounds):
+            server.advance(0.2)
+            coordinator.scheduler.expire()
+            server.reset_counters()
+            started = time.perf_counter()
+            await coordinator.async_refresh()
+            durations.append(time.perf_counter() - started)
+        await coordinator.async_shutdown()
+
+        return (
+            min(durations) * 1000,
+            server.requests,
+            server.longest_url,
+            coordinator.last_update_success,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="10,50,100,250,500,1000")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--clause-cost", type=float, default=0.001)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for count in map(int, args.stations.split(",")):
+        row = [count]
+        for single in (True, False):
+            with StubSensorThings(
+                count, latency=args.latency, clause_cost=args.clause_cost
+            ) as server:
+                duration, requests, url_length, success = asyncio.run(
+                    _async_poll(server, single, args.rounds)
+                )
+            row += [
+                f"{duration:.0f}" if success else "failed",
+                requests,
+                url_length,
+            ]
+        rows.append(row)
+
+    print_table(
+        f"Observation poll, {args.latency * 1000:.0f} ms + "
+        f"{args.clause_cost * 1000:.1f} ms/clause per request",
+        [
+            "stations",
+            "single ms",
+            "requests",
+            "url bytes",
+            "batched ms",
+            "requests",
+            "url bytes",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Station matching and debug logging over 10k synthetic Datastreams.
+
+Times the old parser, which matched every Datastream against a list of
+the configured station codes, against the index-based metadata and
+observation parsers. Also times the debug log of one response: the old
+full dump against the bounded sample.
+
+    python -m benchmarks.bench_matching
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import time
+from types import MappingProxyType, SimpleNamespace
+
+from custom_components.tw_floodsense.coordinator import FloodSenseCoordinator
+from custom_components.tw_floodsense.metadata import parse_station
+
+from .bench_records import _parse_dicts
+from .common import StubStation, print_table
+
+
+def _best(func, *args, repeat=3):
+    """Return the fastest of ``repeat`` runs in ms."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+class _FormattingHandler(logging.Handler):
+    """Format every record like a real handler, then drop it."""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.chars = 0
+
+    def emit(self, record):
+        self.chars += len(self.format(record))
+
+
+def _measure_matching(items, observation_items, stations, configured):
+    chosen = stations[:configured]
+    station_codes = [station.station_code for station in chosen]
+    metadata_context = (
+        frozenset(station_codes),
+        MappingProxyType(
+            {station.station_id: station.station_code for station in chosen}
+        ),
+    )
+    metadata = {
+        station.station_code: parse_station(item)
+        for station, item in zip(stations, items)
+    }
+    observation_context = MappingProxyType({
+        station.datastream_id: (
+            station.station_code,
+            metadata[station.station_code],
+            None,
+        )
+        for station in chosen
+    })
+    parse_metadata = FloodSenseCoordinator._parse_metadata
+    parse_data = FloodSenseCoordinator._parse_data
+
+    assert len(_parse_dicts(items, station_codes)) == configured
+    assert len(parse_metadata(items, metadata_context)) == configured
+    assert len(parse_data(observation_items, observation_context)) == configured
+
+    return [
+        configured,
+        f"{_best(_parse_dicts, items, station_codes):.1f}",
+        f"{_best(parse_metadata, items, metadata_context):.1f}",
+        f"{_best(parse_data, observation_items, observation_context):.1f}",
+    ]
+
+
+def _measure_logging(items):
+    logger = logging.getLogger("custom_components.tw_floodsense.coordinator")
+    handler = _FormattingHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    try:
+        res_data = {"@iot.count": len(items), "value": items}
+        dump = _best(logger.debug, "Flood sense API response: %s", res_data)
+        dump_chars = handler.chars // 3
+
+        handler.chars = 0
+        # 每次都從第一批開始,確保這一批會被取樣
+        sample = _best(
+            lambda: FloodSenseCoordinator._log_response_sample(
+                SimpleNamespace(_pages_parsed=0), items
+            )
+        )
+        sample_chars = handler.chars // 3
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+        logger.propagate = True
+    return dump, dump_chars, sample, sample_chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datastreams", type=int, default=10000)
+    parser.add_argument("--configured", default="10,100,1000,10000")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    stations = [StubStation(index, rng) for index in range(args.datastreams)]
+    rng.shuffle(stations)
+    items = []
+    for station in stations:
+        item = station.datastream("id,observedArea")
+        item["Thing"] = station.thing("id,properties")
+        item["Observations"] = [station.observation("result,phenomenonTime")]
+        items.append(item)
+    observation_items = [
+        {"@iot.id": item["@iot.id"], "Observations": item["Observations"]}
+        for item in items
+    ]
+
+    print_table(
+        f"Parsing {args.datastreams} Datastreams (best of 3, ms)",
+        ["configured", "list match", "metadata index", "observation index"],
+        [
+            _measure_matching(items, observation_items, stations, configured)
+            for configured in map(int, args.configured.split(","))
+            if configured <= args.datastreams
+        ],
+    )
+
+    dump, dump_chars, sample, sample_chars = _measure_logging(items)
+    print_table(
+        "Debug log of one response",
+        ["log", "ms", "chars"],
+        [
+            ["full dump", f"{dump:.1f}", dump_chars],
+            ["sample", f"{sample:.3f}", sample_chars],
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
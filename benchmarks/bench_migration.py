@@ -0,0 +1,76 @@
+"""Station ID resolution during entry migration.
+
+Resolves the stationID of ``--stations`` station codes from the stub
+server one request at a time, like the migration used to, and with the
+batched, cached resolver, first with an empty cache and then again.
+
+    python -m benchmarks.bench_migration
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from custom_components.tw_floodsense.api import async_fetch_page
+from custom_components.tw_floodsense.const import API_BASE_URL
+from custom_components.tw_floodsense.metadata import async_resolve_station_ids
+
+from .common import StubSensorThings, async_bench_hass, print_table, stub_client
+
+# 舊版遷移時每個測站一次的查詢
+STATION_ID_URL = (
+    f"{API_BASE_URL}/Things?$filter=(properties/stationCode eq '{{station_code}}')"
+)
+
+
+async def _async_sequential(client, station_codes):
+    resolved = {}
+    for station_code in station_codes:
+        res_data = await async_fetch_page(
+            client, STATION_ID_URL.format(station_code=station_code)
+        )
+        if value := res_data.get("value"):
+            resolved[station_code] = value[0]["properties"]["stationID"]
+    return resolved
+
+
+async def _async_measure(server):
+    station_codes = [station.station_code for station in server.stations]
+    rows = []
+    async with stub_client(server) as client, async_bench_hass(client) as hass:
+        runs = (
+            ("sequential", lambda: _async_sequential(client, station_codes)),
+            ("batched", lambda: async_resolve_station_ids(hass, station_codes)),
+            ("batched, cached", lambda: async_resolve_station_ids(hass, station_codes)),
+        )
+        for name, run in runs:
+            server.reset_counters()
+            started = time.perf_counter()
+            resolved = await run()
+            elapsed = time.perf_counter() - started
+            assert len(resolved) == len(station_codes)
+            rows.append([name, f"{elapsed * 1000:.0f}", server.requests])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="20,200,500")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rows = []
+    for count in map(int, args.stations.split(",")):
+        with StubSensorThings(count, latency=args.latency) as server:
+            rows += [[count, *row] for row in asyncio.run(_async_measure(server))]
+
+    print_table(
+        f"Station ID resolution, {args.latency * 1000:.0f} ms per request",
+        ["stations", "resolver", "ms", "requests"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
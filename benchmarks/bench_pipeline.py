@@ -0,0 +1,139 @@
+"""End-to-end poll pipeline benchmark on recorded fixtures.
+
+For each station count, records a setup refresh and one poll from the stub
+server with RecordingTransport, then replays the fixtures with
+ReplayTransport. The replayed poll must produce the recorded data. The
+replay measures poll time, parse time, peak allocations and entity state
+writes.
+
+    python -m benchmarks.bench_pipeline
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+
+from custom_components.tw_floodsense.const import TRANSPORT_DATA_KEY
+from custom_components.tw_floodsense.transport import RecordingTransport, ReplayTransport
+
+from .bench_state_writes import _station_entities
+from .common import (
+    StubSensorThings,
+    async_bench_hass,
+    async_make_coordinator,
+    print_table,
+    stub_client,
+)
+
+
+async def _async_poll(hass, stations, before_poll=None, trace=False):
+    """Run a setup refresh and a measured poll, returning the results."""
+    coordinator = await async_make_coordinator(hass, stations)
+    result = {"writes": 0, "parse": 0.0}
+
+    def _count_write():
+        result["writes"] += 1
+
+    for station in stations:
+        for entity in _station_entities(coordinator, station):
+            entity.async_write_ha_state = _count_write
+            coordinator.async_add_listener(entity._handle_coordinator_update)
+
+    parse_data = coordinator._parse_data
+
+    def _timed_parse(value, context):
+        started = time.perf_counter()
+        try:
+            return parse_data(value, context)
+        finally:
+            result["parse"] += time.perf_counter() - started
+
+    coordinator._parse_data = _timed_parse
+
+    await coordinator.async_refresh()
+    if before_poll is not None:
+        before_poll()
+    coordinator.scheduler.expire()
+    result.update(writes=0, parse=0.0)
+
+    transport = hass.data[TRANSPORT_DATA_KEY]
+    requests = getattr(transport, "requests", 0)
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await coordinator.async_refresh()
+    result["poll"] = time.perf_counter() - started
+    result["requests"] = getattr(transport, "requests", 0) - requests
+    if trace:
+        result["peak"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    assert coordinator.last_update_success
+    result["data"] = {
+        station_code: record.as_dict()
+        for station_code, record in coordinator.data.items()
+    }
+    await coordinator.async_shutdown()
+    return result
+
+
+async def _async_measure(server, latency):
+    with tempfile.TemporaryDirectory() as directory:
+        async with stub_client(server) as client, async_bench_hass() as hass:
+            hass.data[TRANSPORT_DATA_KEY] = RecordingTransport(hass, client, directory)
+            recorded = await _async_poll(
+                hass, server.stations, lambda: server.advance(0.1)
+            )
+
+        results = []
+        for trace in (False, True):
+            async with async_bench_hass() as hass:
+                hass.data[TRANSPORT_DATA_KEY] = ReplayTransport(
+                    hass, directory, latency=latency
+                )
+                results.append(await _async_poll(hass, server.stations, trace=trace))
+
+    timed, traced = results
+    identical = timed["data"] == recorded["data"] == traced["data"]
+    return [
+        len(server.stations),
+        "yes" if identical else "NO",
+        timed["requests"],
+        f"{timed['poll'] * 1000:.0f}",
+        f"{timed['parse'] * 1000:.1f}",
+        f"{traced['peak'] / 1024:.0f}",
+        timed["writes"],
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="10,100,1000,10000")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    rows = []
+    for count in map(int, args.stations.split(",")):
+        with StubSensorThings(count) as server:
+            rows.append(asyncio.run(_async_measure(server, args.latency)))
+
+    print_table(
+        f"Replayed poll, 10% of stations changed, {args.latency * 1000:.0f} ms latency",
+        [
+            "stations",
+            "identical",
+            "requests",
+            "poll ms",
+            "parse ms",
+            "peak KiB",
+            "state writes",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Memory footprint and allocations of station records.
+
+Compares the per-station dicts the parser used to build on every cycle
+with StationRecord objects, which are built once and reused while a
+station's observation does not change. Sizes are measured with
+tracemalloc and exclude the decoded response.
+
+    python -m benchmarks.bench_records
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tracemalloc
+from types import MappingProxyType
+
+from homeassistant.util.dt import as_local, parse_datetime
+
+from custom_components.tw_floodsense.coordinator import (
+    FloodSenseCoordinator,
+    _convert_datetime,
+)
+from custom_components.tw_floodsense.metadata import parse_coordinates, parse_station
+
+from .common import StubStation, print_table
+
+
+def _parse_dicts(value, station_codes):
+    """Build the per-station dicts like the parser before StationRecord."""
+    result = {}
+    for data in value:
+        thing_data = data["Thing"]["properties"]
+        if (station_code := thing_data.get("stationCode")) in station_codes:
+            coords = parse_coordinates(data["observedArea"].get("coordinates"))
+            observation = data["Observations"][0]
+            result[station_code] = {
+                "thing_id": data["Thing"]["@iot.id"],
+                "stationID": thing_data.get("stationID"),
+                "stationCode": thing_data.get("stationCode"),
+                "stationName": thing_data.get("stationName"),
+                "authority_type": thing_data.get("authority_type"),
+                "latitude": coords["lat"],
+                "longitude": coords["lon"],
+                "water_level": observation.get("result"),
+                "update_time": as_local(
+                    parse_datetime(observation.get("phenomenonTime"))
+                ).strftime("%Y-%m-%d %H:%M:%S"),
+            }
+    return result
+
+
+def _traced(func, *args):
+    """Return the result, the bytes it retains and the peak allocation."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current - before, peak - before
+
+
+def _measure(count):
+    rng = random.Random(1)
+    stations = [StubStation(index, rng) for index in range(count)]
+    full_items = []
+    for station in stations:
+        item = station.datastream()
+        item["Thing"] = station.thing()
+        item["Observations"] = [station.observation()]
+        full_items.append(item)
+    observation_items = [
+        {
+            "@iot.id": station.datastream_id,
+            "Observations": [station.observation("result,phenomenonTime")],
+        }
+        for station in stations
+    ]
+    metadata = {
+        station.station_code: parse_station(item)
+        for station, item in zip(stations, full_items)
+    }
+    station_codes = list(metadata)
+
+    def _context(previous):
+        return MappingProxyType({
+            station.datastream_id: (
+                station.station_code,
+                metadata[station.station_code],
+                previous.get(station.station_code),
+            )
+            for station in stations
+        })
+
+    # 清單比對為舊版行為,這裡只量測配置,改用集合避免耗時
+    dicts, dict_bytes, dict_peak = _traced(_parse_dicts, full_items, set(station_codes))
+    assert len(dicts) == count
+
+    _convert_datetime.cache_clear()
+    records, record_bytes, record_peak = _traced(
+        FloodSenseCoordinator._parse_data, observation_items, _context({})
+    )
+    # 觀測未變的下一輪沿用同一批 record
+    context = _context(records)
+    reused, reuse_bytes, reuse_peak = _traced(
+        FloodSenseCoordinator._parse_data, observation_items, context
+    )
+    assert all(reused[code] is records[code] for code in records)
+
+    return [
+        count,
+        f"{dict_bytes / count:.0f}",
+        f"{record_bytes / count:.0f}",
+        f"{dict_bytes / 1024:.0f}",
+        f"{record_bytes / 1024:.0f}",
+        f"{reuse_bytes / 1024:.0f}",
+        f"{dict_peak / 1024:.0f}",
+        f"{reuse_peak / 1024:.0f}",
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="100,1000,10000")
+    args = parser.parse_args()
+
+    print_table(
+        "Per-station dicts vs StationRecord (KiB unless noted)",
+        [
+            "stations",
+            "dict B/station",
+            "record B/station",
+            "dicts",
+            "records",
+            "unchanged cycle",
+            "dict cycle peak",
+            "record cycle peak",
+        ],
+        [_measure(count) for count in map(int, args.stations.split(","))],
+    )
+
+
+if __name__ == "__main__":
+    main()
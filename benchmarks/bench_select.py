@@ -0,0 +1,112 @@
+"""Bytes on the wire and decode time of projected station polls.
+
+Records the station poll from the stub server with full entities and with
+the $select projections, then replays the recorded fixtures to time the
+JSON decoding of each.
+
+    python -m benchmarks.bench_select
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import tempfile
+
+from custom_components.tw_floodsense.api import async_fetch_page
+from custom_components.tw_floodsense.const import (
+    API_BASE_URL,
+    API_FILTER_PARAMS,
+    DATASTREAM_SELECT_FIELDS,
+    OBSERVATION_SELECT_FIELDS,
+    THING_SELECT_FIELDS,
+)
+from custom_components.tw_floodsense.metrics import PollMetrics
+from custom_components.tw_floodsense.transport import RecordingTransport, ReplayTransport
+
+from .common import StubSensorThings, async_bench_hass, print_table, stub_client
+
+# 加入 $select 前後的測站輪詢查詢
+FULL_URL = (
+    f"{API_BASE_URL}/Datastreams?$filter=({{filter_params}}) and name eq '淹水深度'"
+    f"&$expand=Thing,Observations($orderby=phenomenonTime desc;$top=1)"
+)
+SELECT_URL = (
+    f"{API_BASE_URL}/Datastreams?$filter=({{filter_params}}) and name eq '淹水深度'"
+    f"&$select={','.join(DATASTREAM_SELECT_FIELDS)}"
+    f"&$expand=Thing($select={','.join(THING_SELECT_FIELDS)}),"
+    f"Observations($select={','.join(OBSERVATION_SELECT_FIELDS)};"
+    f"$orderby=phenomenonTime desc;$top=1)"
+)
+
+
+async def _async_measure(server, repeat):
+    filter_params = " or ".join(
+        API_FILTER_PARAMS.format(stationID=station.station_id)
+        for station in server.stations
+    )
+    urls = {
+        "full": FULL_URL.format(filter_params=filter_params),
+        "select": SELECT_URL.format(filter_params=filter_params),
+    }
+
+    result = {}
+    with tempfile.TemporaryDirectory() as directory:
+        async with stub_client(server) as client, async_bench_hass() as hass:
+            recorder = RecordingTransport(hass, client, directory)
+            for name, url in urls.items():
+                metrics = PollMetrics()
+                res_data = await async_fetch_page(recorder, url, metrics=metrics)
+                assert len(res_data["value"]) == len(server.stations)
+                result[name] = [metrics.last("response_bytes")]
+
+            replay = ReplayTransport(hass, directory)
+            for name, url in urls.items():
+                metrics = PollMetrics(window=repeat)
+                for _ in range(repeat):
+                    await async_fetch_page(replay, url, metrics=metrics)
+                response = await replay.get(url)
+                result[name] += [
+                    len(response.content),
+                    metrics.percentile("decode_time", 50),
+                ]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="25,100,500")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for count in map(int, args.stations.split(",")):
+        with StubSensorThings(count, max_url_length=65536, page_size=count) as server:
+            result = asyncio.run(_async_measure(server, args.repeat))
+        full, select = result["full"], result["select"]
+        rows.append([
+            count,
+            full[0],
+            select[0],
+            f"{full[1] / 1024:.1f}",
+            f"{select[1] / 1024:.1f}",
+            f"{full[2]:.2f}",
+            f"{select[2]:.2f}",
+        ])
+
+    print_table(
+        "Station poll with full entities vs $select (gzip on the wire)",
+        [
+            "stations",
+            "full wire B",
+            "select wire B",
+            "full KiB",
+            "select KiB",
+            "full decode ms",
+            "select decode ms",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Entity state writes per poll cycle.
+
+Attaches the station sensors of ``--stations`` stations to a coordinator
+and counts the state writes of each poll while a share of the stations
+reports a new observation. The "every update" column is what entities
+that write on every coordinator update would do.
+
+    python -m benchmarks.bench_state_writes
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+from custom_components.tw_floodsense.const import HISTORY_SENSOR_INFO, SENSOR_INFO
+from custom_components.tw_floodsense.sensor import FloodSenseSensor, HistorySensor
+
+from .common import (
+    StubSensorThings,
+    async_bench_hass,
+    async_make_coordinator,
+    print_table,
+    stub_client,
+)
+
+
+def _station_entities(coordinator, station):
+    """Create the sensors of one station subentry."""
+    return [
+        sensor_class(
+            coordinator=coordinator,
+            station_code=station.station_code,
+            station_name=station.station_name,
+            sensor_type=sensor_type,
+            device_class=config["device_class"],
+            unit_of_measurement=config["unit"],
+            state_class=config["state_class"],
+            display_precision=config["display_precision"],
+            icon=config["icon"],
+        )
+        for sensor_class, info in (
+            (FloodSenseSensor, SENSOR_INFO),
+            (HistorySensor, HISTORY_SENSOR_INFO),
+        )
+        for sensor_type, config in info.items()
+    ]
+
+
+async def _async_cycles(server, fractions, cycles):
+    counts = {"updates": 0, "writes": 0}
+
+    def _count_write():
+        counts["writes"] += 1
+
+    async with stub_client(server) as client, async_bench_hass(client) as hass:
+        coordinator = await async_make_coordinator(hass, server.stations)
+        entities = [
+            entity
+            for station in server.stations
+            for entity in _station_entities(coordinator, station)
+        ]
+        for entity in entities:
+            # 不經過 entity platform,只計算寫入次數
+            entity.async_write_ha_state = _count_write
+
+            def _listener(entity=entity):
+                counts["updates"] += 1
+                entity._handle_coordinator_update()
+
+            coordinator.async_add_listener(_listener)
+
+        await coordinator.async_refresh()
+
+        rows = []
+        for fraction in fractions:
+            counts.update(updates=0, writes=0)
+            for _ in range(cycles):
+                server.advance(fraction)
+                coordinator.scheduler.expire()
+                await coordinator.async_refresh()
+            rows.append([
+                f"{fraction:.0%}",
+                len(entities),
+                counts["updates"] // cycles,
+                counts["writes"] // cycles,
+            ])
+        await coordinator.async_shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--fractions", default="0,0.01,0.05,0.2,1")
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubSensorThings(args.stations) as server:
+        rows = asyncio.run(
+            _async_cycles(
+                server, [float(f) for f in args.fractions.split(",")], args.cycles
+            )
+        )
+
+    print_table(
+        f"State writes per poll cycle, {args.stations} stations",
+        ["changed", "entities", "every update", "changed only"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
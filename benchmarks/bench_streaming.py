@@ -0,0 +1,150 @@
+"""Peak memory and event loop blocking of streamed vs buffered decoding.
+
+Fetches the catalog query for ``--stations`` Datastreams as one page from
+the stub server, once buffered with response.json() and once streamed
+through ValueStreamDecoder. Each run happens in a fresh process so its
+peak RSS can be compared; the stub server runs in this process.
+
+    python -m benchmarks.bench_streaming
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import aclosing
+
+from custom_components.tw_floodsense.api import async_fetch_page, async_iter_values
+from custom_components.tw_floodsense.const import (
+    CATALOG_API_URL,
+    DATASTREAM_SELECT_FIELDS,
+    THING_SELECT_FIELDS,
+)
+
+from .common import LoopLag, StubSensorThings, print_table, stub_client
+
+URL = CATALOG_API_URL.format(
+    datastream_select=",".join(DATASTREAM_SELECT_FIELDS),
+    thing_select=",".join(THING_SELECT_FIELDS),
+)
+
+
+def _page_url(items) -> str:
+    return URL.replace("$top=1000", f"$top={items}")
+
+
+class _Server:
+    """Port of a stub server running in another process."""
+
+    def __init__(self, port):
+        self.port = port
+
+
+async def _async_child(mode, port, items, trace):
+    url = _page_url(items)
+    async with stub_client(_Server(port)) as client:
+        # 先建立連線,避免把連線成本算進量測
+        await client.get(_page_url(1))
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if trace:
+            tracemalloc.start()
+
+        items = 0
+        started = time.perf_counter()
+        async with LoopLag() as lag:
+            if mode == "buffered":
+                res_data = await async_fetch_page(client, url)
+                items = len(res_data["value"])
+                del res_data
+            else:
+                async with aclosing(async_iter_values(client, url)) as batches:
+                    async for value in batches:
+                        items += len(value)
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "items": items,
+            "elapsed": elapsed,
+            "lag": lag.max,
+            "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss,
+        }
+        if trace:
+            result["peak"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result
+
+
+def _run_child(mode, server, trace):
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            __spec__.name,
+            "--child",
+            mode,
+            str(server.port),
+            str(len(server.stations)),
+        ]
+        + (["--trace"] if trace else []),
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stations", default="2000,10000,30000")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "PORT", "ITEMS"))
+    parser.add_argument("--trace", action="store_true")
+    args = parser.parse_args()
+
+    if args.child:
+        mode, port, items = args.child
+        print(
+            json.dumps(asyncio.run(_async_child(mode, int(port), int(items), args.trace)))
+        )
+        return
+
+    rows = []
+    for count in map(int, args.stations.split(",")):
+        with StubSensorThings(count, page_size=count) as server:
+            for mode in ("buffered", "streamed"):
+                server.reset_counters()
+                timed = _run_child(mode, server, False)
+                wire = server.bytes_sent
+                traced = _run_child(mode, server, True)
+                assert timed["items"] == count
+                rows.append([
+                    count,
+                    f"{wire / 1024:.0f}",
+                    mode,
+                    f"{timed['elapsed'] * 1000:.0f}",
+                    f"{timed['lag'] * 1000:.1f}",
+                    f"{timed['rss'] / 1024:.1f}",
+                    f"{traced['peak'] / 1024 / 1024:.1f}",
+                ])
+
+    print_table(
+        "Catalog response, buffered vs streamed decoding",
+        [
+            "stations",
+            "wire KiB",
+            "mode",
+            "total ms",
+            "max loop block ms",
+            "peak RSS +MiB",
+            "tracemalloc peak MiB",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
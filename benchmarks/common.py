@@ -0,0 +1,422 @@
+"""Shared helpers for the TWFloodSense benchmarks.
+
+The benchmarks run the integration against ``StubSensorThings``, a local
+HTTP server that answers the SensorThings queries the integration sends.
+Requests to API_BASE_URL are redirected to it by the httpx client from
+``stub_client``. Home Assistant comes from the test harness in
+requirements_test.txt.
+"""
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+import httpx
+
+from custom_components.tw_floodsense.const import (
+    API_BASE_URL,
+    DOMAIN,
+    TRANSPORT_DATA_KEY,
+)
+
+API_PATH = urlsplit(API_BASE_URL).path
+FLOOD_DEPTH = "淹水深度"
+START_TIME = datetime(2026, 10, 17, 0, 0, tzinfo=timezone.utc)
+
+_CLAUSE = re.compile(
+    r"substringof\('stationID=([^']+)',description\)"
+    r"|properties/stationCode eq '([^']+)'"
+    r"|\bid eq '?([^')\s]+)'?"
+)
+_EXPAND = re.compile(r"(Thing|Observations)(?:\(([^)]*)\))?")
+_SINCE = re.compile(r"phenomenonTime gt ([0-9T:.\-Z]+)")
+
+
+def _time(value) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _project(entity, select):
+    """Keep only the selected fields, as $select does."""
+    if not select:
+        return entity
+    fields = {"@iot.id" if field == "id" else field for field in select.split(",")}
+    return {key: value for key, value in entity.items() if key in fields}
+
+
+class StubStation:
+    """One synthetic flood sensor with its latest observation."""
+
+    def __init__(self, index, rng):
+        self.thing_id = 100000 + index
+        self.datastream_id = 500000 + index
+        self.station_code = f"FS{index:06d}"
+        self.station_id = str(uuid.uuid5(uuid.NAMESPACE_URL, self.station_code))
+        self.station_name = f"測站{index}號"
+        self.authority_type = ("水利署", "縣市政府", "水利署(與縣市政府合建)")[index % 3]
+        self.longitude = round(120.0 + rng.random() * 1.9, 6)
+        self.latitude = round(22.0 + rng.random() * 3.2, 6)
+        self.phenomenon_time = START_TIME
+        self.water_level = 0.0
+
+    def thing(self, select=None):
+        return _project(
+            {
+                "@iot.selfLink": f"{API_BASE_URL}/Things({self.thing_id})",
+                "@iot.id": self.thing_id,
+                "name": f"{self.station_name}淹水感測器",
+                "description": "淹水感測器",
+                "properties": {
+                    "stationID": self.station_id,
+                    "stationCode": self.station_code,
+                    "stationName": self.station_name,
+                    "authority_type": self.authority_type,
+                    "Category": "淹水感測",
+                    "CategoryID": "9",
+                    "Maintainer": "水利署",
+                    "TownCode": "6500100",
+                },
+                "Datastreams@iot.navigationLink": (
+                    f"{API_BASE_URL}/Things({self.thing_id})/Datastreams"
+                ),
+                "Locations@iot.navigationLink": (
+                    f"{API_BASE_URL}/Things({self.thing_id})/Locations"
+                ),
+            },
+            select,
+        )
+
+    def datastream(self, select=None):
+        return _project(
+            {
+                "@iot.selfLink": f"{API_BASE_URL}/Datastreams({self.datastream_id})",
+                "@iot.id": self.datastream_id,
+                "name": FLOOD_DEPTH,
+                "description": f"stationID={self.station_id}",
+                "observationType": (
+                    "http://www.opengis.net/def/observationType/OGC-OM/2.0/OM_Measurement"
+                ),
+                "unitOfMeasurement": {
+                    "name": "centimeter",
+                    "symbol": "cm",
+                    "definition": "http://unitsofmeasure.org/ucum.html#para-30",
+                },
+                "observedArea": {
+                    "type": "Point",
+                    "coordinates": [self.longitude, self.latitude],
+                },
+                "phenomenonTime": f"{_time(START_TIME)}/{_time(self.phenomenon_time)}",
+                "resultTime": f"{_time(START_TIME)}/{_time(self.phenomenon_time)}",
+                "Observations@iot.navigationLink": (
+                    f"{API_BASE_URL}/Datastreams({self.datastream_id})/Observations"
+                ),
+            },
+            select,
+        )
+
+    def observation(self, select=None):
+        observation_id = self.datastream_id * 100000 + int(
+            (self.phenomenon_time - START_TIME).total_seconds() // 60
+        )
+        return _project(
+            {
+                "@iot.selfLink": f"{API_BASE_URL}/Observations({observation_id})",
+                "@iot.id": observation_id,
+                "phenomenonTime": _time(self.phenomenon_time),
+                "resultTime": _time(self.phenomenon_time),
+                "result": self.water_level,
+                "Datastream@iot.navigationLink": (
+                    f"{API_BASE_URL}/Observations({observation_id})/Datastream"
+                ),
+                "FeatureOfInterest@iot.navigationLink": (
+                    f"{API_BASE_URL}/Observations({observation_id})/FeatureOfInterest"
+                ),
+            },
+            select,
+        )
+
+
+class StubSensorThings:
+    """Local SensorThings server with synthetic flood sensors.
+
+    ``latency`` is added to every request and ``clause_cost`` for every
+    clause of its $filter, like a server evaluating the filter. Requests
+    with a URL longer than ``max_url_length`` get 414, and pages hold at
+    most ``page_size`` items. Bodies are gzipped when the client asks.
+    """
+
+    def __init__(
+        self,
+        stations,
+        latency=0.0,
+        clause_cost=0.0,
+        max_url_length=8192,
+        page_size=1000,
+        seed=1,
+    ):
+        """Initialize the server."""
+        self.rng = random.Random(seed)
+        self.stations = [StubStation(index, self.rng) for index in range(stations)]
+        self.latency = latency
+        self.clause_cost = clause_cost
+        self.max_url_length = max_url_length
+        self.page_size = page_size
+        self.requests = 0
+        self.bytes_sent = 0
+        self.longest_url = 0
+        self._lock = threading.Lock()
+        self._by_code = {station.station_code: station for station in self.stations}
+        self._by_id = {station.station_id: station for station in self.stations}
+        self._by_datastream = {
+            str(station.datastream_id): station for station in self.stations
+        }
+        self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        """Serve in a background thread."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop serving."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.longest_url = 0
+
+    def advance(self, fraction, minutes=5):
+        """Give a share of the stations a newer observation."""
+        count = round(len(self.stations) * fraction)
+        for station in self.rng.sample(self.stations, count):
+            station.phenomenon_time += timedelta(minutes=minutes)
+            station.water_level = round(self.rng.random() * 30, 1)
+
+    def _handle(self, request):
+        with self._lock:
+            self.requests += 1
+            self.longest_url = max(self.longest_url, len(request.path))
+
+        if len(request.path) > self.max_url_length:
+            self._send(request, 414, {})
+            return
+
+        parts = urlsplit(request.path)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        resource = unquote(parts.path).removeprefix(API_PATH)
+        filter_params = query.get("$filter", "")
+        clauses = _CLAUSE.findall(filter_params)
+        time.sleep(self.latency + self.clause_cost * len(clauses))
+
+        if resource == "/Things":
+            items = self._things(clauses, query)
+        elif resource == "/Datastreams":
+            items = self._datastreams(clauses, filter_params, query)
+        else:
+            items = []
+
+        skip = int(query.get("$skip", 0))
+        top = min(int(query.get("$top", self.page_size)), self.page_size)
+        body = {"@iot.count": len(items)}
+        if skip + top < len(items):
+            next_query = "&".join(
+                f"{key}={quote(value, safe=',()$;:')}"
+                for key, value in {**query, "$skip": str(skip + top)}.items()
+            )
+            body["@iot.nextLink"] = f"{API_BASE_URL}{resource}?{next_query}"
+        body["value"] = items[skip:skip + top]
+        self._send(request, 200, body)
+
+    def _things(self, clauses, query):
+        stations = [
+            self._by_code[code] for _, code, _ in clauses if code in self._by_code
+        ]
+        return [station.thing(query.get("$select")) for station in stations]
+
+    def _datastreams(self, clauses, filter_params, query):
+        if any(station_id for station_id, _, _ in clauses):
+            stations = [
+                self._by_id[station_id]
+                for station_id, _, _ in clauses
+                if station_id in self._by_id
+            ]
+        elif clauses:
+            stations = [
+                self._by_datastream[datastream_id]
+                for _, _, datastream_id in clauses
+                if datastream_id in self._by_datastream
+            ]
+        else:
+            stations = self.stations
+
+        expand = {
+            name: dict(
+                option.split("=", 1)
+                for option in (options or "").split(";")
+                if "=" in option
+            )
+            for name, options in _EXPAND.findall(query.get("$expand", ""))
+        }
+        items = []
+        for station in stations:
+            item = station.datastream(query.get("$select"))
+            if (thing := expand.get("Thing")) is not None:
+                item["Thing"] = station.thing(thing.get("$select"))
+            if (observations := expand.get("Observations")) is not None:
+                since = _SINCE.search(observations.get("$filter", ""))
+                item["Observations"] = (
+                    []
+                    if since and _time(station.phenomenon_time) <= since.group(1)
+                    else [station.observation(observations.get("$select"))]
+                )
+            items.append(item)
+        return items
+
+    def _send(self, request, status, body):
+        content = json.dumps(body, ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            content = gzip.compress(content, 6)
+            headers["Content-Encoding"] = "gzip"
+
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header("Content-Length", str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+        with self._lock:
+            self.bytes_sent += len(content)
+
+
+class _LocalTransport(httpx.AsyncBaseTransport):
+    """Send requests for the public API to the local stub server."""
+
+    def __init__(self, port):
+        self._port = port
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self._port)
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def stub_client(server) -> httpx.AsyncClient:
+    """Return an httpx client that talks to the stub server."""
+    return httpx.AsyncClient(
+        transport=_LocalTransport(server.port),
+        limits=httpx.Limits(max_connections=100),
+    )
+
+
+@asynccontextmanager
+async def async_bench_hass(transport=None):
+    """Yield a Home Assistant instance with an empty config directory."""
+    from pytest_homeassistant_custom_component.common import async_test_home_assistant
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        async with async_test_home_assistant(config_dir=config_dir) as hass:
+            if transport is not None:
+                hass.data[TRANSPORT_DATA_KEY] = transport
+            yield hass
+
+
+async def async_make_coordinator(hass, stations, **kwargs):
+    """Return a loaded FloodSenseCoordinator for the given stub stations."""
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+    from custom_components.tw_floodsense.coordinator import FloodSenseCoordinator
+    from custom_components.tw_floodsense.metadata import StationMetadata
+
+    entry = MockConfigEntry(domain=DOMAIN, entry_id="benchmark")
+    coordinator = FloodSenseCoordinator(
+        hass,
+        entry,
+        [station.station_code for station in stations],
+        [station.station_id for station in stations],
+        StationMetadata(hass, entry.entry_id),
+        **kwargs,
+    )
+    await coordinator._async_setup()
+    return coordinator
+
+
+class LoopLag:
+    """Measure the longest event loop stall while the block runs."""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.max = 0.0
+        self._task = None
+
+    async def _tick(self):
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.max = max(self.max, now - last - self.interval)
+            last = now
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._tick())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *args):
+        # 讓計時器再跑一次,量到區塊結尾的阻塞
+        await asyncio.sleep(self.interval * 2)
+        self._task.cancel()
+
+
+def print_table(title, headers, rows):
+    """Print rows as an aligned plain text table."""
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [
+        max(len(str(header)), *(len(row[column]) for row in rows))
+        for column, header in enumerate(headers)
+    ]
+    print(f"\n{title}")
+    print("  ".join(str(header).rjust(width) for header, width in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
@@ -3,21 +3,30 @@ from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.httpx_client import get_async_client
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers import config_validation as cv
 
-from .coordinator import FloodSenseCoordinator
+from .area import AreaMonitor
+from .levels import LevelMonitor, parse_thresholds
+from .metadata import StationMetadata, async_resolve_station_ids
+from .shards import FloodSenseShardManager
 from .const import (
+    CONF_PARSE_OFFLOAD,
+    CONF_PUSH,
+    CONF_SHARD_BY,
     CONF_STATION_NAME,
     CONF_STATION_CODE,
     CONF_STATION_ID,
     CONF_THING_ID,
+    CONF_THRESHOLDS,
+    DEFAULT_LEVEL_THRESHOLDS,
     DOMAIN,
     FLOODSENSE_COORDINATOR,
-    HA_USER_AGENT,
-    THING_DATA_API_URL,
+    SNAPSHOT_STORAGE_KEY,
+    STORAGE_VERSION,
     PLATFORM,
+    SHARD_BY_NONE,
 )
 
 CONFIG_SCHEMA = cv.removed(DOMAIN, raise_if_present=True)
@@ -43,23 +52,81 @@ def _get_floodsense_from_entry(entry: ConfigEntry) -> dict[str, Any]:
     return station_codes, station_ids
 
 
+def _get_subentry_snapshot(entry: ConfigEntry) -> dict[str, tuple]:
+    """Get the type and data of every subentry to detect changes."""
+    return {
+        subentry_id: (getattr(subentry, "subentry_type", None), dict(subentry.data))
+        for subentry_id, subentry in entry.subentries.items()
+    }
+
+
+def _get_areas_from_entry(entry: ConfigEntry) -> dict[str, AreaMonitor]:
+    """Get the monitored areas from config entry subentries."""
+    return {
+        subentry_id: AreaMonitor(subentry_id, subentry.data)
+        for subentry_id, subentry in entry.subentries.items()
+        if getattr(subentry, "subentry_type", None) == "area"
+    }
+
+
+def _get_thresholds(text) -> tuple[float, ...]:
+    """Parse configured thresholds, ignoring invalid values."""
+    try:
+        return parse_thresholds(text)
+    except ValueError as e:
+        _LOGGER.warning("Ignoring invalid flood level thresholds %r: %s", text, e)
+        return ()
+
+
+def _create_level_monitor(hass: HomeAssistant, entry: ConfigEntry) -> LevelMonitor:
+    """Create the level monitor from the global and per-station thresholds."""
+    levels = LevelMonitor(
+        hass,
+        _get_thresholds(entry.options.get(CONF_THRESHOLDS, DEFAULT_LEVEL_THRESHOLDS)),
+    )
+    for subentry in entry.subentries.values():
+        if subentry.data and (station_code := subentry.data.get(CONF_STATION_CODE)):
+            levels.set_station(
+                station_code, _get_thresholds(subentry.data.get(CONF_THRESHOLDS))
+            )
+    return levels
+
+
 async def _async_setup_subentries(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up subentries for the config entry.
 
     Returns True if platforms were loaded, False otherwise.
     """
     config_data = hass.data[DOMAIN][entry.entry_id]
+    config_data["subentries"] = _get_subentry_snapshot(entry)
+    platforms_loaded = False
 
-    station_codes, station_ids = _get_floodsense_from_entry(entry)
+    station_codes, station_ids = _get_floodsense_from_entry(entry) or ([], [])
+    areas = _get_areas_from_entry(entry)
 
     # 創建 coordinators
-    if station_codes and station_ids:
-        floodsense_coordinator = FloodSenseCoordinator(hass, station_codes, station_ids)
-        # 初始刷新
-        await floodsense_coordinator.async_config_entry_first_refresh()
-        config_data[FLOODSENSE_COORDINATOR] = floodsense_coordinator
+    if (station_codes and station_ids) or areas:
+        metadata = StationMetadata(hass, entry.entry_id)
+        manager = FloodSenseShardManager(
+            hass,
+            entry,
+            metadata,
+            shard_by=entry.options.get(CONF_SHARD_BY, SHARD_BY_NONE),
+            offload=entry.options.get(CONF_PARSE_OFFLOAD, False),
+            levels=_create_level_monitor(hass, entry),
+        )
+        await manager.async_setup(station_codes, station_ids, areas)
+        await manager.async_first_refresh()
+        config_data[FLOODSENSE_COORDINATOR] = manager
+        # 啟用推播時以 MQTT 接收新的觀測,斷線時回到輪詢
+        if entry.options.get(CONF_PUSH):
+            entry.async_on_unload(manager.async_stop_push)
+            entry.async_create_background_task(
+                hass,
+                manager.async_start_push(),
+                f"{DOMAIN}_{entry.entry_id}_push",
+            )
         # 初始化感測器平台
-        platforms_loaded = False
         await hass.config_entries.async_forward_entry_setups(entry, PLATFORM)
         platforms_loaded = True
 
@@ -95,11 +162,86 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Update listener."""
     try:
-        await hass.config_entries.async_reload(entry.entry_id)
+        if not await _async_update_subentries(hass, entry):
+            await hass.config_entries.async_reload(entry.entry_id)
     except Exception as e:
         _LOGGER.error("update_listener error: %s", e)
 
 
+async def _async_update_subentries(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Apply added or removed subentries without reloading the entry.
+
+    Returns False if the change needs a full reload.
+    """
+    config_data = hass.data.get(DOMAIN, {}).get(entry.entry_id, {})
+    manager = config_data.get(FLOODSENSE_COORDINATOR)
+    add_subentry = config_data.get("add_subentry")
+    previous = config_data.get("subentries")
+    if manager is None or add_subentry is None or previous is None:
+        return False
+
+    current = _get_subentry_snapshot(entry)
+    added = [subentry_id for subentry_id in current if subentry_id not in previous]
+    removed = [subentry_id for subentry_id in previous if subentry_id not in current]
+
+    # 修改既有 subentry 或其他設定時仍重新載入
+    if not added and not removed:
+        return False
+    if any(
+        current[subentry_id] != previous[subentry_id]
+        for subentry_id in current
+        if subentry_id in previous
+    ):
+        return False
+
+    config_data["subentries"] = current
+
+    # 移除的實體由 HA 隨 subentry 一併刪除,這裡只更新 coordinator
+    if removed:
+        manager.remove_stations(
+            [
+                previous[subentry_id][1][CONF_STATION_CODE]
+                for subentry_id in removed
+                if previous[subentry_id][0] == "floodsense"
+            ],
+            [subentry_id for subentry_id in removed if previous[subentry_id][0] == "area"],
+        )
+
+    if added:
+        station_codes = [
+            current[subentry_id][1].get(CONF_STATION_CODE)
+            for subentry_id in added
+            if current[subentry_id][0] == "floodsense"
+        ]
+        station_ids = [
+            current[subentry_id][1].get(CONF_STATION_ID)
+            for subentry_id in added
+            if current[subentry_id][0] == "floodsense"
+        ]
+        areas = {
+            subentry_id: AreaMonitor(subentry_id, current[subentry_id][1])
+            for subentry_id in added
+            if current[subentry_id][0] == "area"
+        }
+        for subentry_id in added:
+            subentry_data = current[subentry_id][1]
+            if current[subentry_id][0] == "floodsense" and manager.levels is not None:
+                manager.levels.set_station(
+                    subentry_data.get(CONF_STATION_CODE),
+                    _get_thresholds(subentry_data.get(CONF_THRESHOLDS)),
+                )
+        # 需要新的分片時重新載入
+        if not await manager.async_add_stations(station_codes, station_ids, areas):
+            return False
+        for subentry_id in added:
+            add_subentry(subentry_id, entry.subentries[subentry_id])
+
+    _LOGGER.debug(
+        "Updated subentries in place, added: %s, removed: %s", added, removed
+    )
+    return True
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     try:
@@ -128,6 +270,14 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         return False
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the cached station data when the entry is deleted."""
+    await StationMetadata(hass, entry.entry_id).async_remove()
+    await Store(
+        hass, STORAGE_VERSION, SNAPSHOT_STORAGE_KEY.format(entry_id=entry.entry_id)
+    ).async_remove()
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload the config entry."""
     await hass.config_entries.async_reload(entry.entry_id)
@@ -148,13 +298,22 @@ async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     try:
         if entry.version == 1:
             from copy import deepcopy
-            
+
+            # 一次批次查詢所有測站的 stationID
+            station_ids = await async_resolve_station_ids(
+                hass,
+                [
+                    subentry.data[CONF_STATION_CODE]
+                    for subentry in entry.subentries.values()
+                    if subentry.data.get(CONF_STATION_CODE)
+                ],
+            )
+
             for subentry in entry.subentries.values():
                 new_data = deepcopy(dict(subentry.data))
                 new_data.pop(CONF_THING_ID, None)
 
-                station_id = await _get_station_id(hass, new_data[CONF_STATION_CODE])
-                new_data[CONF_STATION_ID] = station_id
+                new_data[CONF_STATION_ID] = station_ids.get(new_data[CONF_STATION_CODE])
                 hass.config_entries.async_update_subentry(
                     entry,
                     subentry, 
@@ -170,20 +329,3 @@ async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     except Exception as e:
         _LOGGER.error("Migration error: %s", e)
         return False
-                    
-
-async def _get_station_id(hass: HomeAssistant, station_code: str) -> str:
-    """Get station ID from station code."""
-    client = get_async_client(hass, False)
-    url = THING_DATA_API_URL.format(station_code=station_code)
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": HA_USER_AGENT,
-    }
-            
-    response = await client.get(url, headers=headers, timeout=10)
-    if response.is_success:
-        res_data = response.json()
-        if res_data.get("@iot.count", 0) > 0:
-            return res_data["value"][0]["properties"].get("stationID")
-    return None
@@ -0,0 +1,341 @@
+"""SensorThings API helpers for TWFloodSense."""
+from __future__ import annotations
+
+import asyncio
+import codecs
+import json
+import logging
+import re
+import time
+
+from .const import (
+    HA_USER_AGENT,
+    MAX_PAGES,
+    STREAM_CHUNK_SIZE,
+)
+from .exceptions import (
+    RequestFailedError,
+    RequestTimeoutError,
+    UnexpectedStatusError,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITER = re.compile(r"[ \t\n\r,\]}]")
+_DECODER = json.JSONDecoder()
+
+
+class ValueStreamDecoder:
+    """Incrementally decode the ``value`` array of a SensorThings response.
+
+    Chunks are fed as they arrive; each call returns the ``value`` items
+    completed so far, so only one chunk and the partial item after it are
+    held in memory. The other top-level members, such as @iot.nextLink, are
+    collected in ``head``.
+    """
+
+    def __init__(self):
+        """Initialize the decoder."""
+        self.head = {}
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._key = None
+        self._state = "start"
+
+    def feed(self, chunk: bytes, final=False) -> list:
+        """Decode a chunk and return the completed ``value`` items."""
+        self._buf = self._buf[self._pos:] + self._text.decode(chunk, final)
+        self._pos = 0
+        items = []
+
+        while self._step(items, final):
+            pass
+
+        if final and self._state != "done":
+            raise ValueError("Incomplete SensorThings response")
+        return items
+
+    def _skip(self):
+        self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+        return self._buf[self._pos] if self._pos < len(self._buf) else None
+
+    def _decode(self, final):
+        """Decode one JSON value at the position, or None if incomplete."""
+        try:
+            obj, end = _DECODER.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None
+        # 數字與常值可能被切在區塊邊界 (如 "3." 與 "5"),需等到後面的分隔符號
+        if not isinstance(obj, (dict, list, str)) and not _DELIMITER.match(
+            self._buf, end
+        ):
+            if end < len(self._buf) and (final or _DELIMITER.search(self._buf, end)):
+                raise ValueError("Invalid value in SensorThings response")
+            if not final:
+                return None
+        self._pos = end
+        return (obj,)
+
+    def _step(self, items, final) -> bool:
+        """Advance one token; return False when more data is needed."""
+        char = self._skip()
+        if char is None or self._state == "done":
+            return False
+
+        if self._state == "start":
+            if char != "{":
+                raise ValueError("SensorThings response is not an object")
+            self._pos += 1
+            self._state = "key"
+        elif self._state == "key":
+            if char == ",":
+                self._pos += 1
+            elif char == "}":
+                self._pos += 1
+                self._state = "done"
+            else:
+                if (key := self._decode(final)) is None:
+                    return False
+                self._key = key[0]
+                self._state = "colon"
+        elif self._state == "colon":
+            if char != ":":
+                raise ValueError("Expected ':' in SensorThings response")
+            self._pos += 1
+            self._state = "member"
+        elif self._state == "member":
+            if self._key == "value" and char == "[":
+                self._pos += 1
+                self._state = "items"
+            else:
+                if (member := self._decode(final)) is None:
+                    return False
+                self.head[self._key] = member[0]
+                self._state = "key"
+        elif self._state == "items":
+            if char == ",":
+                self._pos += 1
+            elif char == "]":
+                self._pos += 1
+                self._state = "key"
+            else:
+                if (item := self._decode(final)) is None:
+                    return False
+                items.append(item[0])
+        return True
+
+
+def _wire_size(response, default) -> int:
+    """Return the bytes received on the wire, before decompression."""
+    return getattr(response, "num_bytes_downloaded", None) or default
+
+
+async def async_fetch_page(client, url, name="TWFloodSense", metrics=None):
+    """Fetch one page of the SensorThings API.
+
+    ``metrics`` records the request latency, response size and decode time.
+    """
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+        "User-Agent": HA_USER_AGENT,
+    }
+
+    err = {"name": name,}
+
+    try:
+        started = time.perf_counter()
+        response = await client.get(
+            url,
+            headers=headers,
+            timeout=15
+        )
+        if metrics is not None:
+            metrics.record("request_latency", (time.perf_counter() - started) * 1000)
+            metrics.record("response_bytes", _wire_size(response, len(response.content)))
+
+        if response.is_success:
+            started = time.perf_counter()
+            res_data = response.json()
+            if metrics is not None:
+                metrics.record("decode_time", (time.perf_counter() - started) * 1000)
+            return res_data
+        else:
+            err["code"] = response.status_code
+            raise UnexpectedStatusError(err)
+
+    except UnexpectedStatusError:
+        raise
+    except asyncio.TimeoutError as e:
+        err["exception"] = str(e)
+        raise RequestTimeoutError(err) from e
+    except Exception as e:
+        err["exception"] = str(e)
+        raise RequestFailedError(err) from e
+
+
+async def async_iter_pages(
+    client, url, max_pages=MAX_PAGES, name="TWFloodSense", metrics=None
+):
+    """Iterate over response pages, following @iot.nextLink.
+
+    The next page is requested before the current one is yielded, so the
+    network round trip overlaps with parsing the current page.
+    """
+    next_task = asyncio.create_task(async_fetch_page(client, url, name, metrics))
+    pages = 0
+
+    try:
+        while next_task is not None:
+            res_data = await next_task
+            next_task = None
+            pages += 1
+
+            next_link = res_data.get("@iot.nextLink")
+            if next_link and pages < max_pages:
+                next_task = asyncio.create_task(
+                    async_fetch_page(client, next_link, name, metrics)
+                )
+            elif next_link:
+                _LOGGER.warning(
+                    "Stopped following @iot.nextLink after %d pages", pages
+                )
+
+            yield res_data
+    finally:
+        if next_task is not None:
+            next_task.cancel()
+
+
+async def _async_open_stream(client, url, name, metrics):
+    """Send a streamed request and return its context and response.
+
+    The caller must exit the returned context to close the response.
+    """
+    headers = {
+        "Accept": "application/json",
+        "Accept-Encoding": "gzip",
+        "User-Agent": HA_USER_AGENT,
+    }
+    err = {"name": name,}
+
+    try:
+        started = time.perf_counter()
+        context = client.stream("GET", url, headers=headers, timeout=15)
+        response = await context.__aenter__()
+    except asyncio.TimeoutError as e:
+        err["exception"] = str(e)
+        raise RequestTimeoutError(err) from e
+    except Exception as e:
+        err["exception"] = str(e)
+        raise RequestFailedError(err) from e
+
+    if metrics is not None:
+        metrics.record("request_latency", (time.perf_counter() - started) * 1000)
+    if not response.is_success:
+        await context.__aexit__(None, None, None)
+        err["code"] = response.status_code
+        raise UnexpectedStatusError(err)
+    return context, response
+
+
+async def _async_close_pending(task):
+    """Cancel a pending request or close the response it opened."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and task.exception() is None:
+        context, _ = task.result()
+        await context.__aexit__(None, None, None)
+
+
+async def async_iter_values(
+    client,
+    url,
+    max_pages=MAX_PAGES,
+    name="TWFloodSense",
+    metrics=None,
+    offloader=None,
+):
+    """Iterate over the ``value`` items of every page in decoded batches.
+
+    Responses are streamed and decoded incrementally in chunks of
+    STREAM_CHUNK_SIZE decompressed bytes, so memory is bounded by one chunk
+    instead of the whole page. The next page is requested as
+    soon as its @iot.nextLink has been decoded, so its round trip overlaps
+    with the rest of the current page. ``offloader`` moves the decoding of
+    large chunks to the executor. Clients without ``stream`` fall back to
+    buffered pages.
+    """
+    if not hasattr(client, "stream"):
+        async for res_data in async_iter_pages(client, url, max_pages, name, metrics):
+            if value := res_data.get("value"):
+                yield value
+        return
+
+    next_task = asyncio.create_task(_async_open_stream(client, url, name, metrics))
+    pages = 0
+    stopped = False
+
+    def _follow(decoder):
+        """Request the next page once its link is known."""
+        nonlocal next_task, stopped
+        if next_task is not None or stopped:
+            return
+        if not (next_link := decoder.head.get("@iot.nextLink")):
+            return
+        if pages < max_pages:
+            next_task = asyncio.create_task(
+                _async_open_stream(client, next_link, name, metrics)
+            )
+        else:
+            stopped = True
+            _LOGGER.warning("Stopped following @iot.nextLink after %d pages", pages)
+
+    try:
+        while next_task is not None:
+            context, response = await next_task
+            next_task = None
+            pages += 1
+            decoder = ValueStreamDecoder()
+            err = {"name": name,}
+            try:
+                size = 0
+                decode_time = 0.0
+                async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    started = time.perf_counter()
+                    if offloader is not None:
+                        value = await offloader.async_run(
+                            decoder.feed, len(chunk), chunk
+                        )
+                    else:
+                        value = decoder.feed(chunk)
+                    decode_time += time.perf_counter() - started
+                    _follow(decoder)
+                    if value:
+                        yield value
+                    # 同一次網路讀取解壓出的多個區塊之間也讓出 event loop
+                    await asyncio.sleep(0)
+
+                if value := decoder.feed(b"", final=True):
+                    yield value
+                _follow(decoder)
+                if metrics is not None:
+                    metrics.record("response_bytes", _wire_size(response, size))
+                    metrics.record("decode_time", decode_time * 1000)
+
+            except asyncio.TimeoutError as e:
+                err["exception"] = str(e)
+                raise RequestTimeoutError(err) from e
+            except Exception as e:
+                err["exception"] = str(e)
+                raise RequestFailedError(err) from e
+            finally:
+                await context.__aexit__(None, None, None)
+    finally:
+        if next_task is not None:
+            await _async_close_pending(next_task)
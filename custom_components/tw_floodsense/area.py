@@ -0,0 +1,132 @@
+"""Area monitoring for TWFloodSense."""
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+
+from .catalog import EARTH_RADIUS_KM
+from .const import (
+    CONF_AREA_NAME,
+    CONF_LATITUDE,
+    CONF_LONGITUDE,
+    CONF_POLYGON,
+    CONF_RADIUS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_polygon(text) -> list[tuple[float, float]]:
+    """Parse 'lat,lon; lat,lon; ...' into a list of vertices."""
+    vertices = []
+    for point in filter(None, (part.strip() for part in text.split(";"))):
+        lat, lon = (float(value) for value in point.split(","))
+        vertices.append((lat, lon))
+
+    if len(vertices) < 3:
+        raise ValueError("A polygon needs at least 3 vertices")
+    return vertices
+
+
+def haversine_array(latitude, longitude, lats, lons) -> np.ndarray:
+    """Return the distances in km from one point to arrays of points."""
+    phi1 = np.radians(latitude)
+    phi2 = np.radians(lats)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(lons - longitude)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def points_in_polygon(vertices, lats, lons) -> np.ndarray:
+    """Return a mask of the points inside the polygon (ray casting)."""
+    inside = np.zeros(lats.shape, dtype=bool)
+    count = len(vertices)
+    for i in range(count):
+        lat1, lon1 = vertices[i]
+        lat2, lon2 = vertices[(i + 1) % count]
+        if lat1 == lat2:
+            continue
+        crosses = (lats < lat1) != (lats < lat2)
+        lon_cross = lon1 + (lats - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lons < lon_cross)
+    return inside
+
+
+class AreaMonitor:
+    """A monitored area defined by a center and radius or by a polygon."""
+
+    def __init__(self, subentry_id, data):
+        """Initialize the area from its subentry data."""
+        self.subentry_id = subentry_id
+        self.name = data[CONF_AREA_NAME]
+        self.polygon = parse_polygon(data[CONF_POLYGON]) if data.get(CONF_POLYGON) else None
+        if self.polygon:
+            # 多邊形以頂點平均作為參考點
+            self.latitude = sum(lat for lat, _ in self.polygon) / len(self.polygon)
+            self.longitude = sum(lon for _, lon in self.polygon) / len(self.polygon)
+        else:
+            self.latitude = float(data[CONF_LATITUDE])
+            self.longitude = float(data[CONF_LONGITUDE])
+        self.radius = float(data.get(CONF_RADIUS) or 0)
+        # 測站代碼 -> 與參考點的距離 (km)
+        self.members: dict[str, float] = {}
+        self._catalog_version = None
+
+    def update_membership(self, catalog) -> bool:
+        """Recompute the member stations when the catalog changed.
+
+        Returns True if the membership changed.
+        """
+        if self._catalog_version == catalog.version:
+            return False
+        self._catalog_version = catalog.version
+
+        codes, lats, lons = catalog.coordinate_arrays()
+        if not len(codes):
+            members = {}
+        else:
+            distances = haversine_array(self.latitude, self.longitude, lats, lons)
+            if self.polygon:
+                mask = points_in_polygon(self.polygon, lats, lons)
+            else:
+                mask = distances <= self.radius
+            members = {
+                code: float(distance)
+                for code, distance in zip(codes[mask].tolist(), distances[mask].tolist())
+            }
+
+        if members == self.members:
+            return False
+
+        _LOGGER.debug("Area %s now has %d stations", self.name, len(members))
+        self.members = members
+        return True
+
+    def summary(self, data) -> dict:
+        """Aggregate the latest readings of the member stations."""
+        max_depth = None
+        wet_stations = 0
+        nearest = None
+
+        for station_code, distance in self.members.items():
+            if (record := data.get(station_code)) is None:
+                continue
+            try:
+                level = float(record.water_level)
+            except (TypeError, ValueError):
+                continue
+
+            if max_depth is None or level > max_depth:
+                max_depth = level
+            if level > 0:
+                wet_stations += 1
+                if nearest is None or distance < nearest[0]:
+                    nearest = (distance, record)
+
+        return {
+            "max_depth": max_depth,
+            "wet_stations": wet_stations,
+            "nearest_wet_station": nearest,
+        }
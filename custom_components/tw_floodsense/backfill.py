@@ -0,0 +1,71 @@
+"""Long-term statistics backfill for TWFloodSense."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+from homeassistant.components.recorder.models import (
+    StatisticData,
+    StatisticMeanType,
+    StatisticMetaData,
+)
+from homeassistant.components.recorder.statistics import async_import_statistics
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+
+from .const import DOMAIN, SENSOR_INFO
+
+_LOGGER = logging.getLogger(__name__)
+
+WATER_LEVEL = "water_level"
+
+
+def hourly_statistics(observations: list[tuple[datetime, float]]) -> list[StatisticData]:
+    """Aggregate (UTC datetime, level) observations into hourly statistics."""
+    hours: dict[datetime, list[float]] = {}
+    for observed_at, level in observations:
+        start = observed_at.replace(minute=0, second=0, microsecond=0)
+        hours.setdefault(start, []).append(level)
+
+    return [
+        StatisticData(
+            start=start,
+            mean=sum(levels) / len(levels),
+            min=min(levels),
+            max=max(levels),
+        )
+        for start, levels in sorted(hours.items())
+    ]
+
+
+@callback
+def async_import_station_statistics(
+    hass: HomeAssistant,
+    station_code: str,
+    station_name: str | None,
+    observations: list[tuple[datetime, float]],
+) -> int:
+    """Import the observations of one station as water level statistics.
+
+    Returns the number of hourly rows queued for import.
+    """
+    entity_id = er.async_get(hass).async_get_entity_id(
+        "sensor", DOMAIN, f"{DOMAIN}_{station_code}_{WATER_LEVEL}"
+    )
+    if entity_id is None or not (statistics := hourly_statistics(observations)):
+        return 0
+
+    metadata = StatisticMetaData(
+        mean_type=StatisticMeanType.ARITHMETIC,
+        has_sum=False,
+        name=f"{station_name} water level",
+        source="recorder",
+        statistic_id=entity_id,
+        unit_class="distance",
+        unit_of_measurement=SENSOR_INFO[WATER_LEVEL]["unit"],
+    )
+    async_import_statistics(hass, metadata, statistics)
+    _LOGGER.debug(
+        "Queued %d hourly statistics for %s", len(statistics), entity_id
+    )
+    return len(statistics)
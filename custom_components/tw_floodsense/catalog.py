@@ -0,0 +1,232 @@
+"""Nationwide flood sensor catalog for TWFloodSense."""
+from __future__ import annotations
+
+import logging
+import math
+from contextlib import aclosing
+
+import numpy as np
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import async_iter_values
+from .const import (
+    CATALOG_API_URL,
+    CATALOG_DATA_KEY,
+    CATALOG_GRID_SIZE,
+    CATALOG_MAX_PAGES,
+    CATALOG_REFRESH_INTERVAL,
+    CATALOG_STORAGE_KEY,
+    DATASTREAM_SELECT_FIELDS,
+    STORAGE_VERSION,
+    THING_SELECT_FIELDS,
+)
+from .exceptions import DataNotFoundError
+from .metadata import parse_station
+from .transport import async_get_transport
+
+_LOGGER = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine(lat1, lon1, lat2, lon2) -> float:
+    """Return the great-circle distance between two points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+async def async_get_catalog(hass: HomeAssistant) -> StationCatalog:
+    """Return the shared station catalog, loading it from storage."""
+    if (catalog := hass.data.get(CATALOG_DATA_KEY)) is None:
+        catalog = hass.data[CATALOG_DATA_KEY] = StationCatalog(hass)
+    await catalog.async_load()
+    return catalog
+
+
+class StationCatalog:
+    """Catalog of all flood sensors with a grid spatial index.
+
+    The catalog is downloaded once, cached in HA storage and refreshed when
+    older than CATALOG_REFRESH_INTERVAL.
+    """
+
+    def __init__(self, hass, refresh_interval=CATALOG_REFRESH_INTERVAL):
+        """Initialize the catalog."""
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, CATALOG_STORAGE_KEY)
+        self._loaded = False
+        self.refresh_interval = refresh_interval
+        self.stations: dict[str, dict] = {}
+        self.updated_at = None
+        self.version = 0
+        self._grid: dict[tuple[int, int], list[str]] = {}
+        self._names: list[tuple[str, str]] = []
+        self._grams: dict[str, list[int]] = {}
+        self._arrays = None
+
+    async def async_load(self):
+        """Load the catalog from storage."""
+        if self._loaded:
+            return
+
+        if stored := await self._store.async_load():
+            if updated_at := stored.get("updated_at"):
+                self.updated_at = dt_util.parse_datetime(updated_at)
+            self._set_stations(stored.get("stations", {}))
+
+        self._loaded = True
+
+    def is_expired(self) -> bool:
+        """Return True if the catalog should be downloaded again."""
+        return (
+            not self.stations
+            or self.updated_at is None
+            or dt_util.utcnow() - self.updated_at >= self.refresh_interval
+        )
+
+    async def async_ensure_fresh(self):
+        """Download the catalog if it is missing or expired.
+
+        A failed download is only raised when there is no cached catalog.
+        """
+        if not self.is_expired():
+            return
+
+        try:
+            await self.async_download()
+        except Exception as e:
+            if not self.stations:
+                raise
+            _LOGGER.warning("Failed to refresh station catalog, using cache: %s", e)
+
+    async def async_download(self):
+        """Download every flood sensor with pagination and persist it."""
+        url = CATALOG_API_URL.format(
+            datastream_select=",".join(DATASTREAM_SELECT_FIELDS),
+            thing_select=",".join(THING_SELECT_FIELDS),
+        )
+        client = async_get_transport(self.hass)
+
+        stations = {}
+        async with aclosing(
+            async_iter_values(client, url, max_pages=CATALOG_MAX_PAGES)
+        ) as batches:
+            async for value in batches:
+                for data in value:
+                    try:
+                        station = parse_station(data)
+                    except (KeyError, TypeError, IndexError):
+                        continue
+                    if station["stationCode"]:
+                        stations[station["stationCode"]] = station
+
+        if not stations:
+            raise DataNotFoundError({"name": "TWFloodSense catalog"})
+
+        self.updated_at = dt_util.utcnow()
+        self._set_stations(stations)
+        await self._store.async_save(
+            {"updated_at": self.updated_at.isoformat(), "stations": self.stations}
+        )
+        _LOGGER.debug("Downloaded station catalog with %d stations", len(stations))
+
+    def _set_stations(self, stations):
+        """Replace the stations and rebuild the indexes."""
+        self.stations = stations
+        self.version += 1
+        self._arrays = None
+
+        grid: dict[tuple[int, int], list[str]] = {}
+        for station_code, station in stations.items():
+            if (cell := self._cell(station)) is not None:
+                grid.setdefault(cell, []).append(station_code)
+        self._grid = grid
+
+        self._names = sorted(
+            (f"{station.get('stationName') or ''} {station_code}".casefold(), station_code)
+            for station_code, station in stations.items()
+        )
+        # 以單字與雙字索引名稱,搜尋時只需比對共同字元最少的候選
+        grams: dict[str, list[int]] = {}
+        for index, (name, _) in enumerate(self._names):
+            for gram in self._grams_of(name) | set(name):
+                grams.setdefault(gram, []).append(index)
+        self._grams = grams
+
+    @staticmethod
+    def _grams_of(text) -> set[str]:
+        return {text[i : i + 2] for i in range(len(text) - 1)}
+
+    @staticmethod
+    def _cell(station):
+        lat, lon = station.get("latitude"), station.get("longitude")
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            return None
+        return (int(lat // CATALOG_GRID_SIZE), int(lon // CATALOG_GRID_SIZE))
+
+    def coordinate_arrays(self):
+        """Return station codes, latitudes and longitudes as NumPy arrays."""
+        if self._arrays is None:
+            located = [
+                (station_code, station["latitude"], station["longitude"])
+                for station_code, station in self.stations.items()
+                if self._cell(station) is not None
+            ]
+            self._arrays = (
+                np.array([item[0] for item in located], dtype=object),
+                np.array([item[1] for item in located], dtype=float),
+                np.array([item[2] for item in located], dtype=float),
+            )
+        return self._arrays
+
+    def nearby(self, latitude, longitude, radius_km, limit=None) -> list[tuple[float, dict]]:
+        """Return (distance_km, station) pairs within a radius, nearest first."""
+        d_lat = radius_km / 111.0
+        d_lon = radius_km / max(111.32 * math.cos(math.radians(latitude)), 1e-6)
+        lat_cells = range(
+            int((latitude - d_lat) // CATALOG_GRID_SIZE),
+            int((latitude + d_lat) // CATALOG_GRID_SIZE) + 1,
+        )
+        lon_cells = range(
+            int((longitude - d_lon) // CATALOG_GRID_SIZE),
+            int((longitude + d_lon) // CATALOG_GRID_SIZE) + 1,
+        )
+
+        result = []
+        for i in lat_cells:
+            for j in lon_cells:
+                for station_code in self._grid.get((i, j), ()):
+                    station = self.stations[station_code]
+                    distance = haversine(
+                        latitude, longitude, station["latitude"], station["longitude"]
+                    )
+                    if distance <= radius_km:
+                        result.append((distance, station))
+
+        result.sort(key=lambda item: item[0])
+        return result[:limit] if limit else result
+
+    def search(self, query, limit=None) -> list[dict]:
+        """Return the stations whose name or code contains the query."""
+        if not (query := query.strip().casefold()):
+            return []
+
+        postings = [
+            self._grams.get(gram, ()) for gram in self._grams_of(query) or {query}
+        ]
+        result = []
+        for index in min(postings, key=len):
+            name, station_code = self._names[index]
+            if query in name:
+                result.append(self.stations[station_code])
+                if limit and len(result) >= limit:
+                    break
+        return result
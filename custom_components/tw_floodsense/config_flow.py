@@ -7,24 +7,60 @@ from homeassistant.config_entries import (
     ConfigEntry,
     ConfigFlowResult,
     ConfigSubentryFlow,
+    OptionsFlow,
     SubentryFlowResult,
 )
 from homeassistant.core import callback
 from homeassistant.helpers.selector import (
+    BooleanSelector,
+    NumberSelector,
+    NumberSelectorConfig,
+    NumberSelectorMode,
+    SelectOptionDict,
+    SelectSelector,
+    SelectSelectorConfig,
+    SelectSelectorMode,
     TextSelector,
     TextSelectorConfig,
     TextSelectorType,
 )
 
+from .area import parse_polygon
+from .catalog import async_get_catalog
+from .levels import parse_thresholds
 from .const import (
     DOMAIN,
+    CATALOG_SEARCH_LIMIT,
+    CONF_AREA_NAME,
+    CONF_DIAGNOSTIC_SENSORS,
+    CONF_PARSE_OFFLOAD,
+    CONF_LATITUDE,
+    CONF_LONGITUDE,
+    CONF_POLYGON,
+    CONF_PUSH,
+    CONF_SHARD_BY,
+    CONF_QUERY,
+    CONF_RADIUS,
     CONF_STATION_CODE,
     CONF_STATION_ID,
     CONF_STATION_NAME,
+    CONF_THRESHOLDS,
+    DEFAULT_LEVEL_THRESHOLDS,
+    SHARD_BY_NONE,
+    SHARD_BY_OPTIONS,
 )
 
 _LOGGER = logging.getLogger(__name__)
 TEXT_SELECTOR = TextSelector(TextSelectorConfig(type=TextSelectorType.TEXT))
+RADIUS_SELECTOR = NumberSelector(
+    NumberSelectorConfig(
+        min=0.5,
+        max=50,
+        step=0.5,
+        unit_of_measurement="km",
+        mode=NumberSelectorMode.BOX,
+    )
+)
 
 
 class TWFloodSenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -83,6 +119,12 @@ class TWFloodSenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Return the options flow."""
+        return TWFloodSenseOptionsFlow()
+
     @classmethod
     @callback
     def async_get_supported_subentry_types(
@@ -92,16 +134,231 @@ class TWFloodSenseConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Return subentries supported by this integration."""
         return {
             "floodsense": FloodSenseSubentryFlowHandler,
+            "area": AreaSubentryFlowHandler,
         }
 
 
+class TWFloodSenseOptionsFlow(OptionsFlow):
+    """Handle the options for TWFloodSense."""
+
+    async def async_step_init(self, user_input=None) -> ConfigFlowResult:
+        """Manage the update mode, level thresholds, sharding and diagnostics."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            try:
+                parse_thresholds(user_input.get(CONF_THRESHOLDS))
+            except ValueError:
+                errors["base"] = "invalid_thresholds"
+            else:
+                return self.async_create_entry(data=user_input)
+
+        schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_PUSH,
+                    default=self.config_entry.options.get(CONF_PUSH, False),
+                ): BooleanSelector(),
+                vol.Optional(
+                    CONF_THRESHOLDS,
+                    default=self.config_entry.options.get(
+                        CONF_THRESHOLDS, DEFAULT_LEVEL_THRESHOLDS
+                    ),
+                ): TEXT_SELECTOR,
+                vol.Required(
+                    CONF_SHARD_BY,
+                    default=self.config_entry.options.get(CONF_SHARD_BY, SHARD_BY_NONE),
+                ): SelectSelector(
+                    SelectSelectorConfig(
+                        options=list(SHARD_BY_OPTIONS),
+                        mode=SelectSelectorMode.DROPDOWN,
+                        translation_key=CONF_SHARD_BY,
+                    )
+                ),
+                vol.Required(
+                    CONF_DIAGNOSTIC_SENSORS,
+                    default=self.config_entry.options.get(CONF_DIAGNOSTIC_SENSORS, False),
+                ): BooleanSelector(),
+                vol.Required(
+                    CONF_PARSE_OFFLOAD,
+                    default=self.config_entry.options.get(CONF_PARSE_OFFLOAD, False),
+                ): BooleanSelector(),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=schema,
+            errors=errors,
+        )
+
+
 class FloodSenseSubentryFlowHandler(ConfigSubentryFlow):
     """Handle subentry flow for adding flood sense stations."""
 
+    def __init__(self) -> None:
+        """Initialize the subentry flow."""
+        self._catalog = None
+        self._candidates: dict[str, str] = {}
+
     async def async_step_floodsense(
         self, user_input: dict[str, Any] | None = None
     ) -> SubentryFlowResult:
-        """Flood sense flow to add a new flood sense sensor."""
+        """Flood sense flow to choose how to find the station."""
+        return self.async_show_menu(
+            step_id="floodsense",
+            menu_options=["nearby", "search", "manual"],
+        )
+
+    async def _async_get_catalog(self):
+        """Return the station catalog, downloading it when needed."""
+        if self._catalog is None:
+            catalog = await async_get_catalog(self.hass)
+            await catalog.async_ensure_fresh()
+            self._catalog = catalog
+        return self._catalog
+
+    def _set_candidates(self, stations) -> None:
+        """Store the stations to offer, skipping configured ones."""
+        configured = {
+            subentry.unique_id for subentry in self._get_entry().subentries.values()
+        }
+        self._candidates = {}
+        for distance, station in stations:
+            station_code = station["stationCode"]
+            if station_code in configured:
+                continue
+            label = f"{station['stationName']}({station_code})"
+            if distance is not None:
+                label = f"{label} - {distance:.1f} km"
+            self._candidates[station_code] = label
+
+    async def async_step_nearby(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Find stations within a radius of the home location."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            try:
+                catalog = await self._async_get_catalog()
+            except Exception as e:
+                _LOGGER.error("Failed to load station catalog: %s", e)
+                errors["base"] = "cannot_connect"
+            else:
+                self._set_candidates(
+                    catalog.nearby(
+                        self.hass.config.latitude,
+                        self.hass.config.longitude,
+                        user_input[CONF_RADIUS],
+                        limit=CATALOG_SEARCH_LIMIT,
+                    )
+                )
+                if self._candidates:
+                    return await self.async_step_select_station()
+                errors["base"] = "no_stations_nearby"
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_RADIUS, default=3): RADIUS_SELECTOR,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="nearby",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_search(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Find stations by name or code."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            try:
+                catalog = await self._async_get_catalog()
+            except Exception as e:
+                _LOGGER.error("Failed to load station catalog: %s", e)
+                errors["base"] = "cannot_connect"
+            else:
+                self._set_candidates(
+                    (None, station)
+                    for station in catalog.search(
+                        user_input[CONF_QUERY], limit=CATALOG_SEARCH_LIMIT
+                    )
+                )
+                if self._candidates:
+                    return await self.async_step_select_station()
+                errors["base"] = "no_search_results"
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_QUERY): TEXT_SELECTOR,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="search",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_select_station(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Select one of the found stations."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            station_code = user_input[CONF_STATION_CODE]
+            station = self._catalog.stations[station_code]
+            station_name = station["stationName"]
+            thresholds = user_input.get(CONF_THRESHOLDS, "")
+
+            try:
+                parse_thresholds(thresholds)
+            except ValueError:
+                errors["base"] = "invalid_thresholds"
+            else:
+                return self.async_create_entry(
+                    title=f"{station_name}({station_code})",
+                    data={
+                        CONF_STATION_NAME: station_name,
+                        CONF_STATION_ID: station["stationID"],
+                        CONF_STATION_CODE: station_code,
+                        CONF_THRESHOLDS: thresholds,
+                    },
+                    unique_id=str(station_code),
+                )
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_STATION_CODE): SelectSelector(
+                    SelectSelectorConfig(
+                        options=[
+                            SelectOptionDict(value=station_code, label=label)
+                            for station_code, label in self._candidates.items()
+                        ],
+                        mode=SelectSelectorMode.DROPDOWN,
+                    )
+                ),
+                # 留空時使用整合設定中的全域門檻
+                vol.Optional(CONF_THRESHOLDS, default=""): TEXT_SELECTOR,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="select_station",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async def async_step_manual(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Flood sense flow to add a new flood sense sensor by hand."""
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -116,24 +373,82 @@ class FloodSenseSubentryFlowHandler(ConfigSubentryFlow):
             elif not station_code:
                 errors["base"] = "no_station_code"
             else:
-                return self.async_create_entry(
-                    title=f"{station_name}({station_code})",
-                    data=user_input,
-                    unique_id=str(station_code),
-                )
+                try:
+                    parse_thresholds(user_input.get(CONF_THRESHOLDS))
+                except ValueError:
+                    errors["base"] = "invalid_thresholds"
+                else:
+                    return self.async_create_entry(
+                        title=f"{station_name}({station_code})",
+                        data=user_input,
+                        unique_id=str(station_code),
+                    )
 
         schema = vol.Schema(
             {
                 vol.Required(CONF_STATION_NAME): TEXT_SELECTOR,
                 vol.Required(CONF_STATION_ID): TEXT_SELECTOR,
                 vol.Required(CONF_STATION_CODE): TEXT_SELECTOR,
+                vol.Optional(CONF_THRESHOLDS, default=""): TEXT_SELECTOR,
             }
         )
 
         return self.async_show_form(
-            step_id="floodsense",
+            step_id="manual",
             data_schema=schema,
             errors=errors,
         )
     
     async_step_user = async_step_floodsense
+
+
+class AreaSubentryFlowHandler(ConfigSubentryFlow):
+    """Handle subentry flow for adding monitored areas."""
+
+    async def async_step_area(
+        self, user_input: dict[str, Any] | None = None
+    ) -> SubentryFlowResult:
+        """Area flow to monitor every station in a circle or polygon."""
+        errors: dict[str, str] = {}
+
+        if user_input is not None:
+            area_name = user_input.get(CONF_AREA_NAME, "").strip()
+            polygon = user_input.get(CONF_POLYGON, "").strip()
+
+            if not area_name:
+                errors["base"] = "no_area_name"
+            else:
+                try:
+                    # 有填多邊形時改用多邊形範圍
+                    if polygon:
+                        parse_polygon(polygon)
+                except ValueError:
+                    errors["base"] = "invalid_polygon"
+                else:
+                    return self.async_create_entry(
+                        title=area_name,
+                        data={**user_input, CONF_AREA_NAME: area_name, CONF_POLYGON: polygon},
+                        unique_id=f"area_{area_name}",
+                    )
+
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_AREA_NAME): TEXT_SELECTOR,
+                vol.Required(
+                    CONF_LATITUDE, default=self.hass.config.latitude
+                ): vol.Coerce(float),
+                vol.Required(
+                    CONF_LONGITUDE, default=self.hass.config.longitude
+                ): vol.Coerce(float),
+                vol.Required(CONF_RADIUS, default=3): RADIUS_SELECTOR,
+                vol.Optional(CONF_POLYGON, default=""): TEXT_SELECTOR,
+            }
+        )
+
+        return self.async_show_form(
+            step_id="area",
+            data_schema=schema,
+            errors=errors,
+        )
+
+    async_step_user = async_step_area
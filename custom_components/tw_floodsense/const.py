@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
 from homeassistant.const import Platform
 
@@ -6,15 +8,132 @@ CONF_STATION_CODE = "station_code"
 CONF_STATION_NAME = "station_name"
 CONF_STATION_ID = "station_id"
 CONF_THING_ID = "thing_id"
+CONF_RADIUS = "radius"
+CONF_QUERY = "query"
+CONF_AREA_NAME = "area_name"
+CONF_LATITUDE = "latitude"
+CONF_LONGITUDE = "longitude"
+CONF_POLYGON = "polygon"
+CONF_PUSH = "push"
+CONF_SHARD_BY = "shard_by"
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+CONF_PARSE_OFFLOAD = "parse_offload"
+CONF_THRESHOLDS = "thresholds"
 FLOODSENSE_COORDINATOR = "floodsense_coordinator"
 
 API_BASE_URL = "https://sta.ci.taiwan.gov.tw/STA_WaterResource_v2/v1.0"
 API_FILTER_PARAMS = f"substringof('stationID={{stationID}}',description)"
-THING_DATA_API_URL = f"{API_BASE_URL}/Things?$filter=(properties/stationCode eq '{{station_code}}')"
+THING_DATA_API_URL = f"{API_BASE_URL}/Things?$filter=({{filter_params}})&$select=properties"
+THING_FILTER_PARAMS = "properties/stationCode eq '{station_code}'"
 STATION_DATA_API_URL = (
     f"{API_BASE_URL}/Datastreams?$filter=({{filter_params}}) and name eq '淹水深度'"
-    f"&$expand=Thing,Observations($orderby=phenomenonTime desc;$top=1)"
+    f"&$select={{datastream_select}}&$expand=Thing($select={{thing_select}})"
+)
+DATASTREAM_FILTER_PARAMS = "id eq {datastream_id}"
+OBSERVATION_DATA_API_URL = (
+    f"{API_BASE_URL}/Datastreams?$filter={{filter_params}}&$select=id"
+    f"&$expand=Observations({{observation_filter}}$select={{observation_select}};"
+    f"$orderby=phenomenonTime desc;$top=1)"
+)
+INCREMENTAL_FILTER_PARAMS = "$filter=phenomenonTime gt {phenomenon_time};"
+HISTORY_DATA_API_URL = (
+    f"{API_BASE_URL}/Datastreams({{datastream_id}})/Observations"
+    f"?$filter=phenomenonTime ge {{start}} and phenomenonTime lt {{end}}"
+    f"&$select={{observation_select}}&$orderby=phenomenonTime asc&$top=1000"
+)
+CATALOG_API_URL = (
+    f"{API_BASE_URL}/Datastreams?$filter=name eq '淹水深度'"
+    f"&$select={{datastream_select}}&$expand=Thing($select={{thing_select}})&$top=1000"
+)
+# 只請求解析時會用到的欄位
+DATASTREAM_SELECT_FIELDS = ("id", "observedArea")
+THING_SELECT_FIELDS = ("id", "properties")
+OBSERVATION_SELECT_FIELDS = ("result", "phenomenonTime")
+# 測站靜態資料的快取與更新間隔
+STORAGE_VERSION = 1
+METADATA_STORAGE_KEY = f"{DOMAIN}.{{entry_id}}.metadata"
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.{{entry_id}}.snapshot"
+STATION_ID_STORAGE_KEY = f"{DOMAIN}.station_ids"
+SNAPSHOT_SAVE_DELAY = 10
+METADATA_REFRESH_INTERVAL = timedelta(days=1)
+# 靜態資料更新失敗或不完整時,隔這段時間才再次完整更新
+METADATA_RETRY_INTERVAL = timedelta(hours=1)
+# 每批最多查詢的測站數與 $filter 長度上限,避免 URL 過長
+STATION_BATCH_SIZE = 25
+STATION_BATCH_MAX_FILTER_LENGTH = 2000
+MAX_CONCURRENT_REQUESTS = 4
+MAX_PAGES = 50
+# 串流解碼時每次交給解碼器的位元組數,限制單次解碼佔用 event loop 的時間
+STREAM_CHUNK_SIZE = 65536
+# SensorThings MQTT 推播
+MQTT_HOST = "sta.ci.taiwan.gov.tw"
+MQTT_PORT = 1883
+MQTT_KEEPALIVE = 60
+MQTT_TOPIC = "v1.0/Datastreams({datastream_id})/Observations"
+MQTT_RECONNECT_MIN_DELAY = 1
+MQTT_RECONNECT_MAX_DELAY = 120
+# 推播連線時的輪詢間隔,作為漏接訊息的保險
+PUSH_POLL_INTERVAL = timedelta(minutes=30)
+# 測站分片:依管理單位或地理網格分給不同的 coordinator
+SHARD_BY_NONE = "none"
+SHARD_BY_AUTHORITY = "authority"
+SHARD_BY_REGION = "region"
+SHARD_BY_OPTIONS = (SHARD_BY_NONE, SHARD_BY_AUTHORITY, SHARD_BY_REGION)
+DEFAULT_SHARD = "default"
+AREA_SHARD = "area"
+SHARD_REGION_GRID_SIZE = 0.5  # 度
+SHARD_STAGGER_DELAY = 15  # 秒
+# 全台測站目錄的快取與空間索引
+CATALOG_DATA_KEY = f"{DOMAIN}_catalog"
+CATALOG_STORAGE_KEY = f"{DOMAIN}.catalog"
+CATALOG_REFRESH_INTERVAL = timedelta(days=7)
+CATALOG_GRID_SIZE = 0.05  # 度
+CATALOG_MAX_PAGES = 200
+CATALOG_SEARCH_LIMIT = 50
+# 補齊長期統計資料的最長時間範圍
+BACKFILL_MAX_WINDOW = timedelta(days=7)
+# 依水位狀態分層的輪詢間隔
+TIER_IDLE = "idle"
+TIER_WET = "wet"
+TIER_RISING = "rising"
+POLL_TIER_INTERVALS = {
+    TIER_IDLE: timedelta(minutes=20),
+    TIER_WET: timedelta(minutes=5),
+    TIER_RISING: timedelta(minutes=1),
+}
+POLL_DUE_SLACK = timedelta(seconds=15)
+# 最高水位的時間窗(秒),保留的觀測筆數為最快輪詢間隔下窗內筆數的兩倍,容納額外的推播觀測
+HISTORY_PEAK_WINDOW = 3600
+HISTORY_SIZE = 2 * int(
+    HISTORY_PEAK_WINDOW / min(POLL_TIER_INTERVALS.values()).total_seconds()
 )
+RISING_RATE_THRESHOLD = 0.1  # cm/min
+TIER_DEMOTION_COUNT = 3
+# 重試、斷路器與通知頻率(秒)
+RETRY_MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 30.0
+RETRY_DEADLINE = 240.0
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_COOLDOWN = 900.0
+NOTIFICATION_INTERVAL = 3600.0
+DATETIME_CACHE_SIZE = 256
+# 除錯日誌只取樣部分回應內容
+DEBUG_LOG_SAMPLE_EVERY = 10
+DEBUG_LOG_SAMPLE_ITEMS = 3
+DEBUG_LOG_MAX_CHARS = 2000
+# 水位區間變化事件:門檻(cm)、下降時的遲滯量(cm)與需連續確認的觀測筆數
+EVENT_LEVEL_CHANGED = f"{DOMAIN}_level_changed"
+DEFAULT_LEVEL_THRESHOLDS = "10, 30, 50"
+LEVEL_HYSTERESIS = 2.0
+LEVEL_DEBOUNCE_COUNT = 2
+# 輪詢各階段量測保留的樣本數
+METRICS_WINDOW = 100
+# 預估耗時超過此值(秒)的解碼與解析改在 executor 執行
+OFFLOAD_TARGET_LAG = 0.005
+OFFLOAD_SMOOTHING = 0.2
+# 可替換的 HTTP 傳輸層 (錄製/重播)
+TRANSPORT_DATA_KEY = f"{DOMAIN}_transport"
 HA_USER_AGENT = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
     "(KHTML, like Gecko) HomeAssistant/HA-TWFloodSense"
@@ -31,3 +150,89 @@ SENSOR_INFO = {
         "icon": "mdi:water-alert",
     },
 }
+
+HISTORY_SENSOR_INFO = {
+    "rise_rate": {
+        "device_class": None,
+        "unit": "cm/10min",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 2,
+        "icon": "mdi:trending-up",
+    },
+    "peak_1h": {
+        "device_class": SensorDeviceClass.PRECIPITATION,
+        "unit": "cm",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 2,
+        "icon": "mdi:waves-arrow-up",
+    },
+    "minutes_since_dry": {
+        "device_class": SensorDeviceClass.DURATION,
+        "unit": "min",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 0,
+        "icon": "mdi:timer-sand",
+    },
+}
+
+AREA_SENSOR_INFO = {
+    "max_depth": {
+        "device_class": SensorDeviceClass.PRECIPITATION,
+        "unit": "cm",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 2,
+        "icon": "mdi:waves",
+    },
+    "wet_stations": {
+        "device_class": None,
+        "unit": None,
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 0,
+        "icon": "mdi:map-marker-alert",
+    },
+    "nearest_wet_station": {
+        "device_class": SensorDeviceClass.DISTANCE,
+        "unit": "km",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 2,
+        "icon": "mdi:map-marker-distance",
+    },
+}
+
+METRIC_SENSOR_INFO = {
+    "poll_duration": {
+        "device_class": SensorDeviceClass.DURATION,
+        "unit": "ms",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 0,
+        "icon": "mdi:timer-outline",
+    },
+    "request_latency": {
+        "device_class": SensorDeviceClass.DURATION,
+        "unit": "ms",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 0,
+        "icon": "mdi:lan-pending",
+    },
+    "decode_time": {
+        "device_class": SensorDeviceClass.DURATION,
+        "unit": "ms",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 1,
+        "icon": "mdi:code-json",
+    },
+    "parse_time": {
+        "device_class": SensorDeviceClass.DURATION,
+        "unit": "ms",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 1,
+        "icon": "mdi:cog-outline",
+    },
+    "response_bytes": {
+        "device_class": SensorDeviceClass.DATA_SIZE,
+        "unit": "B",
+        "state_class": SensorStateClass.MEASUREMENT,
+        "display_precision": 0,
+        "icon": "mdi:download-network-outline",
+    },
+}
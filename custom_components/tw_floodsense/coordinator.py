@@ -3,142 +3,272 @@ from __future__ import annotations
 import asyncio
 import functools
 import logging
-import random
+import time
 from abc import ABC, abstractmethod
-from datetime import timedelta
+from contextlib import aclosing
+from types import MappingProxyType
 from typing import (
     Any,
     Callable,
     TypeVar,
 )
 
+from homeassistant.core import callback
 from homeassistant.exceptions import ConfigEntryAuthFailed
-from homeassistant.helpers.httpx_client import get_async_client
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
 from homeassistant.util.dt import as_local, parse_datetime
 
 from .const import (
     DOMAIN,
-    HA_USER_AGENT,
+    HISTORY_DATA_API_URL,
     API_FILTER_PARAMS,
+    INCREMENTAL_FILTER_PARAMS,
+    METADATA_REFRESH_INTERVAL,
+    BACKFILL_MAX_WINDOW,
+    DATASTREAM_FILTER_PARAMS,
+    DATASTREAM_SELECT_FIELDS,
+    DATETIME_CACHE_SIZE,
+    DEBUG_LOG_MAX_CHARS,
+    DEBUG_LOG_SAMPLE_EVERY,
+    DEBUG_LOG_SAMPLE_ITEMS,
+    MAX_CONCURRENT_REQUESTS,
+    OBSERVATION_DATA_API_URL,
+    OBSERVATION_SELECT_FIELDS,
+    PUSH_POLL_INTERVAL,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_KEY,
+    STATION_BATCH_MAX_FILTER_LENGTH,
+    STATION_BATCH_SIZE,
     STATION_DATA_API_URL,
+    STORAGE_VERSION,
+    THING_SELECT_FIELDS,
 )
 from .exceptions import (
     ApiAuthError,
+    CircuitOpenError,
     DataNotFoundError,
     RecordNotFoundError,
     RequestFailedError,
     RequestTimeoutError,
     UnexpectedStatusError,
 )
+from .api import async_iter_values
+from .backfill import async_import_station_statistics
+from .history import ObservationHistory
+from .metrics import PollMetrics
+from .metadata import parse_station
+from .models import StationRecord
+from .offload import AdaptiveOffloader
+from .retry import STATE_HALF_OPEN, CircuitBreaker, NotificationLimiter, RetryPolicy
+from .scheduler import PollScheduler
+from .transport import async_get_transport
 
 _LOGGER = logging.getLogger(__name__)
 F = TypeVar("F", bound=Callable[..., Any])
 
 
-def retry_on_failure(max_retries: int = 5):
-    """Retry decorator for coroutine functions."""
+def retry_on_failure():
+    """Retry decorator for coroutine functions.
+
+    Uses the coordinator's retry policy, circuit breaker and notification
+    limiter. The attempts and the sleeps between them share one deadline.
+    """
     def decorator(func: F) -> F:
         @functools.wraps(func)
         async def wrapper(self, *args, **kwargs):
+            breaker = self.circuit_breaker
+            policy = self.retry_policy
+
+            if not breaker.allow_request():
+                raise CircuitOpenError({"remaining": round(breaker.remaining)})
+
             last_error = {"name": "Unknown"}
+            # 重試必須在下一次更新前結束
+            deadline = policy.deadline
+            if self.update_interval:
+                deadline = min(deadline, self.update_interval.total_seconds() * 0.8)
+            # 半開狀態只送出一次探測請求
+            max_attempts = 1 if breaker.state == STATE_HALF_OPEN else policy.max_attempts
+            started = policy.clock()
 
-            for attempt in range(max_retries):
+            for attempt in range(max_attempts):
+                self.retries_used = attempt
+                # 單次嘗試也受截止時間限制,避免多個逾時的批次拖過下一次更新
+                remaining = deadline - (policy.clock() - started)
                 try:
-                    return await func(self, *args, **kwargs)
+                    async with asyncio.timeout(remaining):
+                        result = await func(self, *args, **kwargs)
+                    if breaker.record_success():
+                        self._async_circuit_recovered()
+                    return result
                 except ApiAuthError:
                     raise
+                except TimeoutError as e:
+                    last_error = RequestTimeoutError(
+                        {"name": "TWFloodSense", "exception": str(e)}
+                    )
+                    _LOGGER.warning(
+                        "Update did not finish within the %.0f second deadline "
+                        "(%d/%d)",
+                        deadline,
+                        attempt + 1,
+                        max_attempts,
+                    )
+                    break
                 except DataNotFoundError as e:
                     last_error = e
                     _LOGGER.warning(
                         "No valid data found in the %s API response. "
-                        "Retrying... (%d/5)",
+                        "Retrying... (%d/%d)",
                         e["name"],
                         attempt + 1,
+                        max_attempts,
                     )
                 except RecordNotFoundError as e:
                     last_error = e
                     _LOGGER.warning(
                         "No records found in the Site API response. "
-                        "Retrying... (%d/5)",
+                        "Retrying... (%d/%d)",
                         attempt + 1,
+                        max_attempts,
                     )
                 except UnexpectedStatusError as e:
                     last_error = e
                     _LOGGER.warning(
                         "%s API returned unexpected status code: %s. "
-                        "Retrying... (%d/5)",
+                        "Retrying... (%d/%d)",
                         e["name"],
                         e["code"],
                         attempt + 1,
+                        max_attempts,
                     )
                 except RequestTimeoutError as e:
                     last_error = e
                     _LOGGER.warning(
-                        "%s API Request timed out: %s. Retrying... (%d/5)",
+                        "%s API Request timed out: %s. Retrying... (%d/%d)",
                         e["name"],
                         e["exception"],
                         attempt + 1,
+                        max_attempts,
                     )
                 except RequestFailedError as e:
                     last_error = e
                     _LOGGER.warning(
-                        "%s API Request failed: %s. Retrying... (%d/5)",
+                        "%s API Request failed: %s. Retrying... (%d/%d)",
                         e["name"],
                         e["exception"],
                         attempt + 1,
+                        max_attempts,
                     )
 
-                if attempt < (max_retries - 1):
-                    await asyncio.sleep(random.uniform(5, 15))
-
-            await self.hass.services.async_call(
-                "notify",
-                "persistent_notification",
-                {
-                    "message": (
-                        f"Failed to fetch data after 5 attempts "
-                        f"in the {last_error['name']} API."
-                    ),
-                    "title": "TWFloodSense Error",
-                },
-            )
+                if attempt + 1 >= max_attempts:
+                    break
+                if (delay := policy.next_delay(attempt, started, deadline)) is None:
+                    _LOGGER.debug("Retry deadline of %.0f seconds reached", deadline)
+                    break
+                await asyncio.sleep(delay)
+
+            breaker.record_failure()
+
+            if self.notification_limiter.allow():
+                await self.hass.services.async_call(
+                    "notify",
+                    "persistent_notification",
+                    {
+                        "message": (
+                            f"Failed to fetch data after {self.retries_used + 1} "
+                            f"attempts in the {last_error['name']} API."
+                        ),
+                        "title": "TWFloodSense Error",
+                    },
+                )
             return None
         return wrapper
     return decorator
 
 
+@functools.lru_cache(maxsize=DATETIME_CACHE_SIZE)
+def _convert_datetime(datetime_str):
+    """Convert a raw phenomenonTime to a local datetime and its string."""
+    local_dt = as_local(parse_datetime(datetime_str))
+    return local_dt, local_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_datetime(datetime_str):
+    """Parse datetime string and return the local datetime and its string."""
+    if not datetime_str:
+        return None, "unknown"
+
+    try:
+        return _convert_datetime(datetime_str)
+    except Exception as e:
+        _LOGGER.error("Error parsing datetime: %s", e)
+        return None, "unknown"
+
+
+def _is_newer(record, other) -> bool:
+    """Return True if a record holds a later observation than another."""
+    return (
+        record.update_datetime is not None
+        and (other.update_datetime is None or record.update_datetime > other.update_datetime)
+    )
+
+
 class baseCoordinator(DataUpdateCoordinator, ABC):
     """Base class to manage fetching data from the API."""
 
-    def __init__(self, hass, name, update_interval):
+    def __init__(
+        self,
+        hass,
+        name,
+        update_interval,
+        config_entry=None,
+        retry_policy=None,
+        circuit_breaker=None,
+    ):
         """Initialize the coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name=name,
             update_interval=update_interval,
+            config_entry=config_entry,
         )
         self.hass = hass
-        self.client = get_async_client(hass, False)
+        self.client = async_get_transport(hass)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.notification_limiter = NotificationLimiter()
+        self.retries_used = 0
+        self.metrics = PollMetrics()
 
     async def _async_update_data(self):
         """Fetch data from API."""
         try:
             data = await self._get_data_with_retry()
-            if data:
+            # 空的結果 (如沒有測站的區域) 仍是成功的更新,None 才代表失敗
+            if data is not None:
                 return data
             else:
                 raise UpdateFailed("No data received from API")
         except ApiAuthError:
             raise ConfigEntryAuthFailed("API key expired or invalid")
+        except CircuitOpenError as e:
+            raise UpdateFailed(
+                f"Requests paused after repeated failures, retrying in {e['remaining']}s"
+            ) from e
         except Exception as e:
             raise UpdateFailed(f"Unexpected error during data update: {e}") from e
     
-    @retry_on_failure(max_retries=5)
+    @retry_on_failure()
     async def _get_data_with_retry(self, *args, **kwargs):
         """Fetch data from API with retry."""
         return await self._get_data(*args, **kwargs)
+
+    def _async_circuit_recovered(self):
+        """Handle the API recovering after the circuit breaker was open."""
     
     @abstractmethod
     async def _get_data(self, *args, **kwargs):
@@ -148,148 +278,868 @@ class baseCoordinator(DataUpdateCoordinator, ABC):
 class FloodSenseCoordinator(baseCoordinator):
     """Class to manage fetching data from the flood sense API."""
 
-    def __init__(self, hass, station_codes, station_ids):
+    def __init__(
+        self,
+        hass,
+        config_entry,
+        station_codes,
+        station_ids,
+        metadata,
+        batch_size=STATION_BATCH_SIZE,
+        max_concurrency=MAX_CONCURRENT_REQUESTS,
+        retry_policy=None,
+        circuit_breaker=None,
+        areas=None,
+        catalog=None,
+        shard=None,
+        snapshot_store=None,
+        snapshot_data=None,
+        offload=False,
+        levels=None,
+    ):
+        self.scheduler = PollScheduler()
+        self.shard = shard
+
         super().__init__(
             hass,
-            name=f"{DOMAIN}_floodsense",
-            update_interval=timedelta(minutes=5),
+            name=f"{DOMAIN}_floodsense" + (f"_{shard}" if shard else ""),
+            update_interval=self.scheduler.interval,
+            config_entry=config_entry,
+            retry_policy=retry_policy,
+            circuit_breaker=circuit_breaker,
         )
 
         self.station_codes = station_codes
         self.station_ids = station_ids
+        self.metadata = metadata
+        self.areas = areas or {}
+        self.catalog = catalog
+        self.push = None
+        self.levels = levels
+        self._build_station_index()
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.stale = False
+        self.changed_stations: set[str] = set()
+        self._unresolved: set[str] = set()
+        self.histories: dict[str, ObservationHistory] = {}
+        self.state_writes = 0
+        self._pages_parsed = 0
+        # 大型回應的解碼與解析依實測耗時改在 executor 執行
+        self.decode_offloader = AdaptiveOffloader(hass, enabled=offload)
+        self.parse_offloader = AdaptiveOffloader(hass, enabled=offload)
+        self._cache_time_zone = None
+        # 分片共用同一個快照,由 manager 合併所有分片的資料
+        self._snapshot_store = snapshot_store or Store(
+            hass,
+            STORAGE_VERSION,
+            SNAPSHOT_STORAGE_KEY.format(entry_id=config_entry.entry_id),
+        )
+        self._get_snapshot_data = snapshot_data or self._snapshot_data
+
+    def _build_station_index(self):
+        """Build the station lookups keyed by stationCode and stationID."""
+        self._station_index = dict(zip(self.station_codes, self.station_ids))
+        # 監測區域內的測站一併輪詢
+        for area in self.areas.values():
+            for station_code in area.members:
+                if station_code not in self._station_index:
+                    self._station_index[station_code] = self.catalog.stations[
+                        station_code
+                    ]["stationID"]
+        self._station_id_index = {
+            station_id: station_code
+            for station_code, station_id in self._station_index.items()
+        }
+        self._datastream_index = None
+        self._datastream_index_version = None
+
+    def add_stations(self, station_codes=(), station_ids=(), areas=None):
+        """Add configured stations and monitored areas in place.
+
+        The new stations have no poll schedule yet, so the next refresh only
+        fetches them.
+        """
+        for station_code, station_id in zip(station_codes, station_ids):
+            if station_code not in self.station_codes:
+                self.station_codes = [*self.station_codes, station_code]
+                self.station_ids = [*self.station_ids, station_id]
+
+        for subentry_id, area in (areas or {}).items():
+            if self.catalog is not None:
+                area.update_membership(self.catalog)
+            self.areas[subentry_id] = area
+
+        self._build_station_index()
+        self._update_push_subscriptions()
+
+    def remove_stations(self, station_codes=(), area_ids=()):
+        """Remove configured stations and monitored areas in place."""
+        removed = set(station_codes)
+        keep = [
+            (station_code, station_id)
+            for station_code, station_id in zip(self.station_codes, self.station_ids)
+            if station_code not in removed
+        ]
+        self.station_codes = [station_code for station_code, _ in keep]
+        self.station_ids = [station_id for _, station_id in keep]
+        for subentry_id in area_ids:
+            self.areas.pop(subentry_id, None)
+
+        self._build_station_index()
+        self._update_push_subscriptions()
+
+        # 不再輪詢的測站一併清除狀態
+        dropped = {
+            station_code
+            for station_code in (self.data or {})
+            if station_code not in self._station_index
+        }
+        dropped |= self._unresolved - self._station_index.keys()
+        self._unresolved &= self._station_index.keys()
+        for station_code in dropped:
+            self.scheduler.remove(station_code)
+            self.histories.pop(station_code, None)
+        if dropped:
+            self.changed_stations = dropped
+            self.data = {
+                station_code: record
+                for station_code, record in (self.data or {}).items()
+                if station_code not in dropped
+            }
+            self.async_update_listeners()
+
+    def as_diagnostics(self) -> dict:
+        """Return the state and metrics of this coordinator."""
+        return {
+            "name": self.name,
+            "shard": self.shard,
+            "stations": len(self._station_index),
+            "areas": len(self.areas),
+            "unresolved_stations": sorted(self._unresolved),
+            "last_update_success": self.last_update_success,
+            "update_interval": str(self.update_interval),
+            "stale": self.stale,
+            "circuit_breaker": self.circuit_breaker.state,
+            "tiers": {
+                station_code: self.scheduler.tier(station_code)
+                for station_code in self._station_index
+            },
+            "push_connected": self.push.connected if self.push is not None else None,
+            "offload": {
+                "enabled": self.parse_offloader.enabled,
+                "parse_threshold_items": self.parse_offloader.threshold,
+                "parse_offloaded": self.parse_offloader.offloaded,
+                "decode_threshold_bytes": self.decode_offloader.threshold,
+                "decode_offloaded": self.decode_offloader.offloaded,
+            },
+            "metrics": self.metrics.as_dict(),
+        }
+
+    def _get_datastream_index(self) -> dict:
+        """Return the cached Datastream ID to station code index."""
+        if self._datastream_index_version != self.metadata.version:
+            self._datastream_index = self.metadata.datastream_index(self._station_index)
+            self._datastream_index_version = self.metadata.version
+        return self._datastream_index
+
+    async def _async_setup(self):
+        """Load the cached station metadata before the first refresh."""
+        await self.metadata.async_load()
+
+    async def _async_update_data(self):
+        """Fetch data from API and reset the per-cycle change tracking."""
+        # 上一輪的實體寫入次數在此時才完整
+        if self.data is not None:
+            self.metrics.record("state_writes", self.state_writes)
+        self.changed_stations = set()
+        self.state_writes = 0
+
+        started = time.perf_counter()
+        self.metrics.counters["polls"] += 1
+        try:
+            return await super()._async_update_data()
+        except Exception:
+            self.metrics.counters["failures"] += 1
+            raise
+        finally:
+            self.metrics.record("poll_duration", (time.perf_counter() - started) * 1000)
+            self.metrics.record("retries", self.retries_used)
+
+    async def async_load_snapshot(self) -> bool:
+        """Load the last known snapshot and publish it as stale data.
+
+        Returns True if a snapshot was loaded, in which case the caller should
+        run the real refresh in the background.
+        """
+        await self.metadata.async_load()
+
+        if not (stored := await self._snapshot_store.async_load()):
+            return False
+
+        data = {
+            station_code: StationRecord.from_dict(station_data)
+            for station_code, station_data in stored.get("stations", {}).items()
+            if station_code in self._station_index and "metadata" in station_data
+        }
+        if not data:
+            return False
+
+        self.stale = True
+        self.changed_stations = set(data)
+        if self.levels is not None:
+            self.levels.seed(data)
+        self.async_set_updated_data(data)
+        _LOGGER.debug(
+            "Loaded flood sense snapshot from %s for stations: %s",
+            stored.get("saved_at"),
+            list(data),
+        )
+        return True
+
+    def _snapshot_data(self) -> dict:
+        """Return the data to persist as the last known snapshot."""
+        return {
+            "saved_at": dt_util.utcnow().isoformat(),
+            "stations": {
+                station_code: record.as_dict()
+                for station_code, record in (self.data or {}).items()
+            },
+        }
+
+    def _plan_batches(self, keys, clause):
+        """Split keys into batches bounded by count and filter length."""
+        batches = []
+        batch = []
+        filter_length = 0
+
+        for key in keys:
+            clause_length = len(clause(key)) + 4
+            if batch and (
+                len(batch) >= self.batch_size
+                or filter_length + clause_length > STATION_BATCH_MAX_FILTER_LENGTH
+            ):
+                batches.append(batch)
+                batch = []
+                filter_length = 0
+
+            batch.append(key)
+            filter_length += clause_length
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    async def _gather_batches(self, batches, fetch):
+        """Run the batch fetches concurrently and merge their results.
+
+        Returns the merged result, the keys of the failed batches and the
+        first error raised.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run(batch):
+            async with semaphore:
+                return await fetch(batch)
+
+        results = await asyncio.gather(
+            *(_run(batch) for batch in batches),
+            return_exceptions=True,
+        )
+
+        merged = {}
+        failed_keys = set()
+        first_error = None
+
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                first_error = first_error or result
+                failed_keys.update(batch)
+                _LOGGER.warning(
+                    "Flood sense batch of %d stations failed: %s",
+                    len(batch),
+                    result,
+                )
+            else:
+                merged.update(result)
+
+        return merged, failed_keys, first_error
+
+    @staticmethod
+    def _station_clause(station_id):
+        return API_FILTER_PARAMS.format(stationID=station_id)
+
+    @staticmethod
+    def _datastream_clause(datastream_id):
+        if isinstance(datastream_id, str):
+            datastream_id = f"'{datastream_id}'"
+        return DATASTREAM_FILTER_PARAMS.format(datastream_id=datastream_id)
+
+    async def _async_update_areas(self):
+        """Refresh the catalog and recompute the area memberships.
+
+        The metadata of new area stations is seeded from the catalog, so they
+        need no extra metadata request.
+        """
+        if not self.areas:
+            return
+
+        try:
+            await self.catalog.async_ensure_fresh()
+        except Exception as e:
+            _LOGGER.warning("Station catalog unavailable for area monitoring: %s", e)
+            return
+
+        changed = False
+        for area in self.areas.values():
+            changed |= area.update_membership(self.catalog)
+        if not changed:
+            return
+
+        self._build_station_index()
+        if seed := {
+            station_code: self.catalog.stations[station_code]
+            for station_code in self.metadata.missing(self._station_index)
+            if station_code in self.catalog.stations
+        }:
+            # 目錄已涵蓋所有測站時視為完整更新
+            await self.metadata.async_update(
+                seed,
+                complete=len(seed) == len(self._station_index),
+                scope=self.shard,
+            )
+
+    async def _async_update_metadata(self):
+        """Refresh the station metadata when it is expired or incomplete."""
+        if self.metadata.is_expired(self.shard):
+            # 失敗或部分失敗時,在重試間隔內改用快取,不在每次輪詢重抓
+            self.metadata.record_attempt(self.shard)
+            station_ids = list(self._station_index.values())
+            complete = True
+        elif missing := [
+            station_code
+            for station_code in self.metadata.missing(self._station_index)
+            if station_code not in self._unresolved
+        ]:
+            station_ids = [self._station_index[station_code] for station_code in missing]
+            complete = False
+        else:
+            return
+
+        batches = self._plan_batches(station_ids, self._station_clause)
+        fetched, failed_ids, first_error = await self._gather_batches(
+            batches, self._fetch_metadata
+        )
+
+        if fetched:
+            await self.metadata.async_update(
+                fetched, complete and not failed_ids, scope=self.shard
+            )
+            _LOGGER.debug("Refreshed metadata for %d stations", len(fetched))
+
+        if not self._get_datastream_index():
+            raise first_error or DataNotFoundError({"name": "TWFloodSense"})
+
+        if first_error is not None:
+            _LOGGER.warning(
+                "Failed to refresh metadata for some stations, "
+                "using cached metadata: %s",
+                first_error,
+            )
 
     async def _get_data(self):
-        """Fetch the micro sensor data from the API."""
+        """Fetch the latest observations for all stations in concurrent batches."""
+        await self._async_update_areas()
+        if not self._station_index:
+            return {}
+        await self._async_update_metadata()
+
+        now = dt_util.utcnow()
+        due = set(self.scheduler.due(self._station_index, now))
+        if not due and self.data:
+            return self.data
+
+        index = {
+            datastream_id: station_code
+            for datastream_id, station_code in self._get_datastream_index().items()
+            if station_code in due
+        }
+        # 沒有淹水深度 datastream 的測站無法輪詢,在下次更新靜態資料前略過
+        if unresolved := due.difference(index.values()):
+            if new := unresolved - self._unresolved:
+                _LOGGER.warning(
+                    "No flood depth datastream found for stations %s, "
+                    "skipping them until the station metadata is refreshed",
+                    sorted(new),
+                )
+            self._unresolved |= unresolved
+            self.scheduler.skip(unresolved, now + METADATA_REFRESH_INTERVAL)
+        self._unresolved.difference_update(index.values())
+        if not index:
+            return self.data or {}
+        # 依上次觀測時間排序,讓同一批的測站有相近的增量條件
+        datastream_ids = sorted(
+            index, key=lambda datastream_id: self._last_seen(index[datastream_id])
+        )
+        batches = self._plan_batches(datastream_ids, self._datastream_clause)
+        merged, failed_ids, first_error = await self._gather_batches(
+            batches,
+            functools.partial(self._fetch_observations, index=index),
+        )
+
+        if not merged:
+            raise first_error or DataNotFoundError({"name": "TWFloodSense"})
+
+        self.metrics.record("stations_matched", len(merged))
+        self.metrics.record("stations_missing", len(index) - len(merged))
+
+        # 輪詢期間推播進來的較新觀測不被較舊的輪詢結果覆蓋
+        if self.data:
+            for station_code, record in merged.items():
+                if (current := self.data.get(station_code)) is not None and _is_newer(
+                    current, record
+                ):
+                    merged[station_code] = current.with_metadata(record.metadata)
+
+        self._update_schedule(merged, now)
+
+        # 未到輪詢時間或失敗批次的測站沿用上一次的資料
+        if self.data:
+            for station_code, record in self.data.items():
+                if station_code not in merged and station_code in self._station_index:
+                    merged[station_code] = record
+
+        self.changed_stations = self._diff_stations(self.data, merged)
+        self._update_history(merged)
+        self.stale = False
+        self._snapshot_store.async_delay_save(self._get_snapshot_data, SNAPSHOT_SAVE_DELAY)
+        self._update_push_subscriptions()
+
+        _LOGGER.debug(
+            "Successfully fetched data for %d flood sense stations (%d polled)",
+            len(merged),
+            len(index),
+        )
+        return merged
+
+    def _diff_stations(self, previous, current) -> set[str]:
+        """Return the stations whose record differs between two cycles."""
+        if not previous or self.stale:
+            return set(current)
+
+        return {
+            station_code
+            for station_code, record in current.items()
+            if previous.get(station_code) is not record
+        } | (previous.keys() - current.keys())
+
+    def _update_history(self, data):
+        """Append the new observations of the changed stations to their history.
+
+        New observations are also evaluated against the level thresholds.
+        """
+        for station_code in self.changed_stations:
+            if (record := data.get(station_code)) is None or not record.update_datetime:
+                continue
+            try:
+                level = float(record.water_level)
+            except (TypeError, ValueError):
+                continue
+
+            if (history := self.histories.get(station_code)) is None:
+                history = self.histories[station_code] = ObservationHistory()
+            # 只在新的觀測到達時評估水位門檻
+            if (
+                history.append(record.update_datetime.timestamp(), level)
+                and self.levels is not None
+            ):
+                self.levels.async_update(record, level)
+
+    def _update_schedule(self, polled, now):
+        """Update the station tiers from the polled data and reschedule."""
+        for station_code, record in polled.items():
+            self.scheduler.update(
+                station_code,
+                record.water_level,
+                parse_datetime(record.phenomenon_time or ""),
+            )
+        self.scheduler.mark_polled(polled, now)
+        self._apply_poll_interval()
+
+    def _apply_poll_interval(self):
+        """Apply the poll interval of the current tiers and push state."""
+        interval = self.scheduler.interval
+        # 推播連線時只以較長的間隔輪詢補漏
+        if self.push is not None and self.push.connected:
+            interval = max(interval, PUSH_POLL_INTERVAL)
+
+        if interval != self.update_interval:
+            _LOGGER.debug("Flood sense update interval changed to %s", interval)
+            self.update_interval = interval
+
+    @callback
+    def attach_push(self, push):
+        """Receive observations of this shard through a shared push client."""
+        self.push = push
+        push.add_listener(
+            self.name,
+            self.async_apply_observation,
+            self.async_set_push_connected,
+            self._get_datastream_index(),
+        )
+
+    def _update_push_subscriptions(self):
+        """Subscribe the push client to the Datastreams polled now."""
+        if self.push is not None:
+            self.push.update_subscriptions(self.name, self._get_datastream_index())
+
+    @callback
+    def detach_push(self):
+        """Stop receiving pushed observations."""
+        if (push := self.push) is not None:
+            self.push = None
+            push.remove_listener(self.name)
+            self._apply_poll_interval()
+
+    @callback
+    def async_set_push_connected(self, connected):
+        """Relax polling while pushed, poll right away after a disconnect."""
+        self._apply_poll_interval()
+        if not connected:
+            # 補上斷線期間可能漏接的觀測
+            self.scheduler.expire()
+            self.config_entry.async_create_background_task(
+                self.hass,
+                self.async_request_refresh(),
+                f"{self.name}_push_fallback",
+            )
+
+    @callback
+    def async_apply_observation(self, datastream_id, observation):
+        """Apply one pushed observation to the coordinator data."""
+        if not self.data or (
+            station_code := self._get_datastream_index().get(datastream_id)
+        ) is None:
+            return
+
+        phenomenon_time = observation.get("phenomenonTime")
+        water_level = observation.get("result")
+        previous = self.data.get(station_code)
+        # 忽略重複或較舊的觀測
+        if (
+            not phenomenon_time
+            or previous is not None
+            and previous.phenomenon_time
+            and phenomenon_time <= previous.phenomenon_time
+        ):
+            return
+
+        self._check_time_zone()
+        update_datetime, update_time = _parse_datetime(phenomenon_time)
+        record = StationRecord(
+            self.metadata.stations[station_code],
+            water_level,
+            phenomenon_time,
+            update_time,
+            update_datetime,
+        )
+        data = {**self.data, station_code: record}
+
+        self.changed_stations = {station_code}
+        self._update_history(data)
+        self.scheduler.update(station_code, water_level, update_datetime)
+        self._apply_poll_interval()
+        # 推播造成的實體寫入另外計算,不混入輪詢週期的 state_writes
+        state_writes = self.state_writes
+        self.async_set_updated_data(data)
+        self.metrics.counters["pushes"] += 1
+        self.metrics.counters["push_writes"] += self.state_writes - state_writes
+        self.state_writes = state_writes
+        self._snapshot_store.async_delay_save(self._get_snapshot_data, SNAPSHOT_SAVE_DELAY)
+
+    def _async_circuit_recovered(self):
+        """Backfill the statistics gap left by the outage."""
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self.async_backfill(),
+            f"{self.name}_backfill",
+        )
+
+    async def async_backfill(self):
+        """Backfill long-term statistics since the last known observations.
+
+        The window of each station starts at the hour of its last known
+        observation and ends at the start of the current hour, capped at
+        BACKFILL_MAX_WINDOW.
+        """
+        if "recorder" not in self.hass.config.components or not self.data:
+            return
+
+        end = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+        earliest = end - BACKFILL_MAX_WINDOW
+        windows = {}
+        for station_code, record in self.data.items():
+            if record.update_datetime is None or record.datastream_id is None:
+                continue
+            start = max(
+                dt_util.as_utc(record.update_datetime).replace(
+                    minute=0, second=0, microsecond=0
+                ),
+                earliest,
+            )
+            if start < end:
+                windows[record.datastream_id] = (station_code, start)
+
+        if not windows:
+            return
+
+        _LOGGER.debug("Backfilling statistics for %d stations", len(windows))
+        fetched, _, first_error = await self._gather_batches(
+            [[datastream_id] for datastream_id in windows],
+            functools.partial(self._fetch_history, windows=windows, end=end),
+        )
+
+        rows = 0
+        for station_code, observations in fetched.items():
+            rows += async_import_station_statistics(
+                self.hass,
+                station_code,
+                self.data[station_code].station_name if station_code in self.data else None,
+                observations,
+            )
+
+        _LOGGER.debug(
+            "Backfilled %d hourly statistics for %d stations",
+            rows,
+            len(fetched),
+        )
+        if first_error is not None:
+            _LOGGER.warning("Statistics backfill incomplete: %s", first_error)
+
+    async def _fetch_history(self, datastream_ids, windows, end):
+        """Fetch the observations of one Datastream within its backfill window."""
+        datastream_id = datastream_ids[0]
+        station_code, start = windows[datastream_id]
+        url = HISTORY_DATA_API_URL.format(
+            datastream_id=datastream_id,
+            start=start.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            end=end.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            observation_select=",".join(OBSERVATION_SELECT_FIELDS),
+        )
+
+        observations = []
+        async with aclosing(self._iter_values(url)) as batches:
+            async for value in batches:
+                for observation in value:
+                    try:
+                        observations.append(
+                            (
+                                dt_util.as_utc(
+                                    parse_datetime(observation["phenomenonTime"])
+                                ),
+                                float(observation["result"]),
+                            )
+                        )
+                    except (KeyError, TypeError, ValueError):
+                        continue
+
+        return {station_code: observations}
+
+    def _last_seen(self, station_code):
+        """Return the raw phenomenonTime last seen for a station."""
+        if self.data and (record := self.data.get(station_code)):
+            return record.phenomenon_time or ""
+        return ""
+
+    async def _fetch_metadata(self, station_ids):
+        """Fetch the static metadata for one batch of stations."""
         filter_params = " or ".join(
-            API_FILTER_PARAMS.format(stationID=stationID) 
-            for stationID in self.station_ids
+            self._station_clause(station_id) for station_id in station_ids
         )
 
-        url = STATION_DATA_API_URL.format(filter_params=filter_params)
-        headers = {
-            "Accept": "application/json",
-            "User-Agent": HA_USER_AGENT,
-        }
+        url = STATION_DATA_API_URL.format(
+            filter_params=filter_params,
+            datastream_select=",".join(DATASTREAM_SELECT_FIELDS),
+            thing_select=",".join(THING_SELECT_FIELDS),
+        )
 
         _LOGGER.debug("Flood sense Station Data API URL: %s", url)
 
-        err = {"name": "TWFloodSense",}
+        return await self._fetch_pages(
+            url, self._parse_metadata, self._metadata_context()
+        )
 
-        try:
-            response = await self.client.get(
-                url,
-                headers=headers,
-                timeout=15
+    async def _fetch_observations(self, datastream_ids, index):
+        """Fetch the latest observations for one batch of Datastreams."""
+        filter_params = " or ".join(
+            self._datastream_clause(datastream_id) for datastream_id in datastream_ids
+        )
+
+        # 只要求比這批測站最舊的觀測時間更新的資料
+        observation_filter = ""
+        last_seen = [self._last_seen(index[datastream_id]) for datastream_id in datastream_ids]
+        if all(last_seen):
+            observation_filter = INCREMENTAL_FILTER_PARAMS.format(
+                phenomenon_time=min(last_seen)
             )
 
-            if response.is_success:
-                res_data = response.json()
+        url = OBSERVATION_DATA_API_URL.format(
+            filter_params=filter_params,
+            observation_filter=observation_filter,
+            observation_select=",".join(OBSERVATION_SELECT_FIELDS),
+        )
 
-                parsed_data = self._parse_data(res_data)
-                if parsed_data:
-                    _LOGGER.debug(
-                        "Successfully fetched data for flood sense stations: %s",
-                        self.station_codes,
-                    )
-                    return parsed_data
-                else:
-                    raise DataNotFoundError(err)
-            else:
-                err["code"] = response.status_code
-                raise UnexpectedStatusError(err)
+        _LOGGER.debug("Flood sense Observation Data API URL: %s", url)
 
-        except DataNotFoundError as e:
-            raise
-        except UnexpectedStatusError as e:
-            raise
-        except asyncio.TimeoutError as e:
-            err["exception"] = str(e)
-            raise RequestTimeoutError(err) from e
-        except Exception as e:
-            err["exception"] = str(e)
-            raise RequestFailedError(err) from e
+        return await self._fetch_pages(
+            url, self._parse_data, self._observation_context(datastream_ids, index)
+        )
+
+    async def _fetch_pages(self, url, parser, context):
+        """Fetch every page of a query and parse it into one result dict.
+
+        ``parser(value, context)`` only reads the immutable ``context`` and
+        returns new records, so it may run in the executor. The records are
+        merged into the result on the event loop.
+        """
+        self._check_time_zone()
+        result = {}
+        async with aclosing(self._iter_values(url)) as batches:
+            async for value in batches:
+                self._log_response_sample(value)
+                started = time.perf_counter()
+                parsed = await self.parse_offloader.async_run(
+                    parser, len(value), value, context
+                )
+                self.metrics.record("parse_time", (time.perf_counter() - started) * 1000)
+                if parsed is None:
+                    raise DataNotFoundError({"name": "TWFloodSense"})
+                result.update(parsed)
+
+        if not result:
+            raise DataNotFoundError({"name": "TWFloodSense"})
+
+        return result
+
+    def _iter_values(self, url):
+        """Iterate over the decoded ``value`` items of a query in batches."""
+        return async_iter_values(
+            self.client,
+            url,
+            metrics=self.metrics,
+            offloader=self.decode_offloader,
+        )
+
+    def _metadata_context(self):
+        """Return a snapshot of the station lookups for metadata parsing."""
+        return (
+            frozenset(self._station_index),
+            MappingProxyType(dict(self._station_id_index)),
+        )
+
+    def _observation_context(self, datastream_ids, index):
+        """Return a snapshot of what observation parsing needs per Datastream.
 
-    def _parse_data(self, res_data):
-        """Parse flood sense data and extract sensor values."""
-        _LOGGER.debug("Flood sense API response: %s", res_data)
+        Metadata dicts are replaced, never changed in place, and records are
+        immutable, so the references can be shared with the executor.
+        """
+        context = {}
+        for datastream_id in datastream_ids:
+            station_code = index[datastream_id]
+            if (metadata := self.metadata.stations.get(station_code)) is None:
+                continue
+            previous = self.data.get(station_code) if self.data else None
+            context[datastream_id] = (station_code, metadata, previous)
+        return MappingProxyType(context)
 
+    @staticmethod
+    def _parse_metadata(value, context):
+        """Parse a batch of station metadata into new records."""
+        station_codes, station_id_index = context
+        result = {}
         try:
-            if (res_data.get("@iot.count", 0) == 0 
-            or not (value := res_data.get("value"))):
-                raise DataNotFoundError({"name": "TWFloodSense"})
-            
-            result = {}
             for data in value:
                 thing_data = data["Thing"]["properties"]
-                if (station_code := thing_data.get("stationCode")) in self.station_codes:
-                    
-                    result[station_code] = {
-                        "thing_id": data["Thing"]["@iot.id"],
-                        "stationID": thing_data.get("stationID"),
-                        "stationCode": thing_data.get("stationCode"),
-                        "stationName": thing_data.get("stationName"),
-                        "authority_type": thing_data.get("authority_type"),
-                    }
-
-                    
-                    coordinates = data["observedArea"].get("coordinates")
-                    coords = self._parse_coordinates(coordinates)
-                    result[station_code]["latitude"] = coords["lat"]
-                    result[station_code]["longitude"] = coords["lon"]
-
-                    observations = data["Observations"]
-                    if observations:
-                        result[station_code]["water_level"] = observations[0].get("result")
-                        result[station_code]["update_time"] = self._parse_datetime(
-                            observations[0].get("phenomenonTime")
-                        )
-                    else:
-                        result_data = {
-                            "water_level": "",
-                            "update_time": "unknown",
-                        }
-                        
-                        result[station_code].update(result_data)
-
-                        _LOGGER.warning(
-                            "No Observations found for station %s. "
-                            "Skipping...",
-                            station_code,
-                        )
+                if (station_code := thing_data.get("stationCode")) not in station_codes:
+                    station_code = station_id_index.get(thing_data.get("stationID"))
+                if station_code:
+                    result[station_code] = parse_station(data)
 
             return result
 
         except Exception as e:
-            _LOGGER.error("Error parsing flood sense data: %s", e)
+            _LOGGER.error("Error parsing flood sense metadata: %s", e)
             return None
 
-    def _parse_coordinates(self, coords):
-        """Parse coordinates and determine latitude and longitude."""
-        if not coords:
-            return {"lat": "unknown", "lon": "unknown"}
-
-        lat_range = (10.36, 26.40)  # 緯度範圍
-        lon_range = (114.35, 122.11)  # 經度範圍
+    @staticmethod
+    def _parse_data(value, context):
+        """Parse a batch of flood sense observations into new records."""
+        result = {}
+        try:
+            for data in value:
+                if (entry := context.get(data["@iot.id"])) is None:
+                    continue
+                station_code, metadata, previous = entry
 
-        a, b = coords[0], coords[1]
+                observations = data["Observations"]
+                if observations:
+                    phenomenon_time = observations[0].get("phenomenonTime")
+                    water_level = observations[0].get("result")
+                    if previous is not None and previous.matches(
+                        metadata, water_level, phenomenon_time
+                    ):
+                        result[station_code] = previous
+                    else:
+                        update_datetime, update_time = _parse_datetime(
+                            phenomenon_time
+                        )
+                        result[station_code] = StationRecord(
+                            metadata,
+                            water_level,
+                            phenomenon_time,
+                            update_time,
+                            update_datetime,
+                        )
+                elif previous is not None and previous.phenomenon_time:
+                    # 沒有新的觀測資料,沿用上一次的數值
+                    result[station_code] = previous.with_metadata(metadata)
+                else:
+                    result[station_code] = StationRecord(metadata)
 
-        if lat_range[0] <= a <= lat_range[1] and lon_range[0] <= b <= lon_range[1]:
-            return {"lat": a, "lon": b}
-        elif lat_range[0] <= b <= lat_range[1] and lon_range[0] <= a <= lon_range[1]:
-            return {"lat": b, "lon": a}
-        else:
-            return {"lat": "unknown", "lon": "unknown"}
+                    _LOGGER.warning(
+                        "No Observations found for station %s. "
+                        "Skipping...",
+                        station_code,
+                    )
 
-    def _parse_datetime(self, datetime_str):
-        """Parse datetime string and return local datetime string."""
-        if not datetime_str:
-            return "unknown"
+            return result
 
-        try:
-            utc_dt = parse_datetime(datetime_str)
-            local_dt = as_local(utc_dt)
-            return local_dt.strftime("%Y-%m-%d %H:%M:%S")
         except Exception as e:
-            _LOGGER.error("Error parsing datetime: %s", e)
-            return "unknown"
+            _LOGGER.error("Error parsing flood sense data: %s", e)
+            return None
+
+    def _log_response_sample(self, value):
+        """Log a bounded sample of every Nth response batch at debug level."""
+        if not _LOGGER.isEnabledFor(logging.DEBUG):
+            return
+
+        self._pages_parsed += 1
+        if (self._pages_parsed - 1) % DEBUG_LOG_SAMPLE_EVERY:
+            return
+
+        _LOGGER.debug(
+            "Flood sense API response batch with %d items, first %d: %.*s",
+            len(value),
+            min(len(value), DEBUG_LOG_SAMPLE_ITEMS),
+            DEBUG_LOG_MAX_CHARS,
+            value[:DEBUG_LOG_SAMPLE_ITEMS],
+        )
 
+    def _check_time_zone(self):
+        """Clear the datetime cache when the time zone has changed."""
+        if self._cache_time_zone is not dt_util.DEFAULT_TIME_ZONE:
+            _convert_datetime.cache_clear()
+            self._cache_time_zone = dt_util.DEFAULT_TIME_ZONE
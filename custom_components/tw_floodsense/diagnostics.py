@@ -0,0 +1,29 @@
+"""Diagnostics support for TWFloodSense."""
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, FLOODSENSE_COORDINATOR
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data.get(DOMAIN, {}).get(entry.entry_id, {})
+    manager = entry_data.get(FLOODSENSE_COORDINATOR)
+
+    return {
+        "options": dict(entry.options),
+        "subentries": dict(
+            Counter(subentry.subentry_type for subentry in entry.subentries.values())
+        ),
+        "shards": [
+            coordinator.as_diagnostics()
+            for coordinator in (manager.coordinators.values() if manager else ())
+        ],
+    }
@@ -35,3 +35,7 @@ class RequestTimeoutError(TWFloodSenseError):
 
 class RequestFailedError(TWFloodSenseError):
     """Request failed"""
+
+
+class CircuitOpenError(TWFloodSenseError):
+    """Requests are paused by the circuit breaker"""
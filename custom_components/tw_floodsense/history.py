@@ -0,0 +1,96 @@
+"""Observation history for TWFloodSense stations."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    HISTORY_PEAK_WINDOW,
+    HISTORY_SIZE,
+)
+
+
+class ObservationHistory:
+    """Fixed-size ring buffer of recent observations for one station.
+
+    Levels and timestamps are kept in compact float arrays. The derived
+    values are updated in O(1) (amortized for the peak) on every append.
+    """
+
+    __slots__ = (
+        "_size",
+        "_levels",
+        "_times",
+        "_count",
+        "_peak",
+        "_last_dry",
+        "rise_rate",
+        "peak_1h",
+    )
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        """Initialize the ring buffer."""
+        self._size = size
+        self._levels = array("d", bytes(8 * size))
+        self._times = array("d", bytes(8 * size))
+        self._count = 0
+        # 單調遞減佇列,保存一小時內可能成為最大值的序號
+        self._peak: deque[int] = deque()
+        self._last_dry: float | None = None
+        self.rise_rate: float | None = None
+        self.peak_1h: float | None = None
+
+    def __len__(self) -> int:
+        return min(self._count, self._size)
+
+    @property
+    def latest(self) -> tuple[float, float] | None:
+        """Return the latest (timestamp, level) pair."""
+        if not self._count:
+            return None
+        index = (self._count - 1) % self._size
+        return self._times[index], self._levels[index]
+
+    @property
+    def minutes_since_dry(self) -> float | None:
+        """Return the minutes from the last dry reading until now."""
+        if self._last_dry is None or (latest := self.latest) is None:
+            return None
+        if latest[1] <= 0:
+            return 0.0
+        return max(0.0, (dt_util.utcnow().timestamp() - self._last_dry) / 60)
+
+    def append(self, timestamp: float, level: float) -> bool:
+        """Add an observation; return False if it is not newer than the latest."""
+        if (latest := self.latest) is not None and timestamp <= latest[0]:
+            return False
+
+        seq = self._count
+        index = seq % self._size
+        self._times[index] = timestamp
+        self._levels[index] = level
+        self._count += 1
+
+        # 水位上升速率 (cm/10 分鐘)
+        if latest is not None:
+            self.rise_rate = (level - latest[1]) / (timestamp - latest[0]) * 600
+
+        # 一小時內的最高水位
+        oldest = self._count - self._size
+        while self._peak and (
+            self._peak[0] < oldest
+            or self._times[self._peak[0] % self._size] < timestamp - HISTORY_PEAK_WINDOW
+        ):
+            self._peak.popleft()
+        while self._peak and self._levels[self._peak[-1] % self._size] <= level:
+            self._peak.pop()
+        self._peak.append(seq)
+        self.peak_1h = self._levels[self._peak[0] % self._size]
+
+        # 最後一次無積水的時間,經過的分鐘數在讀取時計算
+        if level <= 0:
+            self._last_dry = timestamp
+
+        return True
@@ -0,0 +1,159 @@
+"""Water level threshold events for TWFloodSense."""
+from __future__ import annotations
+
+from bisect import bisect_right
+import logging
+import re
+
+from homeassistant.core import callback
+
+from .const import (
+    EVENT_LEVEL_CHANGED,
+    LEVEL_DEBOUNCE_COUNT,
+    LEVEL_HYSTERESIS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_thresholds(text) -> tuple[float, ...]:
+    """Parse thresholds such as ``"10, 30, 50"`` into a sorted tuple.
+
+    Raises ValueError if a value is not a positive number.
+    """
+    thresholds = set()
+    for value in re.split(r"[\s,;]+", (text or "").strip()):
+        if not value:
+            continue
+        threshold = float(value)
+        if not threshold > 0:
+            raise ValueError(f"Invalid threshold: {value}")
+        thresholds.add(threshold)
+    return tuple(sorted(thresholds))
+
+
+class _LevelState:
+    """Band and pending transition of one station."""
+
+    __slots__ = ("band", "pending", "count")
+
+    def __init__(self, band):
+        self.band = band
+        self.pending = None
+        self.count = 0
+
+
+class LevelMonitor:
+    """Track the threshold band of each station and fire events on changes.
+
+    Band ``n`` means the level reached the n-th threshold. A station leaves
+    a band downwards only ``hysteresis`` below its threshold, and a new band
+    must hold for ``debounce`` consecutive observations before the
+    ``tw_floodsense_level_changed`` event fires.
+    """
+
+    def __init__(
+        self,
+        hass,
+        thresholds=(),
+        hysteresis=LEVEL_HYSTERESIS,
+        debounce=LEVEL_DEBOUNCE_COUNT,
+    ):
+        """Initialize the monitor with the global thresholds."""
+        self.hass = hass
+        self.thresholds = tuple(thresholds)
+        self.hysteresis = hysteresis
+        self.debounce = max(1, debounce)
+        # 只評估有設定為感測器的測站,None 表示沿用全域門檻
+        self.stations: dict[str, tuple[float, ...] | None] = {}
+        self._states: dict[str, _LevelState] = {}
+
+    def set_station(self, station_code, thresholds=None):
+        """Evaluate a station with its own or the global thresholds."""
+        thresholds = tuple(thresholds) if thresholds else None
+        if self.stations.get(station_code) != thresholds:
+            self._states.pop(station_code, None)
+        self.stations[station_code] = thresholds
+
+    def remove_station(self, station_code):
+        """Stop evaluating a station."""
+        self.stations.pop(station_code, None)
+        self._states.pop(station_code, None)
+
+    def thresholds_for(self, station_code) -> tuple[float, ...]:
+        """Return the thresholds of a station."""
+        return self.stations.get(station_code) or self.thresholds
+
+    def band(self, station_code) -> int | None:
+        """Return the current band of a station."""
+        state = self._states.get(station_code)
+        return state.band if state is not None else None
+
+    def seed(self, data):
+        """Set the band of stations without state from known records silently."""
+        for station_code, record in data.items():
+            if station_code in self.stations and station_code not in self._states:
+                try:
+                    level = float(record.water_level)
+                except (TypeError, ValueError):
+                    continue
+                self._states[station_code] = _LevelState(
+                    bisect_right(self.thresholds_for(station_code), level)
+                )
+
+    @callback
+    def async_update(self, record, level):
+        """Evaluate a new observation and fire an event on a band change."""
+        station_code = record.station_code
+        if station_code not in self.stations or not (
+            thresholds := self.thresholds_for(station_code)
+        ):
+            return
+
+        # 第一筆觀測只決定目前的區間
+        if (state := self._states.get(station_code)) is None:
+            self._states[station_code] = _LevelState(bisect_right(thresholds, level))
+            return
+
+        band = state.band
+        candidate = bisect_right(thresholds, level)
+        # 下降時需低於門檻 hysteresis 以上才離開目前區間
+        if candidate < band:
+            candidate = min(band, bisect_right(thresholds, level + self.hysteresis))
+
+        if candidate == band:
+            state.pending = None
+            state.count = 0
+            return
+
+        # 同方向的連續觀測都算入確認次數,快速上升時不會一直重新計算
+        if state.pending is None or (candidate > band) != (state.pending > band):
+            state.count = 0
+        state.pending = candidate
+        state.count += 1
+        if state.count < self.debounce:
+            return
+
+        state.band = candidate
+        state.pending = None
+        state.count = 0
+        self.hass.bus.async_fire(
+            EVENT_LEVEL_CHANGED,
+            {
+                "station_code": station_code,
+                "station_name": record.station_name,
+                "water_level": level,
+                "band": candidate,
+                "previous_band": band,
+                "threshold": thresholds[max(candidate, band) - 1],
+                "direction": "rising" if candidate > band else "falling",
+                "phenomenon_time": record.phenomenon_time,
+            },
+        )
+        _LOGGER.debug(
+            "Flood level of %s changed from band %d to %d (%s cm)",
+            station_code,
+            band,
+            candidate,
+            level,
+        )
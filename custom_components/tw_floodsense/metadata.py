@@ -0,0 +1,233 @@
+"""Static station metadata for TWFloodSense."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import aclosing
+from datetime import datetime
+
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .api import async_iter_values
+from .const import (
+    MAX_CONCURRENT_REQUESTS,
+    METADATA_REFRESH_INTERVAL,
+    METADATA_RETRY_INTERVAL,
+    METADATA_STORAGE_KEY,
+    STATION_BATCH_SIZE,
+    STATION_ID_STORAGE_KEY,
+    STORAGE_VERSION,
+    THING_DATA_API_URL,
+    THING_FILTER_PARAMS,
+)
+from .transport import async_get_transport
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_coordinates(coords):
+    """Parse coordinates and determine latitude and longitude."""
+    if not coords:
+        return {"lat": "unknown", "lon": "unknown"}
+
+    lat_range = (10.36, 26.40)  # 緯度範圍
+    lon_range = (114.35, 122.11)  # 經度範圍
+
+    a, b = coords[0], coords[1]
+
+    if lat_range[0] <= a <= lat_range[1] and lon_range[0] <= b <= lon_range[1]:
+        return {"lat": a, "lon": b}
+    elif lat_range[0] <= b <= lat_range[1] and lon_range[0] <= a <= lon_range[1]:
+        return {"lat": b, "lon": a}
+    else:
+        return {"lat": "unknown", "lon": "unknown"}
+
+
+def parse_station(data) -> dict:
+    """Parse the metadata of one Datastream with its expanded Thing."""
+    thing_data = data["Thing"]["properties"]
+    coords = parse_coordinates(data["observedArea"].get("coordinates"))
+
+    return {
+        "datastream_id": data["@iot.id"],
+        "thing_id": data["Thing"]["@iot.id"],
+        "stationID": thing_data.get("stationID"),
+        "stationCode": thing_data.get("stationCode"),
+        "stationName": thing_data.get("stationName"),
+        "authority_type": thing_data.get("authority_type"),
+        "latitude": coords["lat"],
+        "longitude": coords["lon"],
+    }
+
+
+async def async_resolve_station_ids(
+    hass, station_codes, batch_size=STATION_BATCH_SIZE
+) -> dict[str, str]:
+    """Resolve stationCode to stationID with a persistent cache.
+
+    Codes missing from the cache are looked up in concurrent batches of
+    ``or`` filters on properties/stationCode. Unresolved codes are omitted.
+    """
+    store = Store(hass, STORAGE_VERSION, STATION_ID_STORAGE_KEY)
+    cache = await store.async_load() or {}
+    missing = list(dict.fromkeys(code for code in station_codes if code not in cache))
+
+    if missing:
+        client = async_get_transport(hass)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def _fetch(batch):
+            filter_params = " or ".join(
+                THING_FILTER_PARAMS.format(station_code=code) for code in batch
+            )
+            resolved = {}
+            async with semaphore:
+                async with aclosing(
+                    async_iter_values(
+                        client, THING_DATA_API_URL.format(filter_params=filter_params)
+                    )
+                ) as batches:
+                    async for value in batches:
+                        for thing in value:
+                            properties = thing.get("properties") or {}
+                            if properties.get("stationCode") and properties.get("stationID"):
+                                resolved[properties["stationCode"]] = properties["stationID"]
+            return resolved
+
+        results = await asyncio.gather(
+            *(
+                _fetch(missing[i:i + batch_size])
+                for i in range(0, len(missing), batch_size)
+            ),
+            return_exceptions=True,
+        )
+
+        fetched = {}
+        for result in results:
+            if isinstance(result, BaseException):
+                if isinstance(result, asyncio.CancelledError):
+                    raise result
+                _LOGGER.warning("Failed to resolve some station IDs: %s", result)
+            else:
+                fetched.update(result)
+
+        if fetched:
+            cache.update(fetched)
+            await store.async_save(cache)
+        _LOGGER.debug(
+            "Resolved %d of %d uncached station IDs", len(fetched), len(missing)
+        )
+
+    return {code: cache[code] for code in station_codes if code in cache}
+
+
+class StationMetadata:
+    """Cache of static station metadata persisted in HA storage."""
+
+    def __init__(
+        self,
+        hass,
+        entry_id,
+        refresh_interval=METADATA_REFRESH_INTERVAL,
+        retry_interval=METADATA_RETRY_INTERVAL,
+    ):
+        """Initialize the metadata cache."""
+        self._store = Store(
+            hass, STORAGE_VERSION, METADATA_STORAGE_KEY.format(entry_id=entry_id)
+        )
+        self._loaded = False
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.stations: dict[str, dict] = {}
+        self.updated_at = None
+        # 分片各自的完整更新時間
+        self.scope_updated_at: dict[str, datetime] = {}
+        # 分片最近一次開始完整更新的時間,失敗時據此延後重試
+        self.scope_attempted_at: dict[str | None, datetime] = {}
+        self.version = 0
+
+    async def async_load(self):
+        """Load the metadata from storage."""
+        if self._loaded:
+            return
+
+        if stored := await self._store.async_load():
+            self.stations = stored.get("stations", {})
+            if updated_at := stored.get("updated_at"):
+                self.updated_at = dt_util.parse_datetime(updated_at)
+            self.scope_updated_at = {
+                scope: dt_util.parse_datetime(updated_at)
+                for scope, updated_at in stored.get("scopes", {}).items()
+            }
+            self.version += 1
+
+        self._loaded = True
+        _LOGGER.debug("Loaded metadata for %d stations", len(self.stations))
+
+    async def async_update(self, stations, complete=True, scope=None):
+        """Merge fetched metadata and persist it.
+
+        ``complete`` marks a full refresh of ``scope``, which restarts its
+        refresh interval.
+        """
+        self.stations.update(stations)
+        self.version += 1
+        if complete and scope is None:
+            self.updated_at = dt_util.utcnow()
+        elif complete:
+            self.scope_updated_at[scope] = dt_util.utcnow()
+
+        await self._store.async_save(
+            {
+                "updated_at": (
+                    self.updated_at.isoformat() if self.updated_at else None
+                ),
+                "scopes": {
+                    scope: updated_at.isoformat()
+                    for scope, updated_at in self.scope_updated_at.items()
+                },
+                "stations": self.stations,
+            }
+        )
+
+    async def async_remove(self):
+        """Remove the persisted metadata."""
+        await self._store.async_remove()
+        self.stations = {}
+        self.updated_at = None
+        self.scope_updated_at = {}
+        self.scope_attempted_at = {}
+        self.version += 1
+
+    def record_attempt(self, scope=None):
+        """Record the start of a full refresh of ``scope``."""
+        self.scope_attempted_at[scope] = dt_util.utcnow()
+
+    def is_expired(self, scope=None) -> bool:
+        """Return True if the metadata of ``scope`` is due for a slow refresh.
+
+        After a full refresh that did not complete, the next one waits for
+        ``retry_interval``.
+        """
+        now = dt_util.utcnow()
+        updated_at = (
+            self.updated_at if scope is None else self.scope_updated_at.get(scope)
+        )
+        attempted_at = self.scope_attempted_at.get(scope)
+        return (
+            updated_at is None
+            or now - updated_at >= self.refresh_interval
+        ) and (attempted_at is None or now - attempted_at >= self.retry_interval)
+
+    def missing(self, station_codes) -> list[str]:
+        """Return the station codes without cached metadata."""
+        return [code for code in station_codes if code not in self.stations]
+
+    def datastream_index(self, station_codes) -> dict:
+        """Return a Datastream ID to station code index."""
+        return {
+            self.stations[code]["datastream_id"]: code
+            for code in station_codes
+            if code in self.stations
+        }
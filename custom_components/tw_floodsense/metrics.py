@@ -0,0 +1,74 @@
+"""Poll pipeline metrics for TWFloodSense."""
+from __future__ import annotations
+
+from collections import deque
+
+from .const import METRICS_WINDOW
+
+# 各階段的量測項目
+STAGES = (
+    "poll_duration",
+    "request_latency",
+    "response_bytes",
+    "decode_time",
+    "parse_time",
+    "stations_matched",
+    "stations_missing",
+    "retries",
+    "state_writes",
+)
+
+
+class PollMetrics:
+    """Rolling per-stage timings and counters of one coordinator.
+
+    Each stage keeps its last METRICS_WINDOW samples; times are in ms.
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        """Initialize the metrics."""
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self.counters = {
+            "polls": 0,
+            "failures": 0,
+            "requests": 0,
+            "bytes": 0,
+            "pushes": 0,
+            "push_writes": 0,
+        }
+
+    def record(self, stage, value):
+        """Add one sample to a stage."""
+        self._samples[stage].append(value)
+        if stage == "request_latency":
+            self.counters["requests"] += 1
+        elif stage == "response_bytes":
+            self.counters["bytes"] += value
+
+    def last(self, stage):
+        """Return the latest sample of a stage."""
+        samples = self._samples[stage]
+        return samples[-1] if samples else None
+
+    def percentile(self, stage, q):
+        """Return the nearest-rank percentile of a stage."""
+        if not (samples := self._samples[stage]):
+            return None
+        ordered = sorted(samples)
+        return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+    def summary(self, stage) -> dict:
+        """Return the rolling summary of a stage."""
+        return {
+            "last": self.last(stage),
+            "p50": self.percentile(stage, 50),
+            "p95": self.percentile(stage, 95),
+            "samples": len(self._samples[stage]),
+        }
+
+    def as_dict(self) -> dict:
+        """Return every stage summary and counter."""
+        return {
+            "counters": dict(self.counters),
+            "stages": {stage: self.summary(stage) for stage in STAGES},
+        }
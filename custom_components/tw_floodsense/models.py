@@ -0,0 +1,103 @@
+"""Data models for TWFloodSense."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from homeassistant.util import dt as dt_util
+
+
+class StationRecord:
+    """Latest state of one flood sense station.
+
+    Records are treated as immutable: a station whose metadata and latest
+    observation did not change keeps the same record object between cycles.
+    """
+
+    __slots__ = (
+        "metadata",
+        "datastream_id",
+        "thing_id",
+        "station_id",
+        "station_code",
+        "station_name",
+        "authority_type",
+        "latitude",
+        "longitude",
+        "water_level",
+        "phenomenon_time",
+        "update_time",
+        "update_datetime",
+    )
+
+    def __init__(
+        self,
+        metadata: dict[str, Any],
+        water_level: Any = "",
+        phenomenon_time: str | None = None,
+        update_time: str = "unknown",
+        update_datetime: datetime | None = None,
+    ):
+        """Initialize the record from station metadata and an observation."""
+        self.metadata = metadata
+        self.datastream_id = metadata.get("datastream_id")
+        self.thing_id = metadata.get("thing_id")
+        self.station_id = metadata.get("stationID")
+        self.station_code = metadata.get("stationCode")
+        self.station_name = metadata.get("stationName")
+        self.authority_type = metadata.get("authority_type")
+        self.latitude = metadata.get("latitude")
+        self.longitude = metadata.get("longitude")
+        self.water_level = water_level
+        self.phenomenon_time = phenomenon_time
+        self.update_time = update_time
+        self.update_datetime = update_datetime
+
+    def __repr__(self) -> str:
+        return (
+            f"StationRecord({self.station_code}, water_level={self.water_level}, "
+            f"phenomenon_time={self.phenomenon_time})"
+        )
+
+    def matches(self, metadata, water_level, phenomenon_time) -> bool:
+        """Return True if the record already holds this metadata and observation."""
+        return (
+            self.metadata is metadata
+            and self.phenomenon_time == phenomenon_time
+            and self.water_level == water_level
+        )
+
+    def with_metadata(self, metadata) -> StationRecord:
+        """Return the record with the given metadata, reusing it when unchanged."""
+        if self.metadata is metadata:
+            return self
+        return StationRecord(
+            metadata,
+            self.water_level,
+            self.phenomenon_time,
+            self.update_time,
+            self.update_datetime,
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON serializable representation."""
+        return {
+            "metadata": self.metadata,
+            "water_level": self.water_level,
+            "phenomenon_time": self.phenomenon_time,
+            "update_time": self.update_time,
+            "update_datetime": (
+                self.update_datetime.isoformat() if self.update_datetime else None
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> StationRecord:
+        """Create a record from its JSON representation."""
+        return cls(
+            data["metadata"],
+            data.get("water_level", ""),
+            data.get("phenomenon_time"),
+            data.get("update_time", "unknown"),
+            dt_util.parse_datetime(data.get("update_datetime") or ""),
+        )
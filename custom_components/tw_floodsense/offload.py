@@ -0,0 +1,61 @@
+"""Adaptive executor offloading for TWFloodSense."""
+from __future__ import annotations
+
+import functools
+import logging
+import time
+
+from .const import OFFLOAD_SMOOTHING, OFFLOAD_TARGET_LAG
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _timed(func, *args):
+    """Run a function and return its result with the elapsed time."""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+class AdaptiveOffloader:
+    """Run CPU-bound work inline or in the executor by its predicted cost.
+
+    The cost per unit (items or bytes) is learned from every run. Work whose
+    predicted time exceeds ``target`` runs in the executor, so the threshold
+    follows the measured speed of the host.
+    """
+
+    def __init__(self, hass, enabled=True, target=OFFLOAD_TARGET_LAG):
+        """Initialize the offloader."""
+        self.hass = hass
+        self.enabled = enabled
+        self.target = target
+        # 每單位的平均耗時(秒)
+        self.cost = None
+        self.offloaded = 0
+
+    @property
+    def threshold(self) -> float | None:
+        """Return the size above which work is offloaded."""
+        if not self.enabled or not self.cost:
+            return None
+        return self.target / self.cost
+
+    async def async_run(self, func, size, *args):
+        """Run ``func(*args)`` for ``size`` units of work."""
+        if (threshold := self.threshold) is not None and size > threshold:
+            self.offloaded += 1
+            result, elapsed = await self.hass.async_add_executor_job(
+                functools.partial(_timed, func, *args)
+            )
+        else:
+            result, elapsed = _timed(func, *args)
+
+        if size:
+            cost = elapsed / size
+            self.cost = (
+                cost
+                if self.cost is None
+                else self.cost + OFFLOAD_SMOOTHING * (cost - self.cost)
+            )
+        return result
@@ -0,0 +1,164 @@
+"""MQTT push updates for TWFloodSense."""
+from __future__ import annotations
+
+import json
+import logging
+
+import paho.mqtt.client as mqtt
+
+from .const import (
+    MQTT_HOST,
+    MQTT_KEEPALIVE,
+    MQTT_PORT,
+    MQTT_RECONNECT_MAX_DELAY,
+    MQTT_RECONNECT_MIN_DELAY,
+    MQTT_TOPIC,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ObservationPushClient:
+    """Subscribe to the Observations topic of each Datastream.
+
+    One client is shared by every shard of a config entry. Each shard
+    registers as a listener with its own Datastreams, and observations are
+    routed to the listeners by Datastream ID. The paho network loop runs in
+    its own thread and reconnects on its own; observations and connection
+    changes are handed to the event loop.
+    """
+
+    def __init__(self, hass, host=MQTT_HOST, port=MQTT_PORT):
+        """Initialize the push client."""
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self.connected = False
+        self._client = None
+        self._stopping = False
+        # key -> (on_observation, on_connection)
+        self._listeners: dict[str, tuple] = {}
+        # key -> Datastream IDs of the listener
+        self._subscriptions: dict[str, set] = {}
+        # topic -> Datastream ID,以及 Datastream ID -> 訂閱的 listener
+        self._topics: dict[str, int | str] = {}
+        self._routes: dict[int | str, set[str]] = {}
+
+    @staticmethod
+    def _topic(datastream_id) -> str:
+        if isinstance(datastream_id, str):
+            datastream_id = f"'{datastream_id}'"
+        return MQTT_TOPIC.format(datastream_id=datastream_id)
+
+    def add_listener(self, key, on_observation, on_connection, datastream_ids=()):
+        """Register a listener and subscribe to its Datastreams."""
+        self._listeners[key] = (on_observation, on_connection)
+        self.update_subscriptions(key, datastream_ids)
+
+    def remove_listener(self, key):
+        """Unregister a listener and drop the Datastreams only it used."""
+        self._listeners.pop(key, None)
+        self.update_subscriptions(key, ())
+        self._subscriptions.pop(key, None)
+
+    async def async_start(self):
+        """Connect to the broker and subscribe to the Datastreams."""
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_message = self._on_message
+        client.reconnect_delay_set(MQTT_RECONNECT_MIN_DELAY, MQTT_RECONNECT_MAX_DELAY)
+        self._client = client
+        self._stopping = False
+
+        await self.hass.async_add_executor_job(
+            client.connect_async, self.host, self.port, MQTT_KEEPALIVE
+        )
+        client.loop_start()
+        _LOGGER.debug(
+            "Connecting to %s:%d for %d Datastreams",
+            self.host,
+            self.port,
+            len(self._topics),
+        )
+
+    async def async_stop(self):
+        """Disconnect and stop the network loop."""
+        if (client := self._client) is None:
+            return
+
+        # 主動斷線時不觸發輪詢補漏
+        self._stopping = True
+        self._client = None
+        self.connected = False
+        client.disconnect()
+        await self.hass.async_add_executor_job(client.loop_stop)
+
+    def update_subscriptions(self, key, datastream_ids):
+        """Subscribe to new Datastreams of a listener and drop removed ones."""
+        self._subscriptions[key] = set(datastream_ids)
+
+        routes: dict[int | str, set[str]] = {}
+        for listener, subscribed in self._subscriptions.items():
+            for datastream_id in subscribed:
+                routes.setdefault(datastream_id, set()).add(listener)
+        topics = {self._topic(datastream_id): datastream_id for datastream_id in routes}
+        added = [topic for topic in topics if topic not in self._topics]
+        removed = [topic for topic in self._topics if topic not in topics]
+        self._routes = routes
+        self._topics = topics
+
+        if self._client is None or not self.connected:
+            return
+        if added:
+            self._client.subscribe([(topic, 0) for topic in added])
+        if removed:
+            self._client.unsubscribe(removed)
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        """Subscribe to every Datastream after (re)connecting."""
+        if reason_code.is_failure:
+            _LOGGER.warning("MQTT connection to %s refused: %s", self.host, reason_code)
+            return
+
+        if topics := list(self._topics):
+            client.subscribe([(topic, 0) for topic in topics])
+        self.hass.loop.call_soon_threadsafe(self._set_connected, True)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        """Fall back to polling until the client reconnects."""
+        if self._stopping:
+            return
+        self.hass.loop.call_soon_threadsafe(self._set_connected, False)
+
+    def _on_message(self, client, userdata, msg):
+        """Decode an observation in the network thread and hand it over."""
+        if (datastream_id := self._topics.get(msg.topic)) is None:
+            return
+        try:
+            observation = json.loads(msg.payload)
+        except ValueError:
+            observation = None
+        if not isinstance(observation, dict):
+            _LOGGER.debug("Ignoring invalid observation on %s", msg.topic)
+            return
+
+        self.hass.loop.call_soon_threadsafe(
+            self._dispatch, datastream_id, observation
+        )
+
+    def _dispatch(self, datastream_id, observation):
+        """Route an observation to the listeners of its Datastream."""
+        for key in self._routes.get(datastream_id, ()):
+            if (listener := self._listeners.get(key)) is not None:
+                listener[0](datastream_id, observation)
+
+    def _set_connected(self, connected):
+        if self._stopping or connected == self.connected:
+            return
+        self.connected = connected
+        _LOGGER.info(
+            "MQTT push %s", "connected" if connected else "disconnected, polling instead"
+        )
+        for _, on_connection in list(self._listeners.values()):
+            on_connection(connected)
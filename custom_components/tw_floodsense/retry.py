@@ -0,0 +1,129 @@
+"""Retry policy and circuit breaker for TWFloodSense."""
+from __future__ import annotations
+
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .const import (
+    BREAKER_COOLDOWN,
+    BREAKER_FAILURE_THRESHOLD,
+    NOTIFICATION_INTERVAL,
+    RETRY_BASE_DELAY,
+    RETRY_DEADLINE,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by a deadline."""
+
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY
+    max_delay: float = RETRY_MAX_DELAY
+    deadline: float = RETRY_DEADLINE
+    clock: Callable[[], float] = field(default=time.monotonic, repr=False)
+    rng: Callable[[], float] = field(default=random.random, repr=False)
+
+    def delay(self, attempt: int) -> float:
+        """Return the sleep before the retry following ``attempt`` (0-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return ceiling * self.rng()
+
+    def next_delay(self, attempt: int, started: float, deadline: float) -> float | None:
+        """Return the next sleep, or None if no retry fits in the deadline."""
+        if attempt + 1 >= self.max_attempts:
+            return None
+
+        delay = self.delay(attempt)
+        if self.clock() - started + delay >= deadline:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """Stop polling after repeated failures and probe again after a cooldown."""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def remaining(self) -> float:
+        """Return the seconds left before the next probe is allowed."""
+        if self.state != STATE_OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - self.clock())
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent now."""
+        if self.state == STATE_OPEN and self.remaining == 0:
+            self.state = STATE_HALF_OPEN
+            _LOGGER.debug("Circuit breaker half-open, sending a probe")
+        return self.state != STATE_OPEN
+
+    def record_success(self) -> bool:
+        """Record a successful cycle; return True if the circuit recovered."""
+        recovered = self.state != STATE_CLOSED
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        if recovered:
+            _LOGGER.info("Circuit breaker closed, API recovered")
+        return recovered
+
+    def record_failure(self):
+        """Record a failed cycle and open the circuit when needed."""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != STATE_OPEN:
+                _LOGGER.warning(
+                    "Circuit breaker opened after %d failed cycles, "
+                    "pausing requests for %d seconds",
+                    self.failures,
+                    self.cooldown,
+                )
+            self.state = STATE_OPEN
+            self.opened_at = self.clock()
+
+
+class NotificationLimiter:
+    """Allow at most one notification per interval."""
+
+    def __init__(
+        self,
+        interval: float = NOTIFICATION_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Initialize the limiter."""
+        self.interval = interval
+        self.clock = clock
+        self._last_sent: float | None = None
+
+    def allow(self) -> bool:
+        """Return True and consume the slot if a notification may be sent."""
+        now = self.clock()
+        if self._last_sent is not None and now - self._last_sent < self.interval:
+            return False
+        self._last_sent = now
+        return True
@@ -0,0 +1,136 @@
+"""Adaptive polling scheduler for TWFloodSense."""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+
+from .const import (
+    POLL_DUE_SLACK,
+    POLL_TIER_INTERVALS,
+    RISING_RATE_THRESHOLD,
+    TIER_DEMOTION_COUNT,
+    TIER_IDLE,
+    TIER_RISING,
+    TIER_WET,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# 由慢到快排列
+TIER_ORDER = (TIER_IDLE, TIER_WET, TIER_RISING)
+
+
+class PollScheduler:
+    """Sort stations into polling tiers based on recent water levels.
+
+    An upward trend promotes a station immediately; falling back to a slower
+    tier requires several consecutive readings that no longer qualify.
+    """
+
+    def __init__(
+        self,
+        tier_intervals=POLL_TIER_INTERVALS,
+        rising_rate=RISING_RATE_THRESHOLD,
+        demotion_count=TIER_DEMOTION_COUNT,
+    ):
+        """Initialize the scheduler."""
+        self.tier_intervals = tier_intervals
+        self.rising_rate = rising_rate
+        self.demotion_count = demotion_count
+        self._tiers: dict[str, str] = {}
+        self._next_poll: dict[str, datetime] = {}
+        self._last_reading: dict[str, tuple[float, datetime]] = {}
+        self._demotions: dict[str, int] = {}
+
+    def tier(self, station_code) -> str:
+        """Return the current tier of a station."""
+        return self._tiers.get(station_code, TIER_WET)
+
+    @property
+    def interval(self):
+        """Return the interval of the fastest tier in use."""
+        tiers = set(self._tiers.values()) or {TIER_WET}
+        return min(self.tier_intervals[tier] for tier in tiers)
+
+    def due(self, station_codes, now) -> list[str]:
+        """Return the stations that should be polled now."""
+        return [
+            code
+            for code in station_codes
+            if (next_poll := self._next_poll.get(code)) is None
+            or next_poll - POLL_DUE_SLACK <= now
+        ]
+
+    def mark_polled(self, station_codes, now):
+        """Schedule the next poll of the given stations."""
+        for code in station_codes:
+            self._next_poll[code] = now + self.tier_intervals[self.tier(code)]
+
+    def skip(self, station_codes, until):
+        """Do not return the given stations as due before ``until``."""
+        for code in station_codes:
+            self._next_poll[code] = until
+
+    def update(self, station_code, water_level, observed_at) -> str:
+        """Record a new observation and return the station's tier.
+
+        Observations not newer than the last one are ignored.
+        """
+        try:
+            level = float(water_level)
+        except (TypeError, ValueError):
+            return self.tier(station_code)
+
+        rate = 0.0
+        if (last := self._last_reading.get(station_code)) and observed_at:
+            last_level, last_time = last
+            # 重複輪詢到同一筆觀測時不影響分層與降級計數
+            if observed_at <= last_time:
+                return self.tier(station_code)
+            minutes = (observed_at - last_time).total_seconds() / 60
+            if minutes > 0:
+                rate = (level - last_level) / minutes
+        if observed_at:
+            self._last_reading[station_code] = (level, observed_at)
+
+        if level > 0 and rate >= self.rising_rate:
+            target = TIER_RISING
+        elif level > 0:
+            target = TIER_WET
+        else:
+            target = TIER_IDLE
+
+        current = self._tiers.get(station_code)
+        if current is None or TIER_ORDER.index(target) >= TIER_ORDER.index(current):
+            self._demotions.pop(station_code, None)
+            new_tier = target
+        else:
+            count = self._demotions.get(station_code, 0) + 1
+            if count >= self.demotion_count:
+                self._demotions.pop(station_code, None)
+                new_tier = TIER_ORDER[TIER_ORDER.index(current) - 1]
+            else:
+                self._demotions[station_code] = count
+                new_tier = current
+
+        if new_tier != current:
+            _LOGGER.debug(
+                "Station %s moved from tier %s to %s (level %s, rate %.2f cm/min)",
+                station_code,
+                current,
+                new_tier,
+                level,
+                rate,
+            )
+            self._tiers[station_code] = new_tier
+
+        return new_tier
+
+    def expire(self):
+        """Make every station due at the next poll."""
+        self._next_poll.clear()
+
+    def remove(self, station_code):
+        """Forget a station."""
+        for data in (self._tiers, self._next_poll, self._last_reading, self._demotions):
+            data.pop(station_code, None)
@@ -2,14 +2,20 @@ from __future__ import annotations
 
 import logging
 
-from homeassistant.components.sensor import RestoreSensor
+from homeassistant.components.sensor import RestoreSensor, SensorEntity
+from homeassistant.const import EntityCategory
+from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
+    AREA_SENSOR_INFO,
+    CONF_DIAGNOSTIC_SENSORS,
     CONF_STATION_CODE,
     CONF_STATION_NAME,
     DOMAIN,
     FLOODSENSE_COORDINATOR,
+    HISTORY_SENSOR_INFO,
+    METRIC_SENSOR_INFO,
     SENSOR_INFO,
 )
 
@@ -21,31 +27,12 @@ async def async_setup_entry(hass, entry, async_add_entities):
     try:
         entry_data = hass.data[DOMAIN][entry.entry_id]
 
-        for subentry_id, subentry in entry.subentries.items():
-            if not hasattr(subentry, 'subentry_type'):
-                continue
-
-            subentry_entities = []
-
-            # 處理 flood sense subentry
-            if subentry.subentry_type == "floodsense":
-                station_code = subentry.data.get(CONF_STATION_CODE)
-                station_name = subentry.data.get(CONF_STATION_NAME)
-                coordinator = entry_data.get(FLOODSENSE_COORDINATOR)
-                
-                subentry_entities.extend([
-                    FloodSenseSensor(
-                        coordinator=coordinator,
-                        station_code=station_code,
-                        station_name=station_name,
-                        sensor_type=sensor_type,
-                        device_class=config["device_class"],
-                        unit_of_measurement=config["unit"],
-                        state_class=config["state_class"],
-                        display_precision=config["display_precision"],
-                        icon=config["icon"]
-                    ) for sensor_type, config in SENSOR_INFO.items()
-                ])
+        @callback
+        def _async_add_subentry(subentry_id, subentry):
+            """Add the entities of one subentry."""
+            subentry_entities = _subentry_entities(
+                entry_data.get(FLOODSENSE_COORDINATOR), subentry_id, subentry
+            )
 
             # 為這個 subentry 添加實體
             if subentry_entities:
@@ -57,10 +44,97 @@ async def async_setup_entry(hass, entry, async_add_entities):
                     subentry.subentry_type
                 )
 
+        for subentry_id, subentry in entry.subentries.items():
+            _async_add_subentry(subentry_id, subentry)
+
+        # 選用的輪詢量測診斷感測器,每個分片一組
+        if entry.options.get(CONF_DIAGNOSTIC_SENSORS) and (
+            manager := entry_data.get(FLOODSENSE_COORDINATOR)
+        ):
+            async_add_entities([
+                MetricSensor(
+                    coordinator=coordinator,
+                    entry_id=entry.entry_id,
+                    sensor_type=sensor_type,
+                    device_class=config["device_class"],
+                    unit_of_measurement=config["unit"],
+                    state_class=config["state_class"],
+                    display_precision=config["display_precision"],
+                    icon=config["icon"]
+                )
+                for coordinator in manager.coordinators.values()
+                for sensor_type, config in METRIC_SENSOR_INFO.items()
+            ])
+
+        # 供新增 subentry 時直接加入實體,不需重新載入
+        entry_data["add_subentry"] = _async_add_subentry
+
     except Exception as e:
         _LOGGER.error("setup sensor error: %s", e, exc_info=True)
 
 
+def _subentry_entities(manager, subentry_id, subentry) -> list:
+    """Create the sensor entities of one subentry."""
+    if not hasattr(subentry, 'subentry_type'):
+        return []
+
+    subentry_entities = []
+
+    # 處理 flood sense subentry
+    if subentry.subentry_type == "floodsense":
+        station_code = subentry.data.get(CONF_STATION_CODE)
+        station_name = subentry.data.get(CONF_STATION_NAME)
+        # 每個測站使用所屬分片的 coordinator
+        coordinator = manager.coordinator_for(station_code)
+
+        subentry_entities.extend([
+            FloodSenseSensor(
+                coordinator=coordinator,
+                station_code=station_code,
+                station_name=station_name,
+                sensor_type=sensor_type,
+                device_class=config["device_class"],
+                unit_of_measurement=config["unit"],
+                state_class=config["state_class"],
+                display_precision=config["display_precision"],
+                icon=config["icon"]
+            ) for sensor_type, config in SENSOR_INFO.items()
+        ])
+        subentry_entities.extend([
+            HistorySensor(
+                coordinator=coordinator,
+                station_code=station_code,
+                station_name=station_name,
+                sensor_type=sensor_type,
+                device_class=config["device_class"],
+                unit_of_measurement=config["unit"],
+                state_class=config["state_class"],
+                display_precision=config["display_precision"],
+                icon=config["icon"]
+            ) for sensor_type, config in HISTORY_SENSOR_INFO.items()
+        ])
+
+    # 處理監測區域 subentry
+    elif subentry.subentry_type == "area":
+        coordinator = manager.area_coordinator
+        area = coordinator.areas[subentry_id]
+
+        subentry_entities.extend([
+            AreaSensor(
+                coordinator=coordinator,
+                area=area,
+                sensor_type=sensor_type,
+                device_class=config["device_class"],
+                unit_of_measurement=config["unit"],
+                state_class=config["state_class"],
+                display_precision=config["display_precision"],
+                icon=config["icon"]
+            ) for sensor_type, config in AREA_SENSOR_INFO.items()
+        ])
+
+    return subentry_entities
+
+
 class BaseSensor(CoordinatorEntity, RestoreSensor):
     """Representation of a TWFloodSense base sensor."""
 
@@ -87,6 +161,7 @@ class BaseSensor(CoordinatorEntity, RestoreSensor):
         self._display_precision = display_precision
         self._icon = icon
         self._last_value = None
+        self._last_available = None
 
     async def async_added_to_hass(self):
         """Get the old value"""
@@ -102,13 +177,29 @@ class BaseSensor(CoordinatorEntity, RestoreSensor):
                 "Restored last value: %s for %s", self._last_value, self.name
             )
 
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when this station's record or availability changed."""
+        available = self.available
+        if (
+            available == self._last_available
+            and self._station_code not in self.coordinator.changed_stations
+        ):
+            return
+
+        self._last_available = available
+        self.coordinator.state_writes += 1
+        self.async_write_ha_state()
+
     @property
     def coordinator_data(self) -> dict:
         return self.coordinator.data
     
     @property
     def _get_value(self):
-        return self.coordinator_data.get(self._station_code, {}).get(self._sensor_type)
+        if (record := self.coordinator_data.get(self._station_code)) is None:
+            return None
+        return getattr(record, self._sensor_type, None)
 
     @property
     def device_info(self):
@@ -257,17 +348,19 @@ class FloodSenseSensor(BaseSensor):
     @property
     def extra_state_attributes(self):
         if self.coordinator_data and self._station_code in self.coordinator_data:
-            thing_data = self.coordinator_data[self._station_code]
+            record = self.coordinator_data[self._station_code]
 
             attrs = {
-                "station_name": thing_data.get("stationName", "unknown"),
+                "station_name": record.station_name or "unknown",
                 "station_code": self._station_code,
-                "station_id": thing_data.get("stationID", "unknown"),
-                "thing_id": thing_data.get("thing_id", "unknown"),
-                "longitude": thing_data.get("longitude", "unknown"),
-                "latitude": thing_data.get("latitude", "unknown"),
-                "authority_type": thing_data.get("authority_type", "unknown"),
-                "update_time": thing_data.get("update_time", "unknown"),
+                "station_id": record.station_id or "unknown",
+                "thing_id": record.thing_id or "unknown",
+                "longitude": record.longitude,
+                "latitude": record.latitude,
+                "authority_type": record.authority_type or "unknown",
+                "update_time": record.update_time,
+                "update_datetime": record.update_datetime,
+                "stale": self.coordinator.stale,
             }
 
             return attrs
@@ -275,3 +368,199 @@ class FloodSenseSensor(BaseSensor):
             return {
                 "station_code": self._station_code,
             }
+
+
+class HistorySensor(BaseSensor):
+    """Representation of a TWFloodSense sensor derived from recent observations."""
+
+    def __init__(
+        self,
+        coordinator,
+        station_code,
+        station_name,
+        sensor_type,
+        device_class,
+        unit_of_measurement=None,
+        state_class=None,
+        display_precision=None,
+        icon=None,
+    ):
+        """Initialize the history sensor."""
+        super().__init__(
+            coordinator,
+            station_code,
+            station_name,
+            sensor_type,
+            device_class,
+            unit_of_measurement,
+            state_class,
+            display_precision,
+            icon,
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Refresh the time since dry on every update while the station is wet."""
+        if self._sensor_type == "minutes_since_dry" and self._get_value:
+            self._last_available = self.available
+            self.coordinator.state_writes += 1
+            self.async_write_ha_state()
+            return
+        super()._handle_coordinator_update()
+
+    @property
+    def _get_value(self):
+        if (history := self.coordinator.histories.get(self._station_code)) is None:
+            return None
+        return getattr(history, self._sensor_type, None)
+
+    @property
+    def extra_state_attributes(self):
+        history = self.coordinator.histories.get(self._station_code)
+        return {
+            "station_code": self._station_code,
+            "samples": len(history) if history is not None else 0,
+        }
+
+
+class AreaSensor(CoordinatorEntity, SensorEntity):
+    """Representation of a TWFloodSense sensor aggregating a monitored area."""
+
+    def __init__(
+        self,
+        coordinator,
+        area,
+        sensor_type,
+        device_class,
+        unit_of_measurement=None,
+        state_class=None,
+        display_precision=None,
+        icon=None,
+    ):
+        """Initialize the area sensor."""
+        super().__init__(coordinator)
+        self._area = area
+        self._sensor_type = sensor_type
+        self._attr_device_class = device_class
+        self._attr_native_unit_of_measurement = unit_of_measurement
+        self._attr_state_class = state_class
+        self._attr_suggested_display_precision = display_precision
+        self._attr_icon = icon
+        self._attr_has_entity_name = False
+        self._attr_name = f"{area.name} {sensor_type.replace('_', ' ')}"
+        self._attr_unique_id = f"{DOMAIN}_area_{area.subentry_id}_{sensor_type}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, f"area_{area.subentry_id}")},
+            "name": f"TWFloodSense - {area.name}",
+            "manufacturer": "Water Resources Dataset of Civil IoT Taiwan",
+            "model": "TWFloodSense Area",
+        }
+        self._summary = None
+        self._last_available = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only when a member station or availability changed."""
+        available = self.available
+        if available == self._last_available and self.coordinator.changed_stations.isdisjoint(
+            self._area.members
+        ):
+            return
+
+        self._last_available = available
+        self._summary = None
+        self.coordinator.state_writes += 1
+        self.async_write_ha_state()
+
+    @property
+    def summary(self) -> dict:
+        if self._summary is None:
+            self._summary = self._area.summary(self.coordinator.data or {})
+        return self._summary
+
+    @property
+    def available(self):
+        return self.coordinator.last_update_success
+
+    @property
+    def native_value(self):
+        value = self.summary[self._sensor_type]
+        if self._sensor_type == "nearest_wet_station":
+            return value[0] if value is not None else None
+        return value
+
+    @property
+    def extra_state_attributes(self):
+        attrs = {
+            "stations": len(self._area.members),
+            "stale": self.coordinator.stale,
+        }
+        if (
+            self._sensor_type == "nearest_wet_station"
+            and (nearest := self.summary["nearest_wet_station"]) is not None
+        ):
+            record = nearest[1]
+            attrs.update(
+                {
+                    "station_name": record.station_name or "unknown",
+                    "station_code": record.station_code,
+                    "water_level": record.water_level,
+                    "latitude": record.latitude,
+                    "longitude": record.longitude,
+                }
+            )
+        return attrs
+
+
+class MetricSensor(CoordinatorEntity, SensorEntity):
+    """Representation of a TWFloodSense poll pipeline metric."""
+
+    def __init__(
+        self,
+        coordinator,
+        entry_id,
+        sensor_type,
+        device_class,
+        unit_of_measurement=None,
+        state_class=None,
+        display_precision=None,
+        icon=None,
+    ):
+        """Initialize the metric sensor."""
+        super().__init__(coordinator)
+        self._sensor_type = sensor_type
+        self._attr_device_class = device_class
+        self._attr_native_unit_of_measurement = unit_of_measurement
+        self._attr_state_class = state_class
+        self._attr_suggested_display_precision = display_precision
+        self._attr_icon = icon
+        self._attr_entity_category = EntityCategory.DIAGNOSTIC
+        self._attr_has_entity_name = False
+        shard = coordinator.shard or "main"
+        self._attr_name = f"TWFloodSense {shard} {sensor_type.replace('_', ' ')} p95"
+        self._attr_unique_id = f"{DOMAIN}_{entry_id}_{shard}_{sensor_type}_p95"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, f"{entry_id}_{shard}_metrics")},
+            "name": f"TWFloodSense - Diagnostics ({shard})",
+            "manufacturer": "Water Resources Dataset of Civil IoT Taiwan",
+            "model": "TWFloodSense",
+        }
+
+    @property
+    def available(self):
+        return True
+
+    @property
+    def native_value(self):
+        return self.coordinator.metrics.percentile(self._sensor_type, 95)
+
+    @property
+    def extra_state_attributes(self):
+        metrics = self.coordinator.metrics
+        return {
+            **metrics.summary(self._sensor_type),
+            "stations_missing": metrics.last("stations_missing"),
+            "retries": metrics.last("retries"),
+            "state_writes": metrics.last("state_writes"),
+            **metrics.counters,
+        }
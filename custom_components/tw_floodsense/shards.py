@@ -0,0 +1,270 @@
+"""Sharded flood sense coordinators for TWFloodSense."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .catalog import async_get_catalog
+from .const import (
+    AREA_SHARD,
+    DEFAULT_SHARD,
+    SHARD_BY_AUTHORITY,
+    SHARD_BY_NONE,
+    SHARD_REGION_GRID_SIZE,
+    SHARD_STAGGER_DELAY,
+    SNAPSHOT_STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .coordinator import FloodSenseCoordinator
+from .push import ObservationPushClient
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class FloodSenseShardManager:
+    """Split the stations across coordinators with independent schedules.
+
+    Each shard keeps its own failure state, poll schedule and counters, so a
+    failing shard only marks its own sensors unavailable. With sharding off
+    every station lives in a single coordinator.
+    """
+
+    def __init__(
+        self,
+        hass,
+        config_entry,
+        metadata,
+        shard_by=SHARD_BY_NONE,
+        offload=False,
+        levels=None,
+    ):
+        """Initialize the shard manager."""
+        self.hass = hass
+        self.config_entry = config_entry
+        self.metadata = metadata
+        self.shard_by = shard_by
+        self.offload = offload
+        # 所有分片共用同一個水位門檻狀態
+        self.levels = levels
+        self.catalog = None
+        self.push = None
+        self.coordinators: dict[str | None, FloodSenseCoordinator] = {}
+        self._station_shards: dict[str, str | None] = {}
+        self._area_shard = None
+        self._snapshot_store = Store(
+            hass,
+            STORAGE_VERSION,
+            SNAPSHOT_STORAGE_KEY.format(entry_id=config_entry.entry_id),
+        )
+
+    def shard_key(self, station_code) -> str | None:
+        """Return the shard of a station from its cached metadata."""
+        if self.shard_by == SHARD_BY_NONE:
+            return None
+
+        station = self.metadata.stations.get(station_code)
+        if station is None and self.catalog is not None:
+            station = self.catalog.stations.get(station_code)
+        if station is None:
+            return DEFAULT_SHARD
+
+        if self.shard_by == SHARD_BY_AUTHORITY:
+            return station.get("authority_type") or DEFAULT_SHARD
+
+        lat, lon = station.get("latitude"), station.get("longitude")
+        if not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+            return DEFAULT_SHARD
+        return (
+            f"{int(lat // SHARD_REGION_GRID_SIZE)}_"
+            f"{int(lon // SHARD_REGION_GRID_SIZE)}"
+        )
+
+    async def async_setup(self, station_codes, station_ids, areas):
+        """Assign the stations to shards and create their coordinators."""
+        await self.metadata.async_load()
+
+        if areas or (
+            self.shard_by != SHARD_BY_NONE and self.metadata.missing(station_codes)
+        ):
+            # 區域成員與尚無資料的測站分片需要全台目錄
+            self.catalog = await async_get_catalog(self.hass)
+            if self.metadata.missing(station_codes):
+                try:
+                    await self.catalog.async_ensure_fresh()
+                except Exception as e:
+                    _LOGGER.warning("Station catalog unavailable for sharding: %s", e)
+            for area in areas.values():
+                area.update_membership(self.catalog)
+
+        groups: dict[str | None, tuple[list, list]] = {}
+        for station_code, station_id in zip(station_codes, station_ids):
+            key = self.shard_key(station_code)
+            codes, ids = groups.setdefault(key, ([], []))
+            codes.append(station_code)
+            ids.append(station_id)
+            self._station_shards[station_code] = key
+
+        if areas:
+            self._area_shard = None if self.shard_by == SHARD_BY_NONE else AREA_SHARD
+            groups.setdefault(self._area_shard, ([], []))
+
+        for key, (codes, ids) in groups.items():
+            self.coordinators[key] = self._create_coordinator(
+                key, codes, ids, areas if areas and key == self._area_shard else None
+            )
+
+        _LOGGER.debug(
+            "Created %d flood sense shards: %s",
+            len(self.coordinators),
+            {key: len(codes) for key, (codes, _) in groups.items()},
+        )
+
+    def _create_coordinator(self, key, station_codes, station_ids, areas=None):
+        return FloodSenseCoordinator(
+            self.hass,
+            self.config_entry,
+            station_codes,
+            station_ids,
+            self.metadata,
+            areas=areas,
+            catalog=self.catalog,
+            shard=key,
+            snapshot_store=self._snapshot_store,
+            snapshot_data=self._snapshot_data,
+            offload=self.offload,
+            levels=self.levels,
+        )
+
+    def _snapshot_data(self) -> dict:
+        """Return the merged snapshot of every shard."""
+        return {
+            "saved_at": dt_util.utcnow().isoformat(),
+            "stations": {
+                station_code: record.as_dict()
+                for coordinator in self.coordinators.values()
+                for station_code, record in (coordinator.data or {}).items()
+            },
+        }
+
+    async def async_first_refresh(self):
+        """Publish the snapshot or fetch the first data of every shard."""
+        entry = self.config_entry
+        pending = []
+
+        for coordinator in self.coordinators.values():
+            # 有上次的快照時先載入,並在背景刷新
+            if await coordinator.async_load_snapshot():
+                # 補齊重新啟動期間缺少的長期統計資料
+                entry.async_create_background_task(
+                    self.hass,
+                    coordinator.async_backfill(),
+                    f"{coordinator.name}_backfill",
+                )
+                entry.async_create_background_task(
+                    self.hass,
+                    coordinator.async_refresh(),
+                    f"{coordinator.name}_first_refresh",
+                )
+            else:
+                pending.append(coordinator)
+
+        if len(self.coordinators) == 1 and pending:
+            await pending[0].async_config_entry_first_refresh()
+        elif pending:
+            # 分片失敗只影響自己的感測器,不中斷整個設定
+            await asyncio.gather(
+                *(coordinator.async_refresh() for coordinator in pending)
+            )
+
+        self._stagger()
+
+    def _stagger(self):
+        """Shift the schedule of each shard so their refreshes are spread out."""
+        for index, coordinator in enumerate(list(self.coordinators.values())[1:], 1):
+
+            @callback
+            def _refresh(_now, coordinator=coordinator):
+                self.config_entry.async_create_background_task(
+                    self.hass,
+                    coordinator.async_request_refresh(),
+                    f"{coordinator.name}_stagger",
+                )
+
+            self.config_entry.async_on_unload(
+                async_call_later(self.hass, index * SHARD_STAGGER_DELAY, _refresh)
+            )
+
+    def coordinator_for(self, station_code) -> FloodSenseCoordinator | None:
+        """Return the coordinator polling a configured station."""
+        return self.coordinators.get(self._station_shards.get(station_code))
+
+    @property
+    def area_coordinator(self) -> FloodSenseCoordinator | None:
+        """Return the coordinator polling the monitored areas."""
+        return self.coordinators.get(self._area_shard)
+
+    async def async_add_stations(self, station_codes, station_ids, areas) -> bool:
+        """Add stations and areas to their existing shards in place.
+
+        Returns False if they need a shard that does not exist yet.
+        """
+        if areas and self.catalog is None:
+            self.catalog = await async_get_catalog(self.hass)
+
+        keys = [self.shard_key(station_code) for station_code in station_codes]
+        area_shard = self._area_shard
+        if areas and area_shard is None and self.shard_by != SHARD_BY_NONE:
+            area_shard = AREA_SHARD
+        if any(key not in self.coordinators for key in keys) or (
+            areas and area_shard not in self.coordinators
+        ):
+            return False
+
+        changed = {}
+        for station_code, station_id, key in zip(station_codes, station_ids, keys):
+            coordinator = changed[key] = self.coordinators[key]
+            coordinator.add_stations([station_code], [station_id])
+            self._station_shards[station_code] = key
+        if areas:
+            self._area_shard = area_shard
+            coordinator = changed[area_shard] = self.coordinators[area_shard]
+            coordinator.catalog = self.catalog
+            coordinator.add_stations(areas=areas)
+
+        # 只會輪詢新加入的測站
+        await asyncio.gather(
+            *(coordinator.async_refresh() for coordinator in changed.values())
+        )
+        return True
+
+    def remove_stations(self, station_codes, area_ids):
+        """Remove stations and areas from their shards."""
+        for station_code in station_codes:
+            if (coordinator := self.coordinator_for(station_code)) is not None:
+                coordinator.remove_stations([station_code])
+            self._station_shards.pop(station_code, None)
+            if self.levels is not None:
+                self.levels.remove_station(station_code)
+        if area_ids and (coordinator := self.area_coordinator) is not None:
+            coordinator.remove_stations(area_ids=area_ids)
+
+    async def async_start_push(self):
+        """Start one MQTT client shared by every shard."""
+        self.push = ObservationPushClient(self.hass)
+        for coordinator in self.coordinators.values():
+            coordinator.attach_push(self.push)
+        await self.push.async_start()
+
+    async def async_stop_push(self):
+        """Stop the shared MQTT client."""
+        if (push := self.push) is None:
+            return
+        self.push = None
+        for coordinator in self.coordinators.values():
+            coordinator.detach_push()
+        await push.async_stop()
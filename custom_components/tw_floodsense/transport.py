@@ -0,0 +1,157 @@
+"""Pluggable HTTP transport for TWFloodSense.
+
+Every request to the SensorThings API goes through ``async_get_transport``.
+By default that is Home Assistant's shared httpx client. A recording or
+replaying transport can be installed in ``hass.data[TRANSPORT_DATA_KEY]`` to
+capture live responses to fixture files and serve them offline.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from homeassistant.helpers.httpx_client import get_async_client
+
+from .const import TRANSPORT_DATA_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def async_get_transport(hass):
+    """Return the transport used for API requests."""
+    if (transport := hass.data.get(TRANSPORT_DATA_KEY)) is not None:
+        return transport
+    return get_async_client(hass, False)
+
+
+def _fixture_name(url) -> str:
+    return f"{hashlib.sha1(url.encode()).hexdigest()[:16]}.json"
+
+
+class FixtureResponse:
+    """A recorded response with the parts of the httpx API the client uses."""
+
+    def __init__(self, status_code, content: bytes):
+        """Initialize the response."""
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"content-length": str(len(content))}
+
+    @property
+    def is_success(self) -> bool:
+        return 200 <= self.status_code < 300
+
+    @property
+    def num_bytes_downloaded(self) -> int:
+        # 錄製的內容已解壓縮,重播時即為傳輸量
+        return len(self.content)
+
+    def json(self):
+        return json.loads(self.content)
+
+    async def aread(self) -> bytes:
+        return self.content
+
+    async def aiter_bytes(self, chunk_size=None):
+        chunk_size = chunk_size or 65536
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    async def aclose(self):
+        pass
+
+
+class RecordingTransport:
+    """Forward requests to a client and save every response as a fixture."""
+
+    def __init__(self, hass, client, directory):
+        """Initialize the recording transport."""
+        self.hass = hass
+        self.client = client
+        self.directory = Path(directory)
+
+    async def get(self, url, **kwargs):
+        """Send the request and record the response."""
+        response = await self.client.get(url, **kwargs)
+        await self.hass.async_add_executor_job(
+            self._write, str(url), response.status_code, response.content
+        )
+        return response
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Send the request, record it and expose the body as a stream."""
+        yield await self.get(url, **kwargs)
+
+    def _write(self, url, status_code, content):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / _fixture_name(url)).write_text(
+            json.dumps(
+                {
+                    "url": url,
+                    "status": status_code,
+                    "body": content.decode("utf-8", "replace"),
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+
+
+class ReplayTransport:
+    """Serve recorded fixtures with configurable latency and errors.
+
+    ``errors`` maps a URL substring to the status code to return instead of
+    the fixture; ``error_rate`` fails that share of requests with a 503.
+    Unknown URLs return 404.
+    """
+
+    def __init__(self, hass, directory, latency=0.0, errors=None, error_rate=0.0, rng=None):
+        """Initialize the replay transport."""
+        self.hass = hass
+        self.directory = Path(directory)
+        self.latency = latency
+        self.errors = errors or {}
+        self.error_rate = error_rate
+        self.rng = rng or random.Random()
+        self.requests = 0
+        self._fixtures: dict[str, tuple[int, bytes]] | None = None
+
+    async def get(self, url, **kwargs):
+        """Return the recorded response of a URL."""
+        if self._fixtures is None:
+            self._fixtures = await self.hass.async_add_executor_job(self._load)
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        url = str(url)
+        for pattern, status_code in self.errors.items():
+            if pattern in url:
+                return FixtureResponse(status_code, b"{}")
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return FixtureResponse(503, b"{}")
+
+        if (fixture := self._fixtures.get(url)) is None:
+            _LOGGER.debug("No fixture recorded for %s", url)
+            return FixtureResponse(404, b"{}")
+        return FixtureResponse(*fixture)
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        """Return the recorded response as a stream."""
+        yield await self.get(url, **kwargs)
+
+    def _load(self) -> dict[str, tuple[int, bytes]]:
+        fixtures = {}
+        for path in self.directory.glob("*.json"):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            fixtures[data["url"]] = (data["status"], data["body"].encode("utf-8"))
+        _LOGGER.debug("Loaded %d fixtures from %s", len(fixtures), self.directory)
+        return fixtures
@@ -0,0 +1,115 @@
+"""Shared helpers for the coordinator and push tests."""
+from __future__ import annotations
+
+import json
+import re
+import tempfile
+from contextlib import asynccontextmanager
+
+from custom_components.tw_floodsense.const import DOMAIN, TRANSPORT_DATA_KEY
+from custom_components.tw_floodsense.transport import FixtureResponse
+
+PHENOMENON_TIME = "2026-10-17T01:00:00.000Z"
+
+
+class FakeSensorThings:
+    """Answer metadata and observation queries for a few stations.
+
+    Station ``index`` has stationCode ``C<index>``, stationID ``S<index>``
+    and Datastream ``1000 + index``. ``fail_metadata`` answers metadata
+    queries with a 503.
+    """
+
+    def __init__(self, count):
+        """Initialize the fake API."""
+        self.results = {1000 + index: float(index) for index in range(count)}
+        self.phenomenon_time = PHENOMENON_TIME
+        self.fail_metadata = False
+        self.requests = []
+
+    @property
+    def station_codes(self):
+        return [f"C{datastream_id - 1000}" for datastream_id in self.results]
+
+    def metadata_requests(self):
+        return [url for url in self.requests if "substringof" in url]
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        self.requests.append(url)
+        if "$filter=name eq" in url:
+            value = [self._datastream(datastream_id) for datastream_id in self.results]
+        elif "substringof" in url:
+            if self.fail_metadata:
+                yield FixtureResponse(503, b"{}")
+                return
+            value = [
+                self._datastream(int(station_id[1:]) + 1000)
+                for station_id in re.findall(r"stationID=([^']+)'", url)
+                if int(station_id[1:]) + 1000 in self.results
+            ]
+        else:
+            value = [
+                {
+                    "@iot.id": datastream_id,
+                    "Observations": [
+                        {
+                            "result": self.results[datastream_id],
+                            "phenomenonTime": self.phenomenon_time,
+                        }
+                    ],
+                }
+                for datastream_id in map(int, re.findall(r"id eq (\d+)", url))
+                if datastream_id in self.results
+            ]
+        yield FixtureResponse(200, json.dumps({"value": value}).encode())
+
+    @staticmethod
+    def _datastream(datastream_id):
+        index = datastream_id - 1000
+        return {
+            "@iot.id": datastream_id,
+            "observedArea": {"type": "Point", "coordinates": [121.5, 25.0]},
+            "Thing": {
+                "@iot.id": index,
+                "properties": {
+                    "stationID": f"S{index}",
+                    "stationCode": f"C{index}",
+                    "stationName": f"測站{index}",
+                    "authority_type": "水利署",
+                },
+            },
+        }
+
+
+@asynccontextmanager
+async def async_test_hass(client=None):
+    """Yield a Home Assistant instance that sends requests to ``client``."""
+    from pytest_homeassistant_custom_component.common import async_test_home_assistant
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        async with async_test_home_assistant(config_dir=config_dir) as hass:
+            if client is not None:
+                hass.data[TRANSPORT_DATA_KEY] = client
+            yield hass
+
+
+async def async_make_coordinator(hass, client, station_codes=None, **kwargs):
+    """Return a FloodSenseCoordinator for the stations of the fake API."""
+    from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+    from custom_components.tw_floodsense.coordinator import FloodSenseCoordinator
+    from custom_components.tw_floodsense.metadata import StationMetadata
+
+    entry = MockConfigEntry(domain=DOMAIN, entry_id="test")
+    station_codes = client.station_codes if station_codes is None else station_codes
+    coordinator = FloodSenseCoordinator(
+        hass,
+        entry,
+        station_codes,
+        [f"S{station_code[1:]}" for station_code in station_codes],
+        StationMetadata(hass, entry.entry_id),
+        **kwargs,
+    )
+    await coordinator._async_setup()
+    return coordinator
@@ -0,0 +1,165 @@
+"""Tests for the SensorThings streaming helpers."""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from custom_components.tw_floodsense.api import ValueStreamDecoder, async_iter_values
+from custom_components.tw_floodsense.const import STREAM_CHUNK_SIZE
+from custom_components.tw_floodsense.transport import FixtureResponse
+
+PAGE = {
+    "@iot.count": 3,
+    "value": [
+        {"result": 3.5, "phenomenonTime": "2026-10-17T01:00:00Z"},
+        {"result": -12, "flag": True, "note": None},
+        {"result": 1e3, "nested": {"a": [1, 2.25, False]}},
+    ],
+    "@iot.nextLink": "https://example.invalid/next",
+}
+
+
+def _decode(chunks):
+    decoder = ValueStreamDecoder()
+    items = []
+    for chunk in chunks:
+        items.extend(decoder.feed(chunk))
+    items.extend(decoder.feed(b"", final=True))
+    return items, decoder.head
+
+
+def test_number_split_across_chunks():
+    items, _ = _decode([b'{"value": [3.', b"5, tr", b"ue, 1", b"e2]}"])
+    assert items == [3.5, True, 100.0]
+
+
+def test_every_split_point():
+    raw = json.dumps(PAGE, ensure_ascii=False).encode()
+    for size in (1, 2, 3, 7, 64):
+        chunks = [raw[i : i + size] for i in range(0, len(raw), size)]
+        items, head = _decode(chunks)
+        assert items == PAGE["value"]
+        assert head["@iot.nextLink"] == PAGE["@iot.nextLink"]
+
+
+def test_invalid_literal_raises():
+    with pytest.raises(ValueError):
+        _decode([b'{"value": [3.x, 1]}'])
+    with pytest.raises(ValueError):
+        _decode([b'{"value": [1, 2'])
+
+
+class FakeStreamClient:
+    """Serve pages with a delay before the headers of each response."""
+
+    def __init__(self, pages, delay):
+        self.pages = pages
+        self.delay = delay
+        self.requested = []
+        self.closed = 0
+        # 已送出但尚未收到標頭的請求數
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def stream(self, method, url, **kwargs):
+        self.requested.append(url)
+        self.waiting += 1
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.waiting -= 1
+        try:
+            yield FixtureResponse(200, json.dumps(self.pages[url]).encode())
+        finally:
+            self.closed += 1
+
+
+def _chain(count):
+    pages = {}
+    for index in range(count):
+        # FROST 將 @iot.nextLink 放在 value 之前
+        page = {}
+        if index + 1 < count:
+            page["@iot.nextLink"] = f"page{index + 1}"
+        page["value"] = [index, "x" * 200]
+        pages[f"page{index}"] = page
+    return pages
+
+
+def test_next_page_requested_before_current_is_consumed():
+    client = FakeStreamClient(_chain(3), delay=0)
+
+    async def run():
+        requested = []
+        async for value in async_iter_values(client, "page0"):
+            await asyncio.sleep(0)
+            requested.append(len(client.requested))
+        return requested
+
+    assert asyncio.run(run()) == [2, 3, 3]
+    assert client.requested == ["page0", "page1", "page2"]
+    assert client.closed == 3
+
+
+def test_prefetch_overlaps_round_trips():
+    client = FakeStreamClient(_chain(4), delay=0.05)
+
+    async def run():
+        waiting = []
+        async for value in async_iter_values(client, "page0"):
+            await asyncio.sleep(0)
+            # 處理這一頁時,下一頁的請求已在等待回應
+            waiting.append(client.waiting)
+            await asyncio.sleep(0.05)
+        return waiting
+
+    assert asyncio.run(run()) == [1, 1, 1, 0]
+    assert client.requested == ["page0", "page1", "page2", "page3"]
+
+
+def test_stop_early_closes_prefetched_response():
+    client = FakeStreamClient(_chain(3), delay=0)
+
+    async def run():
+        batches = async_iter_values(client, "page0")
+        await batches.__anext__()
+        await asyncio.sleep(0.01)
+        await batches.aclose()
+
+    asyncio.run(run())
+    assert client.closed == len(client.requested)
+
+
+def test_max_pages_stops_following():
+    client = FakeStreamClient(_chain(5), delay=0)
+
+    async def run():
+        return [value async for value in async_iter_values(client, "page0", max_pages=2)]
+
+    assert len(asyncio.run(run())) == 2
+    assert client.requested == ["page0", "page1"]
+
+
+def test_large_body_is_decoded_in_bounded_chunks(monkeypatch):
+    pages = {"page0": {"value": ["x" * 1000] * 500}}
+    client = FakeStreamClient(pages, delay=0)
+    fed = []
+    feed = ValueStreamDecoder.feed
+
+    def _feed(self, chunk, final=False):
+        fed.append(len(chunk))
+        return feed(self, chunk, final)
+
+    monkeypatch.setattr(ValueStreamDecoder, "feed", _feed)
+
+    async def run():
+        return [
+            item
+            async for value in async_iter_values(client, "page0")
+            for item in value
+        ]
+
+    assert len(asyncio.run(run())) == 500
+    assert len(fed) > 2
+    assert max(fed) <= STREAM_CHUNK_SIZE
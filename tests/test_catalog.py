@@ -0,0 +1,79 @@
+"""Tests for the station catalog indexes."""
+import asyncio
+import random
+
+import pytest
+
+from custom_components.tw_floodsense.catalog import StationCatalog, haversine
+
+from .common import FakeSensorThings, async_test_hass
+
+
+@pytest.fixture
+def catalog():
+    rng = random.Random(1)
+    names = ["中山路", "中正路", "民生東路", "仁愛路", "Zhongshan Rd", "信義路"]
+    stations = {}
+    for index in range(500):
+        station_code = f"ST{index:04d}"
+        stations[station_code] = {
+            "stationCode": station_code,
+            "stationName": f"{rng.choice(names)}{index}號",
+            "latitude": rng.uniform(22.0, 25.3),
+            "longitude": rng.uniform(120.1, 121.9),
+        }
+
+    async def create():
+        async with async_test_hass() as hass:
+            catalog = StationCatalog(hass)
+            catalog._set_stations(stations)
+            return catalog
+
+    return asyncio.run(create())
+
+
+@pytest.mark.parametrize("query", ["中山", "路1", "st01", "ZHONG", "號", "7", "不存在"])
+def test_search_matches_linear_scan(catalog, query):
+    expected = [
+        catalog.stations[station_code]
+        for name, station_code in catalog._names
+        if query.casefold() in name
+    ]
+    assert catalog.search(query) == expected
+    assert catalog.search(query, limit=3) == expected[:3]
+
+
+def test_search_ignores_blank_query(catalog):
+    assert catalog.search("  ") == []
+
+
+def test_nearby_matches_brute_force(catalog):
+    expected = sorted(
+        (haversine(24.0, 121.0, s["latitude"], s["longitude"]), s["stationCode"])
+        for s in catalog.stations.values()
+    )
+    expected = [code for distance, code in expected if distance <= 20]
+    assert [s["stationCode"] for _, s in catalog.nearby(24.0, 121.0, 20)] == expected
+
+
+def test_download_is_persisted_and_reloaded():
+    client = FakeSensorThings(3)
+
+    async def run():
+        async with async_test_hass(client) as hass:
+            catalog = StationCatalog(hass)
+            await catalog.async_load()
+            assert catalog.is_expired()
+            await catalog.async_ensure_fresh()
+            assert not catalog.is_expired()
+
+            reloaded = StationCatalog(hass)
+            await reloaded.async_load()
+            return catalog, reloaded, len(client.requests)
+
+    catalog, reloaded, requests = asyncio.run(run())
+    assert requests == 1
+    assert sorted(reloaded.stations) == ["C0", "C1", "C2"]
+    assert reloaded.stations == catalog.stations
+    assert reloaded.updated_at == catalog.updated_at
+    assert [s["stationCode"] for s in reloaded.search("測站1")] == ["C1"]
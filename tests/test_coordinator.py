@@ -0,0 +1,114 @@
+"""Tests for the flood sense coordinator."""
+import asyncio
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.tw_floodsense.const import (
+    METADATA_REFRESH_INTERVAL,
+    METADATA_RETRY_INTERVAL,
+    PUSH_POLL_INTERVAL,
+)
+
+from .common import FakeSensorThings, async_make_coordinator, async_test_hass
+
+
+def test_refresh_publishes_data():
+    client = FakeSensorThings(3)
+
+    async def run():
+        async with async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success
+            assert coordinator.update_interval == coordinator.scheduler.interval
+
+            # 第二輪沒有到期的測站,沿用上一輪的資料
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success
+            await coordinator.async_shutdown()
+            return coordinator.data
+
+    data = asyncio.run(run())
+    assert sorted(data) == ["C0", "C1", "C2"]
+    assert data["C2"].water_level == 2.0
+
+
+def test_connected_push_relaxes_poll_interval():
+    client = FakeSensorThings(1)
+
+    class FakePush:
+        connected = True
+
+        def add_listener(self, *args):
+            pass
+
+        def update_subscriptions(self, *args):
+            pass
+
+    async def run():
+        async with async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(hass, client)
+            coordinator.attach_push(FakePush())
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success
+            await coordinator.async_shutdown()
+            return coordinator.update_interval
+
+    assert asyncio.run(run()) == PUSH_POLL_INTERVAL
+
+
+def test_empty_station_set_is_a_successful_update():
+    client = FakeSensorThings(2)
+
+    async def run():
+        async with async_test_hass(client) as hass:
+            # 區域內沒有測站的分片
+            empty = await async_make_coordinator(hass, client, station_codes=[])
+            await empty.async_refresh()
+            assert empty.last_update_success
+            assert empty.data == {}
+            assert client.requests == []
+
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            coordinator.remove_stations(["C0", "C1"])
+            await coordinator.async_refresh()
+            assert coordinator.last_update_success
+            assert coordinator.data == {}
+            await empty.async_shutdown()
+            await coordinator.async_shutdown()
+
+    asyncio.run(run())
+
+
+def test_failed_metadata_refresh_backs_off(monkeypatch):
+    client = FakeSensorThings(2)
+    now = dt_util.utcnow()
+    monkeypatch.setattr(dt_util, "utcnow", lambda: now)
+
+    async def run():
+        nonlocal now
+        async with async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            assert len(client.metadata_requests()) == 1
+
+            now += METADATA_REFRESH_INTERVAL
+            client.fail_metadata = True
+            # 完整更新失敗後,輪詢沿用快取的靜態資料且不再重抓
+            for _ in range(3):
+                coordinator.scheduler.expire()
+                await coordinator.async_refresh()
+                assert coordinator.last_update_success
+                now += timedelta(minutes=5)
+            assert len(client.metadata_requests()) == 2
+
+            now += METADATA_RETRY_INTERVAL
+            client.fail_metadata = False
+            await coordinator.async_refresh()
+            assert len(client.metadata_requests()) == 3
+            assert not coordinator.metadata.is_expired()
+            await coordinator.async_shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+"""Tests for the observation ring buffer."""
+from datetime import datetime, timezone
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.tw_floodsense.const import (
+    HISTORY_PEAK_WINDOW,
+    HISTORY_SIZE,
+    POLL_TIER_INTERVALS,
+)
+from custom_components.tw_floodsense.history import ObservationHistory
+
+START = datetime(2026, 10, 17, 1, 0, tzinfo=timezone.utc).timestamp()
+
+
+def test_peak_covers_window_at_fastest_interval():
+    interval = min(POLL_TIER_INTERVALS.values()).total_seconds()
+    assert HISTORY_SIZE * interval >= 2 * HISTORY_PEAK_WINDOW
+
+    history = ObservationHistory()
+    history.append(START, 80.0)
+    # 每 30 秒一筆推播觀測,一小時內的最高水位仍在緩衝區內
+    for step in range(1, 110):
+        history.append(START + step * 30, 10.0)
+    assert history.peak_1h == 80.0
+
+    history.append(START + HISTORY_PEAK_WINDOW + 30, 10.0)
+    assert history.peak_1h == 10.0
+
+
+def test_minutes_since_dry_counts_until_now(monkeypatch):
+    history = ObservationHistory()
+    assert history.minutes_since_dry is None
+
+    history.append(START, 0.0)
+    history.append(START + 60, 5.0)
+    now = START + 600
+    monkeypatch.setattr(
+        dt_util, "utcnow", lambda: datetime.fromtimestamp(now, timezone.utc)
+    )
+    assert history.minutes_since_dry == 10.0
+
+    now = START + 1200
+    assert history.minutes_since_dry == 20.0
+
+    history.append(START + 1200, 0.0)
+    assert history.minutes_since_dry == 0.0
+
+
+def test_rise_rate_and_duplicates():
+    history = ObservationHistory()
+    assert history.append(START, 1.0)
+    assert history.append(START + 300, 3.0)
+    assert not history.append(START + 300, 9.0)
+    assert history.rise_rate == 4.0
+    assert len(history) == 2
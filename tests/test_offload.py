@@ -0,0 +1,106 @@
+"""Tests for executor offloading."""
+import asyncio
+import json
+from types import MappingProxyType
+
+import pytest
+
+from custom_components.tw_floodsense import offload
+from custom_components.tw_floodsense.coordinator import FloodSenseCoordinator
+from custom_components.tw_floodsense.offload import AdaptiveOffloader
+
+# 每單位工作的耗時(秒)
+UNIT_COST = 0.0001
+
+
+class FakeHass:
+    """Record the functions sent to the executor."""
+
+    def __init__(self):
+        self.executed = []
+
+    async def async_add_executor_job(self, func, *args):
+        # func 為 functools.partial(_timed, 工作函式, *參數)
+        self.executed.append((func.args[0], func.args[1:]))
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class FakeClock:
+    """perf_counter that only advances by the simulated work."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(offload.time, "perf_counter", clock)
+    return clock
+
+
+def test_large_work_is_offloaded(clock):
+    hass = FakeHass()
+    offloader = AdaptiveOffloader(hass, target=0.005)
+
+    def _work(units):
+        clock.now += units * UNIT_COST
+        return units
+
+    async def run():
+        # 第一次以小工作量在 event loop 上學習單位耗時
+        assert await offloader.async_run(_work, 10, 10) == 10
+        assert hass.executed == []
+        assert offloader.threshold == pytest.approx(50)
+
+        for units in (10, 800, 40, 60):
+            assert await offloader.async_run(_work, units, units) == units
+
+    asyncio.run(run())
+    assert hass.executed == [(_work, (800,)), (_work, (60,))]
+    assert offloader.offloaded == 2
+
+
+def test_disabled_offloader_runs_inline(clock):
+    hass = FakeHass()
+    offloader = AdaptiveOffloader(hass, enabled=False)
+
+    def _work(units):
+        clock.now += units * UNIT_COST
+        return units
+
+    async def run():
+        for units in (10, 800):
+            await offloader.async_run(_work, units, units)
+
+    asyncio.run(run())
+    assert offloader.threshold is None
+    assert hass.executed == []
+    assert offloader.offloaded == 0
+
+
+def test_parse_data_only_reads_context():
+    metadata = {"stationCode": "C1", "datastream_id": 11}
+    context = MappingProxyType({11: ("C1", metadata, None)})
+    value = json.loads(
+        '[{"@iot.id": 11, "Observations": '
+        '[{"result": 3.5, "phenomenonTime": "2026-10-17T01:00:00Z"}]},'
+        '{"@iot.id": 99, "Observations": []}]'
+    )
+
+    async def run(hass):
+        offloader = AdaptiveOffloader(hass, target=0)
+        offloader.cost = 1.0
+        return await offloader.async_run(
+            FloodSenseCoordinator._parse_data, len(value), value, context
+        )
+
+    hass = FakeHass()
+    result = asyncio.run(run(hass))
+    assert [func for func, _ in hass.executed] == [FloodSenseCoordinator._parse_data]
+    assert list(result) == ["C1"]
+    assert result["C1"].metadata is metadata
+    assert result["C1"].water_level == 3.5
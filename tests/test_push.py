@@ -0,0 +1,264 @@
+"""Tests for MQTT push updates against a local broker stand-in."""
+import asyncio
+import json
+
+import pytest
+
+from custom_components.tw_floodsense.const import PUSH_POLL_INTERVAL
+from custom_components.tw_floodsense.push import ObservationPushClient
+
+from .common import FakeSensorThings, async_make_coordinator, async_test_hass
+
+NEWER_TIME = "2026-10-17T01:10:00.000Z"
+
+
+def _encode_length(length) -> bytes:
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | (128 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+async def _read_length(reader) -> int:
+    length = 0
+    for shift in range(0, 28, 7):
+        digit = (await reader.readexactly(1))[0]
+        length |= (digit & 127) << shift
+        if not digit & 128:
+            break
+    return length
+
+
+def _read_topics(body, with_qos):
+    """Return the topic filters of a SUBSCRIBE or UNSUBSCRIBE packet."""
+    topics = []
+    pos = 2
+    while pos < len(body):
+        length = int.from_bytes(body[pos:pos + 2], "big")
+        topics.append(body[pos + 2:pos + 2 + length].decode())
+        pos += 2 + length + (1 if with_qos else 0)
+    return topics
+
+
+class FakeBroker:
+    """Minimal MQTT 3.1.1 broker with QoS 0 delivery only."""
+
+    def __init__(self):
+        self.port = None
+        self.connections = 0
+        self._server = None
+        # writer -> 該連線訂閱的 topic
+        self._clients = {}
+
+    @property
+    def subscriptions(self) -> set[str]:
+        return set().union(*self._clients.values())
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *args):
+        self.drop()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def publish(self, topic, payload: bytes):
+        """Deliver a message to the clients subscribed to the topic."""
+        encoded = topic.encode()
+        body = len(encoded).to_bytes(2, "big") + encoded + payload
+        packet = b"\x30" + _encode_length(len(body)) + body
+        for writer, topics in self._clients.items():
+            if topic in topics:
+                writer.write(packet)
+
+    def drop(self):
+        """Close every client connection without a DISCONNECT."""
+        for writer in list(self._clients):
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        topics = self._clients[writer] = set()
+        self.connections += 1
+        try:
+            while True:
+                kind = (await reader.readexactly(1))[0] >> 4
+                body = await reader.readexactly(await _read_length(reader))
+                if kind == 1:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif kind == 8:  # SUBSCRIBE
+                    added = _read_topics(body, True)
+                    topics.update(added)
+                    writer.write(
+                        b"\x90" + _encode_length(2 + len(added)) + body[:2]
+                        + bytes(len(added))
+                    )
+                elif kind == 10:  # UNSUBSCRIBE
+                    topics.difference_update(_read_topics(body, False))
+                    writer.write(b"\xb0\x02" + body[:2])
+                elif kind == 12:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif kind == 14:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+
+
+async def _wait_for(predicate, timeout=5):
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+def _topic(datastream_id):
+    return ObservationPushClient._topic(datastream_id)
+
+
+def _observation(result, phenomenon_time=NEWER_TIME) -> bytes:
+    return json.dumps({"result": result, "phenomenonTime": phenomenon_time}).encode()
+
+
+async def _async_start(hass, broker, coordinator):
+    push = ObservationPushClient(hass, "127.0.0.1", broker.port)
+    coordinator.attach_push(push)
+    await push.async_start()
+    await _wait_for(lambda: push.connected)
+    return push
+
+
+@pytest.fixture
+def client():
+    return FakeSensorThings(3)
+
+
+def test_observations_are_routed_to_the_coordinator(client):
+    async def run():
+        async with FakeBroker() as broker, async_test_hass(client) as hass:
+            errors = []
+            asyncio.get_running_loop().set_exception_handler(
+                lambda loop, context: errors.append(context)
+            )
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            push = await _async_start(hass, broker, coordinator)
+            try:
+                received = []
+                push.add_listener(
+                    "other", lambda *args: received.append(args), lambda _: None, [1000]
+                )
+                await _wait_for(
+                    lambda: broker.subscriptions == {_topic(i) for i in (1000, 1001, 1002)}
+                )
+
+                # 非物件的訊息被忽略,不影響後面的觀測
+                broker.publish(_topic(1000), b"[1, 2]")
+                broker.publish(_topic(1000), b"3.5")
+                broker.publish(_topic(1000), _observation(7.0))
+                broker.publish(_topic(1001), _observation(9.0))
+                await _wait_for(lambda: coordinator.data["C1"].water_level == 9.0)
+                assert coordinator.data["C0"].water_level == 7.0
+                assert received == [(1000, json.loads(_observation(7.0)))]
+                assert coordinator.data["C2"].water_level == 2.0
+                assert coordinator.metrics.counters["pushes"] == 2
+                assert errors == []
+            finally:
+                await push.async_stop()
+                await coordinator.async_shutdown()
+
+    asyncio.run(run())
+
+
+def test_subscriptions_follow_station_changes():
+    client = FakeSensorThings(4)
+
+    async def run():
+        async with FakeBroker() as broker, async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(
+                hass, client, station_codes=["C0", "C1", "C2"]
+            )
+            await coordinator.async_refresh()
+            push = await _async_start(hass, broker, coordinator)
+            try:
+                await _wait_for(
+                    lambda: broker.subscriptions == {_topic(i) for i in (1000, 1001, 1002)}
+                )
+
+                coordinator.remove_stations(["C1"])
+                await _wait_for(
+                    lambda: broker.subscriptions == {_topic(1000), _topic(1002)}
+                )
+
+                # 新測站的靜態資料在下一次更新取得後才訂閱
+                coordinator.add_stations(["C3"], ["S3"])
+                await coordinator.async_refresh()
+                assert coordinator.last_update_success
+                await _wait_for(
+                    lambda: broker.subscriptions == {_topic(i) for i in (1000, 1002, 1003)}
+                )
+
+                coordinator.detach_push()
+                await _wait_for(lambda: not broker.subscriptions)
+            finally:
+                await push.async_stop()
+                await coordinator.async_shutdown()
+
+    asyncio.run(run())
+
+
+def test_disconnect_falls_back_to_polling(client):
+    async def run():
+        async with FakeBroker() as broker, async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            push = await _async_start(hass, broker, coordinator)
+            try:
+                await coordinator.async_refresh()
+                assert coordinator.update_interval == PUSH_POLL_INTERVAL
+                polled = len(client.requests)
+
+                broker.drop()
+                await _wait_for(lambda: not push.connected)
+                await _wait_for(lambda: len(client.requests) > polled)
+                # 排程已過期,所有測站在同一次補漏輪詢中更新
+                assert all(
+                    f"id eq {datastream_id}" in client.requests[-1]
+                    for datastream_id in (1000, 1001, 1002)
+                )
+                assert coordinator.update_interval == coordinator.scheduler.interval
+
+                # paho 自行重新連線並重新訂閱
+                await _wait_for(lambda: push.connected)
+                await _wait_for(lambda: len(broker.subscriptions) == 3)
+                assert broker.connections == 2
+            finally:
+                await push.async_stop()
+                await coordinator.async_shutdown()
+
+    asyncio.run(run())
+
+
+def test_own_disconnect_is_ignored(client):
+    async def run():
+        async with FakeBroker() as broker, async_test_hass(client) as hass:
+            coordinator = await async_make_coordinator(hass, client)
+            await coordinator.async_refresh()
+            push = await _async_start(hass, broker, coordinator)
+            changes = []
+            push.add_listener("other", lambda *args: None, changes.append)
+
+            polled = len(client.requests)
+            await push.async_stop()
+            await asyncio.sleep(0.1)
+
+            assert changes == []
+            assert len(client.requests) == polled
+            await coordinator.async_shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,205 @@
+"""Tests for the retry policy, circuit breaker and retry decorator."""
+import asyncio
+from datetime import timedelta
+import time
+
+import pytest
+
+from custom_components.tw_floodsense import coordinator as coordinator_module
+from custom_components.tw_floodsense.coordinator import retry_on_failure
+from custom_components.tw_floodsense.exceptions import (
+    CircuitOpenError,
+    RequestFailedError,
+)
+from custom_components.tw_floodsense.retry import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    NotificationLimiter,
+    RetryPolicy,
+)
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeServices:
+    def __init__(self):
+        self.calls = []
+
+    async def async_call(self, *args):
+        self.calls.append(args)
+
+
+class FakeHass:
+    def __init__(self):
+        self.services = FakeServices()
+
+
+class FakeCoordinator:
+    """Minimal object carrying what retry_on_failure needs."""
+
+    def __init__(self, clock, results, policy=None, update_interval=None):
+        self.hass = FakeHass()
+        self.retry_policy = policy or RetryPolicy(clock=clock, rng=lambda: 1.0)
+        self.circuit_breaker = CircuitBreaker(clock=clock)
+        self.notification_limiter = NotificationLimiter(clock=clock)
+        self.update_interval = update_interval
+        self.retries_used = 0
+        self.recovered = 0
+        self.calls = 0
+        self._results = list(results)
+
+    def _async_circuit_recovered(self):
+        self.recovered += 1
+
+    @retry_on_failure()
+    async def fetch(self):
+        self.calls += 1
+        result = self._results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        if callable(result):
+            return await result()
+        return result
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock that the backoff sleeps advance instead of waiting."""
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock.advance(delay)
+
+    monkeypatch.setattr(coordinator_module.asyncio, "sleep", fake_sleep)
+    clock.sleeps = sleeps
+    return clock
+
+
+def _failure():
+    return RequestFailedError({"name": "Test", "exception": "boom"})
+
+
+def test_backoff_grows_exponentially_up_to_max_delay():
+    policy = RetryPolicy(base_delay=2, max_delay=10, rng=lambda: 1.0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [2, 4, 8, 10, 10]
+
+    policy = RetryPolicy(base_delay=2, max_delay=10, rng=lambda: 0.5)
+    assert policy.delay(2) == 4
+
+
+def test_next_delay_respects_deadline_and_attempts():
+    clock = FakeClock()
+    policy = RetryPolicy(
+        max_attempts=3, base_delay=2, deadline=10, clock=clock, rng=lambda: 1.0
+    )
+    started = clock()
+    assert policy.next_delay(0, started, policy.deadline) == 2
+    clock.advance(7)
+    # 7 + 4 秒會超過截止時間
+    assert policy.next_delay(1, started, policy.deadline) is None
+    assert policy.next_delay(2, started, 100) is None
+
+
+def test_circuit_breaker_opens_probes_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    assert breaker.remaining == 60
+
+    clock.advance(60)
+    assert breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+
+    # 探測失敗立即重新開啟
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    clock.advance(60)
+    assert breaker.allow_request()
+    assert breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert not breaker.record_success()
+
+
+def test_notification_limiter():
+    clock = FakeClock()
+    limiter = NotificationLimiter(interval=3600, clock=clock)
+    assert limiter.allow()
+    clock.advance(3599)
+    assert not limiter.allow()
+    clock.advance(1)
+    assert limiter.allow()
+
+
+def test_retries_with_backoff_until_success(clock):
+    coordinator = FakeCoordinator(clock, [_failure(), _failure(), "data"])
+
+    assert asyncio.run(coordinator.fetch()) == "data"
+    assert coordinator.calls == 3
+    assert clock.sleeps == [2.0, 4.0]
+    assert coordinator.retries_used == 2
+    assert coordinator.circuit_breaker.failures == 0
+
+
+def test_retry_stops_at_update_interval_deadline(clock):
+    coordinator = FakeCoordinator(
+        clock, [_failure()] * 5, update_interval=timedelta(seconds=10)
+    )
+
+    assert asyncio.run(coordinator.fetch()) is None
+    # 截止時間為 8 秒:2 + 4 秒後下一次 8 秒的等待放不下
+    assert clock.sleeps == [2.0, 4.0]
+    assert coordinator.calls == 3
+    assert coordinator.circuit_breaker.failures == 1
+    assert len(coordinator.hass.services.calls) == 1
+
+
+def test_attempt_is_cancelled_at_deadline():
+    async def slow():
+        await asyncio.sleep(1)
+        return "late"
+
+    policy = RetryPolicy(deadline=0.05)
+    coordinator = FakeCoordinator(time.monotonic, [slow, "data"], policy=policy)
+
+    assert asyncio.run(coordinator.fetch()) is None
+    assert coordinator.calls == 1
+    assert coordinator.circuit_breaker.failures == 1
+
+
+def test_open_circuit_skips_requests_and_probes_once(clock):
+    policy = RetryPolicy(clock=clock, rng=lambda: 1.0)
+    coordinator = FakeCoordinator(clock, [_failure()] * 20, policy=policy)
+    coordinator.circuit_breaker = CircuitBreaker(
+        failure_threshold=1, cooldown=900, clock=clock
+    )
+
+    assert asyncio.run(coordinator.fetch()) is None
+    calls = coordinator.calls
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(coordinator.fetch())
+    assert coordinator.calls == calls
+
+    clock.advance(900)
+    coordinator._results = ["data"]
+    assert asyncio.run(coordinator.fetch()) == "data"
+    assert coordinator.recovered == 1
@@ -0,0 +1,65 @@
+"""Tests for the adaptive polling scheduler."""
+from datetime import datetime, timedelta, timezone
+
+from custom_components.tw_floodsense.const import (
+    TIER_DEMOTION_COUNT,
+    TIER_IDLE,
+    TIER_RISING,
+    TIER_WET,
+)
+from custom_components.tw_floodsense.scheduler import PollScheduler
+
+START = datetime(2026, 10, 17, 1, 0, tzinfo=timezone.utc)
+
+
+def _minutes(minutes):
+    return START + timedelta(minutes=minutes)
+
+
+def test_rising_level_promotes_immediately():
+    scheduler = PollScheduler()
+    assert scheduler.update("A", 0, _minutes(0)) == TIER_IDLE
+    assert scheduler.update("A", 5, _minutes(1)) == TIER_RISING
+
+
+def test_demotion_requires_consecutive_readings():
+    scheduler = PollScheduler()
+    scheduler.update("A", 0, _minutes(0))
+    scheduler.update("A", 5, _minutes(1))
+
+    for minute in range(2, 1 + TIER_DEMOTION_COUNT):
+        assert scheduler.update("A", 5, _minutes(minute)) == TIER_RISING
+    assert scheduler.update("A", 5, _minutes(1 + TIER_DEMOTION_COUNT)) == TIER_WET
+
+
+def test_repolled_observation_keeps_tier():
+    scheduler = PollScheduler()
+    scheduler.update("A", 0, _minutes(0))
+    assert scheduler.update("A", 5, _minutes(1)) == TIER_RISING
+
+    # 同一筆觀測被重複輪詢多次
+    for _ in range(TIER_DEMOTION_COUNT * 2):
+        assert scheduler.update("A", 5, _minutes(1)) == TIER_RISING
+    assert "A" not in scheduler._demotions
+
+    # 較舊的觀測也不影響分層
+    assert scheduler.update("A", 0, _minutes(0)) == TIER_RISING
+
+
+def test_due_and_mark_polled():
+    scheduler = PollScheduler()
+    scheduler.update("A", 0, _minutes(0))
+    scheduler.mark_polled(["A"], _minutes(0))
+
+    assert scheduler.due(["A", "B"], _minutes(1)) == ["B"]
+    assert scheduler.due(["A"], _minutes(20)) == ["A"]
+    scheduler.expire()
+    assert scheduler.due(["A"], _minutes(1)) == ["A"]
+
+
+def test_skipped_stations_are_not_due_until_expired():
+    scheduler = PollScheduler()
+    scheduler.skip(["A"], _minutes(60))
+
+    assert scheduler.due(["A", "B"], _minutes(1)) == ["B"]
+    assert scheduler.due(["A"], _minutes(60)) == ["A"]